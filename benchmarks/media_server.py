@@ -0,0 +1,278 @@
+"""Local HTTP server with synthetic media for the benchmarks.
+
+Serves three kinds of item, all generated from a seed so every run sees
+the same bytes:
+
+* ``/progressive/<name>.mp4``: one file with Range support
+* ``/hls/<name>.m3u8``: an HLS media playlist of ``seg<i>.ts`` segments
+* ``/dash/<name>.mpd``: a DASH manifest with one muxed representation
+
+A :class:`NetworkProfile` adds per-request latency, a per-connection
+bandwidth cap and injected 503 errors. Which requests fail is decided by
+hashing the request, not by timing, so the same requests fail on every
+run; a retried request always succeeds.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+
+BLOCK_SIZE = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class NetworkProfile:
+    # Seconds before each response starts
+    latency: float = 0.0
+    # Bytes per second per connection (0 = unlimited)
+    bandwidth: int = 0
+    # Fraction of first attempts answered with 503
+    error_rate: float = 0.0
+
+
+PROFILES = {
+    "lan": NetworkProfile(),
+    "wan": NetworkProfile(latency=0.03, bandwidth=4 * 1024 * 1024),
+    "flaky": NetworkProfile(latency=0.05, bandwidth=2 * 1024 * 1024, error_rate=0.05),
+}
+
+
+class MediaServer:
+    """Synthetic media on 127.0.0.1, served from a background thread."""
+
+    def __init__(
+        self,
+        profile: NetworkProfile | None = None,
+        size: int = 16 * 1024 * 1024,
+        segment_size: int = 1024 * 1024,
+        seed: int = 1,
+    ) -> None:
+        self.profile = profile or NetworkProfile()
+        self.size = size
+        self.segment_size = segment_size
+        self.seed = seed
+        self._block = random.Random(seed).randbytes(BLOCK_SIZE)
+        self._lock = threading.Lock()
+        self._attempts: Dict[Tuple[str, str], int] = {}
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def segments(self) -> int:
+        return max(1, -(-self.size // self.segment_size))
+
+    def url(self, kind: str, name: str) -> str:
+        ext = {"progressive": "mp4", "hls": "m3u8", "dash": "mpd"}[kind]
+        return f"http://127.0.0.1:{self.port}/{kind}/{name}.{ext}"
+
+    @property
+    def port(self) -> int:
+        assert self._server is not None, "server not started"
+        return self._server.server_address[1]
+
+    def start(self) -> "MediaServer":
+        server = self
+
+        class _Handler(_MediaHandler):
+            media = server
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="media-server", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MediaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def should_fail(self, path: str, range_header: str) -> bool:
+        key = (path, range_header)
+        with self._lock:
+            self.requests += 1
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+            if attempt or self.profile.error_rate <= 0:
+                return False
+            fail = zlib.crc32(f"{self.seed}:{path}:{range_header}".encode()) / 0xFFFFFFFF < self.profile.error_rate
+            if fail:
+                self.errors += 1
+            return fail
+
+    def segment_length(self, index: int) -> int:
+        return max(0, min(self.segment_size, self.size - index * self.segment_size))
+
+    def payload(self, offset: int, length: int) -> bytes:
+        """``length`` bytes of the synthetic stream starting at ``offset``."""
+        start = offset % BLOCK_SIZE
+        data = self._block[start:start + length]
+        while len(data) < length:
+            data += self._block[: length - len(data)]
+        return data
+
+    def hls_playlist(self, name: str) -> str:
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for index in range(self.segments):
+            lines += ["#EXTINF:4.000,", f"{name}/seg{index}.ts"]
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    def dash_manifest(self, name: str) -> str:
+        duration = self.segments * 4
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" '
+            f'mediaPresentationDuration="PT{duration}S" minBufferTime="PT2S" '
+            'profiles="urn:mpeg:dash:profile:isoff-on-demand:2011">\n'
+            f'  <Period duration="PT{duration}S">\n'
+            '    <AdaptationSet mimeType="video/mp4" segmentAlignment="true">\n'
+            '      <Representation id="1" codecs="avc1.64001f,mp4a.40.2" width="1280" height="720" '
+            'bandwidth="2000000">\n'
+            f'        <SegmentTemplate timescale="1" duration="4" startNumber="0" '
+            f'initialization="{name}/init.mp4" media="{name}/seg$Number$.m4s"/>\n'
+            "      </Representation>\n"
+            "    </AdaptationSet>\n"
+            "  </Period>\n"
+            "</MPD>\n"
+        )
+
+
+class _MediaHandler(BaseHTTPRequestHandler):
+    media: MediaServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_HEAD(self) -> None:
+        self._serve(body=False)
+
+    def do_GET(self) -> None:
+        self._serve(body=True)
+
+    def _serve(self, body: bool) -> None:
+        media = self.media
+        path = self.path.split("?")[0]
+        if media.profile.latency > 0:
+            time.sleep(media.profile.latency)
+        if media.should_fail(path, self.headers.get("Range") or ""):
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        parts = path.strip("/").split("/")
+        kind, rest = parts[0], "/".join(parts[1:])
+        if kind == "progressive" and rest.endswith(".mp4"):
+            self._send_bytes(0, media.size, "video/mp4", body, ranged=True)
+        elif kind == "hls" and rest.endswith(".m3u8"):
+            self._send_text(media.hls_playlist(rest[:-5]), "application/vnd.apple.mpegurl", body)
+        elif kind == "dash" and rest.endswith(".mpd"):
+            self._send_text(media.dash_manifest(rest[:-4]), "application/dash+xml", body)
+        elif kind in ("hls", "dash") and rest.endswith("/init.mp4"):
+            self._send_bytes(media.size, 1024, "video/mp4", body)
+        elif kind in ("hls", "dash") and "/seg" in rest:
+            try:
+                index = int(rest.rsplit("/seg", 1)[1].split(".")[0])
+            except ValueError:
+                index = -1
+            length = media.segment_length(index) if index >= 0 else 0
+            if not length:
+                self.send_error(404)
+                return
+            mime = "video/mp2t" if kind == "hls" else "video/iso.segment"
+            self._send_bytes(index * media.segment_size, length, mime, body)
+        else:
+            self.send_error(404)
+
+    def _send_text(self, text: str, content_type: str, body: bool) -> None:
+        data = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if body:
+            self.wfile.write(data)
+
+    def _send_bytes(self, offset: int, length: int, content_type: str, body: bool, ranged: bool = False) -> None:
+        start, end = 0, length - 1
+        requested = self.headers.get("Range") if ranged else None
+        if requested and requested.startswith("bytes="):
+            first, _, last = requested[6:].split(",")[0].partition("-")
+            try:
+                start = int(first) if first else max(0, length - int(last))
+                end = min(length - 1, int(last)) if first and last else length - 1
+            except ValueError:
+                start, end = 0, length - 1
+            if start >= length:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{length}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{length}")
+        else:
+            self.send_response(200)
+        if ranged:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if body:
+            self._write_throttled(offset + start, end - start + 1)
+
+    def _write_throttled(self, offset: int, length: int) -> None:
+        media = self.media
+        rate = media.profile.bandwidth
+        began = time.monotonic()
+        sent = 0
+        try:
+            while sent < length:
+                chunk = media.payload(offset + sent, min(CHUNK_SIZE, length - sent))
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                if rate > 0:
+                    ahead = sent / rate - (time.monotonic() - began)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on this transfer (e.g. aria2c re-splitting)
+            self.close_connection = True
+        finally:
+            with media._lock:
+                media.bytes_sent += sent
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the benchmark media until interrupted.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="lan")
+    parser.add_argument("--size-mb", type=int, default=16)
+    args = parser.parse_args()
+    with MediaServer(PROFILES[args.profile], size=args.size_mb * 1024 * 1024) as srv:
+        for kind in ("progressive", "hls", "dash"):
+            print(srv.url(kind, "sample"))
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
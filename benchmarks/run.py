@@ -0,0 +1,330 @@
+"""Throughput benchmarks for the download engine, run against a local media server.
+
+Every scenario downloads synthetic media (see ``media_server.py``) through
+:class:`DownloadJob` with its own settings, in a fresh process with a
+temporary home directory, so the settings file, caches and archive start
+empty and CPU time and peak memory belong to that scenario alone::
+
+    python benchmarks/run.py --profile wan --repeat 3 --json bench.json
+    python benchmarks/run.py --baseline bench.json   # exit code 1 on a regression
+
+Nothing leaves the machine. ffmpeg is kept out of the runs: the synthetic
+streams are not decodable, and post-processing is not what is measured.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+HERE = Path(__file__).resolve().parent
+SRC = HERE.parent / "src"
+sys.path.insert(0, str(SRC))
+sys.path.insert(0, str(HERE))
+
+from media_server import PROFILES, MediaServer  # noqa: E402
+
+
+@dataclass
+class Scenario:
+    name: str
+    # "progressive", "hls" or "dash"
+    kind: str
+    settings: Dict[str, Any] = field(default_factory=dict)
+    items: int = 1
+    # Executable the scenario needs; skipped when it is not installed
+    requires: str = ""
+
+
+_PARALLEL_HLS = {"max_concurrent_downloads": 4, "max_downloads_per_host": 4, "concurrent_fragments": 4}
+
+SCENARIOS = [
+    Scenario("progressive-native", "progressive"),
+    Scenario("progressive-aria2c", "progressive", {"use_aria2c": True, "aria2_rpc": False}, requires="aria2c"),
+    Scenario("progressive-aria2c-rpc", "progressive", {"use_aria2c": True, "aria2_rpc": True}, requires="aria2c"),
+    Scenario("progressive-segmented", "progressive", {"segmented_download": True}),
+    Scenario("hls-frag1", "hls", {"concurrent_fragments": 1}),
+    Scenario("hls-frag4", "hls", {"concurrent_fragments": 4}),
+    Scenario("hls-frag16", "hls", {"concurrent_fragments": 16}),
+    Scenario("hls-auto", "hls", {"auto_concurrency": True}),
+    Scenario("dash-frag1", "dash", {"concurrent_fragments": 1}),
+    Scenario("dash-frag4", "dash", {"concurrent_fragments": 4}),
+    Scenario("dash-frag16", "dash", {"concurrent_fragments": 16}),
+    Scenario("batch-serial", "progressive", {"max_concurrent_downloads": 1}, items=4),
+    Scenario("batch-parallel", "progressive", {"max_concurrent_downloads": 4, "max_downloads_per_host": 4}, items=4),
+    Scenario("batch-hls-threads", "hls", {**_PARALLEL_HLS, "worker_backend": "thread"}, items=4),
+    Scenario("batch-hls-processes", "hls", {**_PARALLEL_HLS, "worker_backend": "process"}, items=4),
+]
+
+# Regressions smaller than this much CPU time are noise
+MIN_CPU_SECONDS = 0.2
+
+
+def _isolate_toolchain(home: Path) -> Any:
+    """Use a manifest of the run's own: ffmpeg points nowhere so yt-dlp runs without it, aria2c is looked up afresh."""
+    from utils.toolchain import ToolchainService
+
+    manifest = home / "toolchain.json"
+    if not manifest.exists():
+        missing = str(home / "no-ffmpeg" / "ffmpeg")
+        manifest.write_text(json.dumps({"ffmpeg": {"path": missing, "version": "", "sha256": ""}}), encoding="utf-8")
+    ToolchainService._shared = ToolchainService(manifest)
+    return ToolchainService._shared
+
+
+# Download pool processes import this module again; they get the run's toolchain as well
+if os.environ.get("YTDLP_BENCH_HOME"):
+    _isolate_toolchain(Path(os.environ["YTDLP_BENCH_HOME"]))
+
+
+def _available(tool: str) -> bool:
+    if not tool:
+        return True
+    from utils.aria2 import ARIA2_EXE
+
+    bundled = {"aria2c": ARIA2_EXE}.get(tool)
+    # Bundled builds only run on Windows, and only a present one avoids a download
+    return bool(shutil.which(tool)) or (os.name == "nt" and bundled is not None and bundled.exists())
+
+
+@dataclass
+class Usage:
+    cpu: float
+    child_cpu: float
+    max_rss_mib: Optional[float]
+
+
+def _usage() -> Usage:
+    times = os.times()
+    try:
+        import resource
+    except ImportError:
+        # Windows: no getrusage; peak memory is not reported
+        return Usage(times.user + times.system, times.children_user + times.children_system, None)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    rss_mib = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    return Usage(times.user + times.system, times.children_user + times.children_system, rss_mib)
+
+
+def run_scenario(scenario: Scenario, profile: str, size: int, timeout: float) -> Dict[str, Any]:
+    """Run ``scenario`` once in a child process; returns its measurements."""
+    with tempfile.TemporaryDirectory(prefix="ytdlp-bench-") as home, MediaServer(PROFILES[profile], size=size) as server:
+        expected = size + (1024 if scenario.kind == "dash" else 0)
+        spec = {
+            "home": home,
+            "settings": {"output_dir": os.path.join(home, "out"), **scenario.settings},
+            "urls": [server.url(scenario.kind, f"{scenario.name}-{i}") for i in range(scenario.items)],
+            "expected_size": expected,
+        }
+        spec_path = os.path.join(home, "spec.json")
+        with open(spec_path, "w", encoding="utf-8") as f:
+            json.dump(spec, f)
+        # Same variables Path.home() reads, so every per-user file lands in the temporary home
+        env = dict(os.environ, HOME=home, USERPROFILE=home, YTDLP_BENCH_HOME=home)
+        try:
+            proc = subprocess.run(
+                [sys.executable, str(Path(__file__).resolve()), "--child", spec_path],
+                env=env,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            return {"ok": False, "error": f"timed out after {timeout:.0f}s"}
+        try:
+            result = json.loads(Path(home, "result.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            tail = (proc.stderr or "").strip().splitlines()[-3:]
+            return {"ok": False, "error": " | ".join(tail) or f"exit code {proc.returncode}"}
+        result.update(
+            {"requests": server.requests, "errors_injected": server.errors, "bytes_served": server.bytes_sent}
+        )
+        return result
+
+
+def child(spec_path: str) -> int:
+    """Body of the child process: download the spec's URLs and write result.json."""
+    spec = json.loads(Path(spec_path).read_text(encoding="utf-8"))
+    home = Path(spec["home"])
+
+    from utils.settings import AppSettings
+
+    settings = AppSettings(**spec["settings"])
+    settings.save()
+    toolchain = _isolate_toolchain(home)
+    if settings.use_aria2c and toolchain.wait("aria2c") is None:
+        raise SystemExit("aria2c is not available")
+
+    from downloader.engine import DownloadJob
+    from downloader.process_pool import DownloadProcessPool, RemoteDownloadJob
+    from downloader.session import SessionPool
+    from utils.aria2_rpc import Aria2Daemon
+
+    processes = settings.worker_backend == "process"
+    if processes:
+        jobs = [RemoteDownloadJob(url, settings.output_dir, "Best (video+audio)", quiet=True) for url in spec["urls"]]
+    else:
+        jobs = [
+            DownloadJob(url, settings.output_dir, "Best (video+audio)", quiet=True, sessions=SessionPool.shared())
+            for url in spec["urls"]
+        ]
+    before = _usage()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max(1, settings.max_concurrent_downloads)) as pool:
+        outcomes = list(pool.map(lambda job: job.run(), jobs))
+    wall = time.perf_counter() - start
+    own = _usage()
+    # Stopping the daemon and the pool reaps them, so their CPU time shows up under the children
+    Aria2Daemon.shared().stop()
+    if processes:
+        DownloadProcessPool.shared().shutdown()
+    after = _usage()
+
+    sizes = [os.path.getsize(path) if ok and os.path.isfile(path) else -1 for ok, path in outcomes]
+    phases: Dict[str, float] = {}
+    for job in jobs:
+        for phase, seconds in job.metrics.phases.items():
+            phases[phase] = phases.get(phase, 0.0) + seconds
+    result = {
+        "ok": all(size == spec["expected_size"] for size in sizes),
+        "error": "" if all(ok for ok, _ in outcomes) else "download failed",
+        "bytes": sum(size for size in sizes if size > 0),
+        "wall_seconds": wall,
+        "cpu_seconds": own.cpu - before.cpu,
+        "child_cpu_seconds": after.child_cpu - before.child_cpu,
+        "max_rss_mib": own.max_rss_mib,
+        "retries": sum(job.metrics.retries for job in jobs),
+        "phases": phases,
+    }
+    if result["ok"] is False and not result["error"]:
+        result["error"] = f"unexpected sizes {sizes}"
+    (home / "result.json").write_text(json.dumps(result), encoding="utf-8")
+    return 0
+
+
+def summarize(name: str, runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    good = [run for run in runs if run.get("ok")]
+    if not good:
+        return {"scenario": name, "ok": False, "error": runs[-1].get("error", "failed") if runs else "not run"}
+    wall = statistics.median(run["wall_seconds"] for run in good)
+    size = good[0]["bytes"]
+    return {
+        "scenario": name,
+        "ok": len(good) == len(runs),
+        "runs": len(runs),
+        "bytes": size,
+        "wall_seconds": wall,
+        "throughput_mib_s": size / wall / (1024 * 1024) if wall > 0 else 0.0,
+        "cpu_seconds": statistics.median(run["cpu_seconds"] + run["child_cpu_seconds"] for run in good),
+        "max_rss_mib": max((run["max_rss_mib"] or 0.0) for run in good) or None,
+        "retries": statistics.median(run["retries"] for run in good),
+        "errors_injected": statistics.median(run["errors_injected"] for run in good),
+        "phases": {
+            phase: statistics.median(run["phases"].get(phase, 0.0) for run in good)
+            for phase in sorted({phase for run in good for phase in run["phases"]})
+        },
+    }
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    header = f"{'scenario':<24} {'MiB/s':>8} {'wall s':>8} {'CPU s':>7} {'RSS MiB':>8} {'retries':>7} {'errors':>6}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        if not row.get("wall_seconds"):
+            print(f"{row['scenario']:<24} {'skipped' if row.get('skipped') else 'FAILED'}: {row.get('error', '')}")
+            continue
+        rss = f"{row['max_rss_mib']:.0f}" if row.get("max_rss_mib") else "-"
+        print(
+            f"{row['scenario']:<24} {row['throughput_mib_s']:>8.1f} {row['wall_seconds']:>8.2f} "
+            f"{row['cpu_seconds']:>7.2f} {rss:>8} {row['retries']:>7.0f} {row['errors_injected']:>6.0f}"
+            + ("" if row["ok"] else "  (some runs failed)")
+        )
+
+
+def compare(rows: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Scenarios that got slower or costlier than ``baseline`` by more than ``tolerance``."""
+    previous = {row["scenario"]: row for row in baseline.get("results", [])}
+    problems = []
+    for row in rows:
+        old = previous.get(row["scenario"])
+        if old is None or not old.get("wall_seconds") or row.get("skipped"):
+            continue
+        if not row.get("wall_seconds"):
+            problems.append(f"{row['scenario']}: failed ({row.get('error', '')})")
+            continue
+        if row["throughput_mib_s"] < old["throughput_mib_s"] * (1 - tolerance):
+            problems.append(
+                f"{row['scenario']}: throughput {row['throughput_mib_s']:.1f} MiB/s, was {old['throughput_mib_s']:.1f}"
+            )
+        if old["cpu_seconds"] >= MIN_CPU_SECONDS and row["cpu_seconds"] > old["cpu_seconds"] * (1 + tolerance):
+            problems.append(f"{row['scenario']}: CPU {row['cpu_seconds']:.2f}s, was {old['cpu_seconds']:.2f}s")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the download engine against a local media server.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="wan", help="network conditions to emulate")
+    parser.add_argument("--size-mb", type=int, default=16, help="size of each synthetic item")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario; the median is reported")
+    parser.add_argument("-k", "--filter", default="", help="only run scenarios whose name contains this")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown before it counts (0.15 = 15%%)")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds before a run is abandoned")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return child(args.child)
+
+    rows = []
+    for scenario in SCENARIOS:
+        if args.filter not in scenario.name:
+            continue
+        if not _available(scenario.requires):
+            rows.append({"scenario": scenario.name, "ok": False, "skipped": True, "error": f"{scenario.requires} not found"})
+            continue
+        runs = [run_scenario(scenario, args.profile, args.size_mb * 1024 * 1024, args.timeout) for _ in range(args.repeat)]
+        rows.append(summarize(scenario.name, runs))
+        print(f"{scenario.name}: done", file=sys.stderr)
+    print_table(rows)
+
+    if args.json:
+        report = {
+            "profile": args.profile,
+            "size_mb": args.size_mb,
+            "repeat": args.repeat,
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "network": asdict(PROFILES[args.profile]),
+            "results": rows,
+        }
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    failed = [row["scenario"] for row in rows if not row.get("ok") and not row.get("skipped")]
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if (baseline.get("profile"), baseline.get("size_mb")) != (args.profile, args.size_mb):
+            print(f"note: baseline used --profile {baseline.get('profile')} --size-mb {baseline.get('size_mb')}")
+        problems = compare(rows, baseline, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""Headless batch downloader.
+
+Reads URLs from files (or stdin), downloads them with the same options as
+the GUI and prints one JSON object per line for every event, e.g.::
+
+    python src/cli.py urls.txt -o ~/Videos -f mp3 -j 4 > events.jsonl
+
+On Ctrl+C (or SIGTERM) running downloads are paused, keeping their partial
+files so that running the same command again continues where they
+stopped; a second Ctrl+C exits at once.
+
+Heavy modules (yt-dlp, sqlite cache) are only imported once there is work
+to do, so ``--help`` and argument errors return immediately. PySide6 is
+never imported.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import signal
+import sys
+import time
+from typing import IO, Iterable, Iterator, List
+
+
+FORMAT_CHOICES = ["best", "m4a", "mp3", "video"]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="yt-dlp-studio-cli",
+        description="Download URL lists without the GUI. Events are printed as JSON lines on stdout.",
+    )
+    parser.add_argument("files", nargs="*", help="files with one URL per line ('-' or none for stdin)")
+    parser.add_argument("-o", "--output", help="output directory (default: the GUI's default folder)")
+    parser.add_argument("-f", "--format", choices=FORMAT_CHOICES, default="best", help="what to download")
+    parser.add_argument("--container", choices=["mp4", "mkv", "webm"], help="merge output container")
+    parser.add_argument("--video-quality", help="maximum video height, e.g. 1080p")
+    parser.add_argument("--audio-quality", help="audio bitrate for extraction, e.g. 160k")
+    parser.add_argument("-j", "--jobs", type=int, help="parallel downloads (default: from settings)")
+    parser.add_argument("--per-host", type=int, help="parallel downloads per site (default: from settings)")
+    parser.add_argument(
+        "--backend",
+        choices=["thread", "process"],
+        help="run downloads on threads or in a pool of processes (default: from settings)",
+    )
+    parser.add_argument(
+        "--order",
+        choices=["shortest", "added"],
+        help="start the shortest items first or keep the input order (default: from settings)",
+    )
+    parser.add_argument(
+        "--yes-playlist",
+        action="store_true",
+        default=None,
+        help="for a link to a video in a playlist or mix, queue the whole playlist (default: from settings)",
+    )
+    parser.add_argument(
+        "--retries", type=int, help="times a failed item is retried, with growing waits (default: from settings)"
+    )
+    parser.add_argument(
+        "--limit-rate", type=int, help="total download speed limit in KiB/s, 0 for none (default: from settings)"
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, help="serve Prometheus metrics on this local port (default: from settings)"
+    )
+    parser.add_argument(
+        "--progress-interval", type=float, default=0.5, help="seconds between progress events per item"
+    )
+    return parser
+
+
+def read_urls(paths: Iterable[str], stdin: IO[str]) -> Iterator[str]:
+    """Yield URLs from the given files; blank lines and '#' comments are skipped."""
+    for path in list(paths) or ["-"]:
+        handle = stdin if path == "-" else open(path, encoding="utf-8")
+        try:
+            for line in handle:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+        finally:
+            if handle is not stdin:
+                handle.close()
+
+
+def emit(out: IO[str], event: str, **fields) -> None:
+    out.write(json.dumps({"event": event, "time": round(time.time(), 3), **fields}) + "\n")
+    out.flush()
+
+
+def main(argv: List[str] | None = None, stdin: IO[str] = sys.stdin, out: IO[str] = sys.stdout) -> int:
+    args = build_parser().parse_args(argv)
+
+    import queue
+    import threading
+    from dataclasses import asdict
+
+    from downloader.engine import DownloadJob, FORMAT_MODES, archived_path
+    from downloader.playlist import iter_entry_pages, looks_like_collection
+    from downloader.postprocess import PostProcessPool
+    from downloader.process_pool import DownloadProcessPool, RemoteDownloadJob
+    from downloader.progress import ProgressAggregator
+    from downloader.ratelimit import BandwidthLimiter
+    from downloader.scheduler import DownloadScheduler, estimate_cost, retry_delay
+    from downloader.session import SessionPool
+    from utils.metrics import MetricsRecorder
+    from utils.settings import AppSettings
+
+    settings = AppSettings.load()
+    output_dir = args.output or settings.output_dir
+    if not output_dir:
+        print("error: no output directory; pass -o/--output", file=sys.stderr)
+        return 2
+    format_mode = FORMAT_MODES[args.format]
+    advanced_options = {
+        "container": args.container,
+        "video_quality": args.video_quality,
+        "audio_quality": args.audio_quality,
+    }
+    if args.limit_rate is not None:
+        BandwidthLimiter.shared().configure(args.limit_rate)
+    else:
+        BandwidthLimiter.shared().configure(settings.bandwidth_limit_kbps, settings.bandwidth_schedule)
+    metrics_port = args.metrics_port if args.metrics_port is not None else settings.metrics_port
+    if metrics_port and not MetricsRecorder.shared().serve(metrics_port):
+        print(f"warning: could not serve metrics on port {metrics_port}", file=sys.stderr)
+    scheduler = DownloadScheduler(
+        args.jobs or settings.max_concurrent_downloads,
+        args.per_host or settings.max_downloads_per_host,
+        shortest_first=(args.order or settings.queue_order) == "shortest",
+    )
+    retries = args.retries if args.retries is not None else settings.retry_attempts
+    whole_playlist = args.yes_playlist if args.yes_playlist is not None else settings.yes_playlist
+    process_pool = None
+    if (args.backend or settings.worker_backend) == "process":
+        process_pool = DownloadProcessPool.shared()
+        process_pool.max_idle = scheduler.max_workers
+    progress = ProgressAggregator()
+    events: "queue.Queue[tuple]" = queue.Queue()
+    entries = {}
+    next_id = 0
+    listing = 0
+    failures = 0
+    attempts = {}
+    # Items started and not yet finished, including those only post-processing
+    running = set()
+    jobs = {}
+    interrupted = False
+
+    def on_signal(signum, frame) -> None:
+        nonlocal interrupted
+        if interrupted:
+            raise KeyboardInterrupt
+        interrupted = True
+
+    handlers = {}
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            handlers[signum] = signal.signal(signum, on_signal)
+        except ValueError:
+            # Not the main thread (e.g. embedded); signals keep their default behaviour
+            pass
+
+    def add_entry(entry: dict) -> None:
+        nonlocal next_id
+        item_id = next_id
+        next_id += 1
+        entries[item_id] = entry
+        video_key = (entry["ie_key"], entry["id"]) if entry.get("ie_key") and entry.get("id") else None
+        done_path = archived_path(video_key, format_mode, advanced_options)
+        if done_path:
+            emit(out, "skipped", id=item_id, url=entry["url"], path=done_path)
+            return
+        enqueue(item_id)
+        emit(out, "queued", id=item_id, url=entry["url"], title=entry.get("title") or "")
+
+    def enqueue(item_id: int, delay: float = 0.0) -> None:
+        entry = entries[item_id]
+        cost = estimate_cost(entry.get("duration"), entry.get("filesize"))
+        scheduler.enqueue(item_id, entry["url"], cost=cost, delay=delay)
+
+    def list_collection(url: str) -> None:
+        found = 0
+        try:
+            for page in iter_entry_pages(url):
+                found += len(page)
+                events.put(("entries", page))
+        except Exception as exc:
+            events.put(("log", None, f"Error while listing {url}: {exc}"))
+        events.put(("listed", url, found))
+
+    def run_job(item_id: int) -> None:
+        entry = entries[item_id]
+        options = dict(
+            advanced_options=advanced_options,
+            video_key=(entry["ie_key"], entry["id"]) if entry.get("ie_key") and entry.get("id") else None,
+            on_progress=lambda event: progress.update(item_id, event),
+            on_title=lambda title: events.put(("title", item_id, title)),
+            on_log=lambda message: events.put(("log", item_id, message)),
+            quiet=True,
+            on_status=lambda status: events.put(("status", item_id, status)),
+            on_downloaded=lambda: events.put(("downloaded", item_id)),
+        )
+        if process_pool is not None:
+            job = RemoteDownloadJob(entry["url"], output_dir, format_mode, pool=process_pool, **options)
+        else:
+            job = DownloadJob(
+                entry["url"],
+                output_dir,
+                format_mode,
+                post_processor=PostProcessPool.shared(),
+                sessions=SessionPool.shared(),
+                **options,
+            )
+        jobs[item_id] = job
+        if interrupted:
+            job.pause()
+        ok, path = job.run()
+        events.put(("finished", item_id, ok, path, asdict(job.metrics), job.stopped))
+
+    for url in read_urls(args.files, stdin):
+        if looks_like_collection(url, whole_playlist):
+            listing += 1
+            threading.Thread(target=list_collection, args=(url,), daemon=True).start()
+        else:
+            add_entry({"url": url})
+
+    pausing = False
+    while running or not interrupted and (listing or not scheduler.is_idle()):
+        if interrupted and not pausing:
+            pausing = True
+            emit(out, "log", id=None, message=f"Pausing {len(running)} downloads")
+            for job in list(jobs.values()):
+                job.pause()
+        for item_id in [] if interrupted else scheduler.next_batch():
+            running.add(item_id)
+            emit(out, "started", id=item_id, url=entries[item_id]["url"])
+            threading.Thread(target=run_job, args=(item_id,), daemon=True).start()
+        try:
+            event = events.get(timeout=args.progress_interval)
+        except queue.Empty:
+            event = None
+        if event is not None:
+            kind = event[0]
+            if kind == "entries":
+                for entry in event[1]:
+                    add_entry(entry)
+            elif kind == "listed":
+                listing -= 1
+                if event[2] == 0:
+                    # Nothing listed: hand the URL to yt-dlp as a single item
+                    add_entry({"url": event[1]})
+            elif kind == "title":
+                emit(out, "title", id=event[1], title=event[2])
+            elif kind == "log":
+                emit(out, "log", id=event[1], message=event[2])
+            elif kind == "status":
+                emit(out, "status", id=event[1], status=event[2])
+            elif kind == "downloaded":
+                # Post-processing goes on in the pool; start the next download meanwhile
+                progress.discard(event[1])
+                scheduler.finish(event[1])
+                emit(out, "downloaded", id=event[1])
+            elif kind == "finished":
+                _, item_id, ok, path, metrics, stopped = event
+                progress.discard(item_id)
+                scheduler.finish(item_id)
+                running.discard(item_id)
+                jobs.pop(item_id, None)
+                if not ok and not stopped and not interrupted and attempts.get(item_id, 0) < retries:
+                    # Failed: try again later, waiting longer after every attempt
+                    attempts[item_id] = attempts.get(item_id, 0) + 1
+                    delay = retry_delay(attempts[item_id])
+                    enqueue(item_id, delay=delay)
+                    emit(out, "retry", id=item_id, attempt=attempts[item_id], delay=round(delay, 1), metrics=metrics)
+                else:
+                    failures += 0 if ok or stopped else 1
+                    emit(
+                        out,
+                        "finished",
+                        id=item_id,
+                        url=entries[item_id]["url"],
+                        ok=ok,
+                        path=path,
+                        stopped=stopped,
+                        metrics=metrics,
+                    )
+        for item_id, update in progress.drain().items():
+            emit(
+                out,
+                "progress",
+                id=item_id,
+                phase=update.phase,
+                percent=update.percent,
+                downloaded_bytes=update.downloaded_bytes,
+                total_bytes=update.total_bytes,
+                total_is_estimate=update.total_is_estimate,
+                speed=round(update.speed_bps, 1),
+                eta=round(update.eta_seconds, 1) if update.eta_seconds is not None else None,
+                file_index=update.file_index,
+                fragment_index=update.fragment_index,
+                fragment_count=update.fragment_count,
+            )
+
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+    emit(out, "done", items=next_id, failed=failures, interrupted=interrupted)
+    if interrupted:
+        return 130
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict
+
+from utils.fileio import copy_range
+
+
+# YoutubeDL param holding the IoSavings of the current item; fragments are assembled in the kernel when set
+PARAM = "io_savings"
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+class IoSavings:
+    """Bytes one download moved inside the kernel instead of reading and writing them itself."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+    def add(self, count: int) -> None:
+        with self._lock:
+            self.bytes += count
+
+
+class FragmentFile:
+    """Stands in for a fragment's bytes until they are appended; falsy when the fragment is empty."""
+
+    __slots__ = ("path", "size")
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.size = os.path.getsize(path)
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def read(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+def enable_in_place_assembly() -> None:
+    """Let yt-dlp's HLS/DASH downloaders append fragments with a kernel-side copy.
+
+    yt-dlp reads every downloaded fragment file into memory and writes it
+    to the ``.part`` file, and picks its fragment downloaders internally,
+    so the change is made once on FragmentFD itself. It only applies to
+    downloads whose params carry an :class:`IoSavings` under ``PARAM``,
+    and only where the bytes are appended unchanged: encrypted fragments
+    and repacked ones (WebVTT subtitles) still go through memory.
+    """
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        _installed = True
+    from yt_dlp.downloader.fragment import FragmentFD
+
+    download_and_append = FragmentFD.download_and_append_fragments
+    read_fragment = FragmentFD._read_fragment
+    append_fragment = FragmentFD._append_fragment
+    decrypter = FragmentFD.decrypter
+    finish = FragmentFD._finish_frag_download
+
+    def _download_and_append_fragments(self, ctx: Dict[str, Any], fragments, info_dict, **kwargs):
+        if self.params.get(PARAM) is not None and "pack_func" not in kwargs and ctx.get("tmpfilename") != "-":
+            ctx["in_place"] = True
+        return download_and_append(self, ctx, fragments, info_dict, **kwargs)
+
+    def _read_fragment(self, ctx: Dict[str, Any]):
+        path = ctx.get("fragment_filename_sanitized")
+        if ctx.get("in_place") and path and os.path.isfile(path):
+            return FragmentFile(path)
+        return read_fragment(self, ctx)
+
+    def _decrypter(self, info_dict: Dict[str, Any]):
+        decrypt = decrypter(self, info_dict)
+
+        def _decrypt(fragment: Dict[str, Any], content: Any) -> Any:
+            if isinstance(content, FragmentFile) and (fragment.get("decrypt_info") or {}).get("METHOD") == "AES-128":
+                content = content.read()
+            return decrypt(fragment, content)
+
+        return _decrypt
+
+    def _append_fragment(self, ctx: Dict[str, Any], content: Any) -> None:
+        if not isinstance(content, FragmentFile):
+            return append_fragment(self, ctx, content)
+        dest = ctx["dest_stream"]
+        dest.flush()
+        offset = dest.seek(0, os.SEEK_END)
+        # dest_stream may be in append mode, which copy_file_range and sendfile refuse
+        out = ctx.get("in_place_out")
+        if out is None:
+            out = ctx["in_place_out"] = open(ctx["tmpfilename"], "r+b", buffering=0)
+        with open(content.path, "rb") as src:
+            in_kernel = copy_range(src.fileno(), out.fileno(), content.size, 0, offset)
+        # Keep the stream's position in step with what was written behind its back
+        dest.seek(0, os.SEEK_END)
+        self.params[PARAM].add(in_kernel)
+        # Only now is the fragment done: progress state, the .ytdl file and removing it, as for any other
+        append_fragment(self, ctx, b"")
+
+    def _finish_frag_download(self, ctx: Dict[str, Any], info_dict: Dict[str, Any]):
+        out = ctx.pop("in_place_out", None)
+        if out is not None:
+            out.close()
+        return finish(self, ctx, info_dict)
+
+    FragmentFD.download_and_append_fragments = _download_and_append_fragments
+    FragmentFD._read_fragment = _read_fragment
+    FragmentFD.decrypter = _decrypter
+    FragmentFD._append_fragment = _append_fragment
+    FragmentFD._finish_frag_download = _finish_frag_download
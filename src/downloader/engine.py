@@ -0,0 +1,632 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import os
+import time
+from concurrent.futures import wait
+from typing import Any, Callable, Dict, List, Optional
+
+from downloader.assembly import PARAM as IO_SAVINGS_PARAM, IoSavings, enable_in_place_assembly
+from downloader.formats import FormatPlan, fallback_plan, plan_formats
+from downloader.postprocess import STAGE_WAITING, PostProcessPool, PostProcessTask, time_postprocessors
+from downloader.progress import PHASE_DOWNLOADING, PHASE_FINISHED, ProgressEvent, SpeedMeter, format_bytes
+from downloader.ratelimit import SELF_LIMITED, BandwidthLimiter
+from downloader.scheduler import host_key
+from downloader.session import DownloadSession, SessionPool
+from downloader.tuning import ConcurrencyTuner
+from utils.aria2_rpc import Aria2Client, Aria2Daemon, Aria2RpcError
+from utils.archive import DownloadArchive
+from utils.fileio import move_into_place
+from utils.info_cache import InfoCache
+from utils.metrics import DownloadMetrics, MetricsRecorder
+from utils.settings import AppSettings
+from utils.toolchain import ToolchainService
+
+
+# Format modes offered by the GUI combo; the CLI accepts the short aliases too
+FORMAT_MODES = {
+    "best": "Best (video+audio)",
+    "m4a": "Audio only (m4a)",
+    "mp3": "Audio only (mp3)",
+    "video": "Best video only",
+}
+
+# Why a download stopped early; also the queue status of the item
+PAUSED = "Paused"
+CANCELLED = "Cancelled"
+
+
+class DownloadInterrupted(Exception):
+    """Raised from the progress hook to stop a transfer that was paused or cancelled."""
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+def request_signature(format_mode: str, advanced_options: dict | None) -> str:
+    """Identifies what was asked for, so archive hits only match the same kind of download."""
+    options = advanced_options or {}
+    parts = [format_mode] + [str(options.get(key) or "") for key in ("container", "video_quality", "audio_quality")]
+    return "|".join(parts)
+
+
+def archived_path(video_key: tuple[str, str] | None, format_mode: str, advanced_options: dict | None) -> str | None:
+    """Path of an earlier download of the same video and request that is still on disk."""
+    if video_key is None:
+        return None
+    archive = DownloadArchive.shared()
+    if archive is None:
+        return None
+    entry = archive.lookup(*video_key, request_signature(format_mode, advanced_options))
+    return entry.path if entry is not None else None
+
+
+class DownloadJob:
+    """Downloads one URL with the app's yt-dlp options, without any Qt dependency.
+
+    Progress, titles and log lines are reported through optional callbacks,
+    which are invoked on the thread that calls :meth:`run`.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        output_dir: str,
+        format_mode: str,
+        advanced_options: dict | None = None,
+        video_key: tuple[str, str] | None = None,
+        on_progress: Callable[[ProgressEvent], None] | None = None,
+        on_title: Callable[[str], None] | None = None,
+        on_log: Callable[[str], None] | None = None,
+        quiet: bool = False,
+        on_status: Callable[[str], None] | None = None,
+        on_downloaded: Callable[[], None] | None = None,
+        post_processor: PostProcessPool | None = None,
+        sessions: SessionPool | None = None,
+    ) -> None:
+        self.url = url
+        # (extractor key, video id) when known up front, e.g. from playlist listing
+        self.video_key = video_key
+        self.output_dir = output_dir
+        self.format_mode = format_mode
+        self.advanced_options = advanced_options or {}
+        self.on_progress = on_progress
+        self.on_title = on_title
+        self.on_log = on_log
+        self.on_status = on_status
+        # Called once the network part is done and only post-processing is left
+        self.on_downloaded = on_downloaded
+        # When set, merging/transcoding runs in this pool instead of on the download thread
+        self.post_processor = post_processor
+        # When set, the YoutubeDL is borrowed from this pool instead of built for this item alone
+        self.sessions = sessions
+        self._pending: List[PostProcessTask] = []
+        # How the formats were chosen and what post-processing that costs; set once known
+        self.plan: FormatPlan | None = None
+        # Keep yt-dlp's own screen output off stdout (used by the CLI's JSON output)
+        self.quiet = quiet
+        # Bytes of files already finished for this item (video/audio parts before merging)
+        self._bytes_done = 0
+        self._files_done = 0
+        # Speed and ETA are computed here the same way whichever downloader reports
+        self._speed = SpeedMeter()
+        # Last downloaded_bytes seen per file, to charge only new bytes to the limiter
+        self._seen_bytes: Dict[str, int] = {}
+        self._limiter = BandwidthLimiter.shared()
+        # Auto speed mode: concurrency chosen per host and adjusted after every file
+        self._tuner: ConcurrencyTuner | None = None
+        self._host = host_key(url)
+        self._concurrency = 1
+        self._ydl: Any = None
+        self._external = False
+        # Single-file formats are fetched over several connections by SegmentedHttpFD
+        self._segmented = False
+        # PAUSED or CANCELLED once requested; checked at every progress report
+        self._stop_request = ""
+        # Set when the last run ended because of such a request
+        self.stopped = ""
+        # Per file: downloaded_bytes when first seen (resumed parts don't count) and whether it is fragmented
+        self._start_bytes: Dict[str, int] = {}
+        self._fragmented: Dict[str, bool] = {}
+        self.metrics = DownloadMetrics(url, self._host)
+        # Bytes copied inside the kernel (fragment assembly, moves out of the staging folder)
+        self.io = IoSavings()
+
+    def _log(self, message: str) -> None:
+        if self.on_log is not None:
+            self.on_log(message)
+
+    def _status(self, status: str) -> None:
+        if self.on_status is not None:
+            self.on_status(status)
+
+    def _title(self, title: str) -> None:
+        if self.on_title is not None:
+            self.on_title(title)
+
+    def _progress_hook(self, d: Dict[str, Any]) -> None:
+        status = d.get("status")
+        if status == "downloading":
+            if self._stop_request:
+                self._stop_external(d)
+                raise DownloadInterrupted(self._stop_request)
+            # Sleeping here holds back the downloading thread, keeping all items within the budget
+            filename = d.get("filename") or ""
+            received = int(d.get("downloaded_bytes") or 0)
+            self._start_bytes.setdefault(filename, received)
+            if d.get("fragment_count"):
+                self._fragmented[filename] = True
+            # Bytes a resumed file already had on disk were not transferred now
+            previous = self._seen_bytes.get(filename, self._start_bytes[filename])
+            self._seen_bytes[filename] = received
+            if received > previous:
+                self.metrics.bytes += received - previous
+                if d.get(SELF_LIMITED) or (d.get("info_dict") or {}).get("__rpc"):
+                    # Already capped at the fair share by aria2c or the segmented downloader
+                    self._limiter.account(self, received - previous)
+                else:
+                    self._limiter.throttle(self, received - previous)
+            speed = self._speed.update(self.metrics.bytes)
+            self.metrics.peak_bps = max(self.metrics.peak_bps, speed)
+            self._emit_progress(d, received, PHASE_DOWNLOADING)
+        elif status == "finished":
+            filename = d.get("filename") or ""
+            size = int(d.get("total_bytes") or d.get("downloaded_bytes") or 0)
+            if filename in self._start_bytes:
+                # Downloaders that report sparsely (aria2c) may not have shown the last bytes
+                self.metrics.bytes += max(0, size - self._seen_bytes.get(filename, self._start_bytes[filename]))
+            self._emit_progress(d, size, PHASE_FINISHED)
+            self._bytes_done += size
+            self._files_done += 1
+            self._tune(d)
+            self._log("Merging/processing...")
+
+    def _emit_progress(self, d: Dict[str, Any], received: int, phase: str) -> None:
+        if self.on_progress is None:
+            return
+        estimate = not d.get("total_bytes")
+        total = int(d.get("total_bytes") or d.get("total_bytes_estimate") or 0)
+        if phase == PHASE_FINISHED:
+            estimate, total = False, received
+        downloaded = self._bytes_done + received
+        total = self._bytes_done + max(total, received)
+        self.on_progress(
+            ProgressEvent(
+                downloaded_bytes=downloaded,
+                total_bytes=total,
+                total_is_estimate=estimate,
+                speed_bps=self._speed.rate,
+                eta_seconds=self._speed.eta(total - downloaded),
+                fragment_index=d.get("fragment_index"),
+                fragment_count=d.get("fragment_count"),
+                file_index=self._files_done,
+                phase=phase,
+                elapsed=float(d.get("elapsed") or 0.0),
+            )
+        )
+
+    def _tune(self, d: Dict[str, Any]) -> None:
+        filename = d.get("filename") or ""
+        # Concurrency only matters for fragmented files and aria2c's split downloads;
+        # under a bandwidth cap the measured rate says nothing about the link
+        if self._tuner is None or self._limiter.rate > 0:
+            return
+        if not (self._external or self._segmented or self._fragmented.get(filename)):
+            return
+        size = int(d.get("downloaded_bytes") or d.get("total_bytes") or 0) - self._start_bytes.get(filename, 0)
+        chosen = self._tuner.report(self._host, self._concurrency, size, float(d.get("elapsed") or 0.0))
+        if chosen != self._concurrency:
+            self._log(f"Auto speed: {chosen} connections for {self._host or 'this site'}")
+            self._concurrency = chosen
+            # Downloaders read this when they start, so the next file of this item uses it
+            if self._ydl is not None:
+                key = "aria2_connections" if self._external else "concurrent_fragment_downloads"
+                self._ydl.params[key] = min(16, chosen) if self._external else chosen
+                if self._segmented:
+                    self._ydl.params["segment_connections"] = min(16, chosen)
+
+    def run(self) -> tuple[bool, str]:
+        """Download the item; returns (success, final file path).
+
+        After :meth:`pause` or :meth:`cancel` this returns (False, "") with
+        :attr:`stopped` set; running again continues from the partial files.
+        """
+        self.metrics = DownloadMetrics(self.url, self._host)
+        self.io = IoSavings()
+        self.stopped = ""
+        ok = False
+        try:
+            ok, path = self._run()
+            return ok, path
+        finally:
+            self.metrics.plan = self.plan.action if self.plan is not None else ""
+            self.metrics.io_saved_bytes = self.io.bytes
+            self.metrics.finish(self.metrics.result or ("ok" if ok else "error"))
+            MetricsRecorder.shared().record(self.metrics)
+
+    def _run(self) -> tuple[bool, str]:
+        import yt_dlp as ytdlp
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        settings = AppSettings.cached()
+        work_dir = self._work_dir(settings.staging_dir)
+        enable_in_place_assembly()
+        if settings.auto_concurrency:
+            self._tuner = ConcurrencyTuner.shared()
+            self._concurrency = self._tuner.concurrency(self._host)
+        else:
+            self._concurrency = max(1, int(settings.concurrent_fragments or 8))
+        # Speed tuning options: use concurrent fragment downloads if supported,
+        # and aria2c if the user has it installed (yt-dlp auto-detects when "external_downloader": "aria2c")
+        ydl_opts: Dict[str, Any] = {
+            "outtmpl": os.path.join(work_dir, "%(title)s.%(ext)s"),
+            "noprogress": True,
+            "ignoreerrors": True,
+            # Collections are expanded into one queue item per video; a video URL that also
+            # names its playlist (watch?v=...&list=...) is just the video
+            "noplaylist": True,
+            "merge_output_format": "mp4",
+            "format": fallback_plan(self.format_mode, self.advanced_options).format,
+            "postprocessors": [],
+            "no_color": True,
+            "quiet": self.quiet,
+            # Try to accelerate large downloads
+            "concurrent_fragment_downloads": self._concurrency,
+            # Keep .part/fragment files and continue from them after an interruption
+            "continuedl": True,
+            "nopart": False,
+            "retries": 20,
+            "fragment_retries": 20,
+            "throttled_rate": 0,
+        }
+        # Container, quality and post-processors are planned once the available formats are known
+        container = self.advanced_options.get("container") if isinstance(self.advanced_options, dict) else None
+        if container in {"mp4", "mkv", "webm"}:
+            ydl_opts["merge_output_format"] = container
+        toolchain = ToolchainService.shared()
+        ydl_factory: Callable[[Dict[str, Any]], Any] = ytdlp.YoutubeDL
+        session_key: Any = "yt-dlp"
+        ffdir = toolchain.location("ffmpeg")
+        if ffdir:
+            ydl_opts["ffmpeg_location"] = ffdir
+        if settings.use_aria2c:
+            # Never hold a download back for aria2c; use the native downloader until it is ready
+            ardir = toolchain.location("aria2c")
+            if ardir is None:
+                toolchain.request("aria2c")
+            if ardir:
+                # aria2c allows at most 16 connections per server
+                connections = min(16, self._concurrency) if self._tuner is not None else 16
+                self._external = True
+                ydl_opts["external_downloader"] = "aria2c"
+                ydl_opts["external_downloader_args"] = {
+                    "aria2c": [
+                        f"-x{connections}",
+                        f"-s{connections}",
+                        "-j16",
+                        "--min-split-size=1M",
+                        f"--max-connection-per-server={connections}",
+                    ]
+                }
+                # aria2c runs out of process; give it this item's share of the budget up front
+                share = self._limiter.fair_share()
+                if share > 0:
+                    ydl_opts["external_downloader_args"]["aria2c"].append(f"--max-download-limit={int(share)}")
+                if settings.aria2_rpc:
+                    rpc = self._rpc_factory(toolchain.path("aria2c"))
+                    if rpc is not None:
+                        ydl_opts["aria2_connections"] = connections
+                        ydl_factory, session_key = rpc
+        if settings.segmented_download and not self._external:
+            from downloader.segmented import SegmentedYoutubeDL
+
+            self._segmented = True
+            ydl_opts["segment_connections"] = min(16, self._concurrency)
+            ydl_factory = functools.partial(SegmentedYoutubeDL, rate_limit=self._limiter.fair_share)
+            session_key = "segmented"
+
+        cache = InfoCache.shared()
+        # Snapshot for the post-processing pool; YoutubeDL rewrites some of its params in place
+        pp_params = dict(ydl_opts)
+        self._limiter.register(self)
+        session: DownloadSession | None = None
+        healthy = True
+        try:
+            if self.sessions is not None:
+                session = self.sessions.acquire(session_key, ydl_factory, ydl_opts)
+            else:
+                session = DownloadSession(session_key, ydl_factory, ydl_opts)
+            ydl = session.begin(ydl_opts, self._progress_hook)
+            self._ydl = ydl
+            # Not in ydl_opts: the post-processing pool gets a pickled copy of those
+            ydl.params[IO_SAVINGS_PARAM] = self.io
+            if self.post_processor is not None:
+                # yt-dlp calls this once the file is downloaded; hand the work to the pool instead
+                ydl.post_process = functools.partial(self._defer_post_process, pp_params)
+            self._instrument(ydl)
+            with self.metrics.phase("extract"):
+                info, from_cache = self._extract(ydl, cache)
+            if info is None:
+                return False, ""
+            self.metrics.cache_hit = from_cache
+            self.metrics.extractor = info.get("extractor_key") or ""
+            self.metrics.video_id = str(info.get("id") or "")
+            title = info.get("title")
+            if title:
+                self._title(title)
+            done_path = archived_path(self._info_key(info), self.format_mode, self.advanced_options)
+            if done_path:
+                self._log(f"Already downloaded: {done_path}")
+                self.metrics.result = "skipped"
+                return True, done_path
+            self._apply_plan(ydl, plan_formats(info, self.format_mode, self.advanced_options), pp_params)
+            if self._stop_request:
+                raise DownloadInterrupted(self._stop_request)
+            info = self._download(ydl, info)
+            if from_cache and not self._downloaded(info):
+                # Stream URLs in the cached entry may have gone stale; extract afresh once
+                self._log("Cached metadata did not work, extracting again...")
+                cache.invalidate(info.get("extractor_key") or "", info.get("id") or "")
+                with self.metrics.phase("extract"):
+                    info, _ = self._extract(ydl, None)
+                if info is None:
+                    return False, ""
+                info = self._download(ydl, info)
+            if not self._downloaded(info):
+                if self._tuner is not None and self._seen_bytes:
+                    # Failing mid-transfer is often the server pushing back on too many connections
+                    self._tuner.report_failure(self._host, self._concurrency)
+                return False, ""
+            final_path = self._final_path(info) or ydl.prepare_filename(info)
+            if self._pending:
+                final_path = self._run_pending()
+                if not final_path:
+                    return False, ""
+            if work_dir != self.output_dir:
+                final_path = self._publish(final_path)
+            if self.io.bytes:
+                self._log(f"{format_bytes(self.io.bytes)} copied inside the kernel instead of through the app")
+            self._archive(info, final_path)
+            return True, final_path
+        except DownloadInterrupted as exc:
+            # .part and fragment files stay where they are for the next run to continue from
+            healthy = False
+            self.stopped = exc.reason
+            self.metrics.result = exc.reason.lower()
+            self._log(f"{exc.reason}: {self.url}")
+            return False, ""
+        except Exception as exc:
+            # The YoutubeDL may be left mid-download; don't hand it to the next item
+            healthy = False
+            self._log(f"Error: {exc}")
+            return False, ""
+        finally:
+            self._limiter.unregister(self)
+            self._ydl = None
+            if session is not None and self.sessions is not None:
+                self.sessions.release(session, healthy)
+            elif session is not None:
+                session.close()
+
+    def _work_dir(self, staging_dir: str | None) -> str:
+        """Where the item is downloaded and processed: a staging folder if one is set, else the output folder."""
+        if not staging_dir:
+            return self.output_dir
+        # One subfolder per output folder, so equal titles bound for different folders don't collide
+        digest = hashlib.sha1(os.path.abspath(self.output_dir).encode("utf-8")).hexdigest()[:12]
+        path = os.path.join(staging_dir, digest)
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError as exc:
+            self._log(f"Cannot use the staging folder {staging_dir} ({exc}); downloading to the output folder")
+            return self.output_dir
+        return path
+
+    def _publish(self, path: str) -> str:
+        """Move the finished file from the staging folder into the output folder."""
+        target = os.path.join(self.output_dir, os.path.basename(path))
+        with self.metrics.phase("move"):
+            self.io.add(move_into_place(path, target))
+        return target
+
+    def _instrument(self, ydl: Any) -> None:
+        # Post-processors running inline add their time to the merge/postprocess/move phases
+        time_postprocessors(ydl, self.metrics.phases)
+        # Wrap the class method, not a previous item's wrapper, when the YoutubeDL is reused
+        to_screen = functools.partial(type(ydl).to_screen, ydl)
+
+        def _count_retries(message: str, *args: Any, **kwargs: Any) -> Any:
+            # yt-dlp announces every download, fragment and extractor retry on screen
+            if "Retrying" in message:
+                self.metrics.retries += 1
+            return to_screen(message, *args, **kwargs)
+
+        ydl.to_screen = _count_retries
+
+    def _download(self, ydl: Any, info: Dict[str, Any]) -> Dict[str, Any]:
+        post_processing = self._post_processing_seconds()
+        start = time.perf_counter()
+        info = ydl.process_ie_result(info, download=True)
+        elapsed = time.perf_counter() - start - (self._post_processing_seconds() - post_processing)
+        self.metrics.add_phase("download", elapsed)
+        return info
+
+    def _post_processing_seconds(self) -> float:
+        return sum(self.metrics.phases.get(phase, 0.0) for phase in ("merge", "postprocess", "move"))
+
+    def pause(self) -> None:
+        """Stop the transfer soon, keeping its partial data; :meth:`run` again to resume.
+
+        May be called from any thread. The download thread stops at its next
+        progress report, leaving ``.part`` and fragment files (and aria2c's
+        control files) on disk, so the next run continues from the same byte.
+        """
+        self._request_stop(PAUSED)
+
+    def cancel(self) -> None:
+        """Like :meth:`pause`, but the item is not meant to be resumed by itself."""
+        self._request_stop(CANCELLED)
+
+    def _request_stop(self, reason: str) -> None:
+        self._stop_request = reason
+        ydl = self._ydl
+        if ydl is not None and hasattr(ydl, "pause"):
+            # The shared aria2c daemon halts the transfer now instead of at its next poll
+            ydl.pause()
+
+    @staticmethod
+    def _stop_external(d: Dict[str, Any]) -> None:
+        # yt-dlp waits for its aria2c process to exit; make it exit now (it keeps its control file)
+        rpc = (d.get("info_dict") or {}).get("__rpc")
+        if not rpc:
+            return
+        client = Aria2Client(f"http://127.0.0.1:{rpc['port']}/jsonrpc", rpc.get("secret") or "", timeout=2.0)
+        try:
+            client.call("aria2.forceShutdown")
+        except Aria2RpcError:
+            pass
+        finally:
+            client.close()
+
+    def _defer_post_process(
+        self, params: Dict[str, Any], filename: str, info: Dict[str, Any], files_to_move: Dict[str, Any] | None = None
+    ) -> Dict[str, Any]:
+        ydl = self._ydl
+        if not info.get("__postprocessors") and not ydl._pps["post_process"] and not ydl._pps["after_move"]:
+            # Only moving the file into place is left; not worth a trip to another process
+            return type(ydl).post_process(ydl, filename, info, files_to_move)
+        extra = [type(pp).__name__ for pp in info.get("__postprocessors") or []]
+        self._pending.append(
+            PostProcessTask(
+                params,
+                filename,
+                ydl.sanitize_info(info),
+                dict(files_to_move or {}),
+                extra,
+                action=self.plan.action if self.plan is not None else "",
+            )
+        )
+        info["filepath"] = filename
+        return info
+
+    def _run_pending(self) -> str:
+        """Wait for the deferred post-processing; returns the final path, or "" on failure."""
+        if self.on_downloaded is not None:
+            self.on_downloaded()
+        path = ""
+        for task in self._pending:
+            self._status(STAGE_WAITING)
+            submitted = time.perf_counter()
+            try:
+                future = self.post_processor.submit(task)
+                announced = False
+                while not wait([future], timeout=0.2).done:
+                    if not announced and future.running():
+                        self._status(task.stage)
+                        announced = True
+                result = future.result()
+            except Exception as exc:
+                self._log(f"Post-processing error: {exc}")
+                return ""
+            for phase, seconds in result.timings.items():
+                self.metrics.add_phase(phase, seconds)
+            # Time spent queued for a pool process, plus the hand-over itself
+            self.metrics.add_phase("postprocess_wait", time.perf_counter() - submitted - sum(result.timings.values()))
+            if not result.ok:
+                self._log(f"Post-processing error: {result.error}")
+                return ""
+            path = result.path
+        self._pending.clear()
+        return path
+
+    def _rpc_factory(self, executable: str | None) -> tuple[Callable[[Dict[str, Any]], Any], Any] | None:
+        """YoutubeDL factory that routes HTTP(S) downloads to the shared aria2c daemon, and its session key."""
+        client = Aria2Daemon.shared().client(executable) if executable else None
+        if client is None:
+            self._log("aria2c RPC is not available; starting aria2c per download")
+            return None
+        from downloader.rpc_download import RpcYoutubeDL
+
+        def _factory(params: Dict[str, Any]) -> Any:
+            return RpcYoutubeDL(params, client, rate_limit=self._limiter.fair_share)
+
+        # A restarted daemon has a new client; sessions bound to the old one must not be reused
+        return _factory, ("aria2c-rpc", id(client))
+
+    def _extract(self, ydl: Any, cache: InfoCache | None) -> tuple[Optional[Dict[str, Any]], bool]:
+        """Return (info, from_cache), preferring a cached entry over a network round-trip."""
+        if cache is not None:
+            info = cache.get_for_url(self.url)
+            if info is None and self.video_key is not None:
+                info = cache.get(*self.video_key)
+            if info is not None:
+                self._log(f"Using cached metadata for {info.get('title') or self.url}")
+                return info, True
+        info = ydl.extract_info(self.url, download=False)
+        if not isinstance(info, dict):
+            return None, False
+        cache = cache or InfoCache.shared()
+        if cache is not None:
+            cache.put(ydl.sanitize_info(info, remove_private_keys=True), url=self.url)
+        return info, False
+
+    @staticmethod
+    def _info_key(info: Dict[str, Any]) -> tuple[str, str] | None:
+        extractor = info.get("extractor_key") or info.get("ie_key")
+        video_id = info.get("id")
+        if not extractor or not video_id or info.get("_type", "video") != "video":
+            return None
+        return extractor, video_id
+
+    def _archive(self, info: Dict[str, Any], path: str) -> None:
+        key = self._info_key(info)
+        archive = DownloadArchive.shared()
+        if key is None or archive is None or not os.path.isfile(path):
+            return
+        archive.record(
+            *key,
+            request_signature(self.format_mode, self.advanced_options),
+            str(info.get("format_id") or ""),
+            path,
+        )
+
+    def _apply_plan(self, ydl: Any, plan: FormatPlan, pp_params: Dict[str, Any]) -> None:
+        from yt_dlp.postprocessor import get_postprocessor
+
+        self.plan = plan
+        self._log(f"Format plan: {plan.describe()}")
+        ydl.params["format"] = plan.format
+        ydl.format_selector = ydl.build_format_selector(plan.format)
+        if plan.merge_output_format:
+            ydl.params["merge_output_format"] = pp_params["merge_output_format"] = plan.merge_output_format
+        if plan.needs_ffmpeg and not ydl.params.get("ffmpeg_location"):
+            toolchain = ToolchainService.shared()
+            ffdir = toolchain.location("ffmpeg")
+            if ffdir is None:
+                self._log("Waiting for ffmpeg to be ready...")
+                ffdir = toolchain.wait("ffmpeg")
+            if ffdir:
+                ydl.params["ffmpeg_location"] = pp_params["ffmpeg_location"] = ffdir
+        for pp_def in plan.postprocessors:
+            options = {key: value for key, value in pp_def.items() if key != "key"}
+            ydl.add_post_processor(get_postprocessor(pp_def["key"])(ydl, **options), when="post_process")
+        pp_params["postprocessors"] = list(pp_params.get("postprocessors") or []) + plan.postprocessors
+
+    @staticmethod
+    def _downloaded(info: Dict[str, Any]) -> bool:
+        # With ignoreerrors yt-dlp reports failures instead of raising; a video
+        # only got a final filepath if its download and post-processing ran.
+        if info.get("_type", "video") != "video":
+            return True
+        return any(d.get("filepath") for d in info.get("requested_downloads") or [])
+
+    @staticmethod
+    def _final_path(info: Dict[str, Any]) -> str:
+        for download in info.get("requested_downloads") or []:
+            if download.get("filepath"):
+                return download["filepath"]
+        return ""
+
+
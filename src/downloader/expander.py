@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from PySide6.QtCore import QObject, Signal, QThread
+
+from downloader.playlist import iter_entry_pages
+
+
+class ExpanderSignals(QObject):
+    entries = Signal(str, object)  # source url, list of entry dicts (url, title, id, ie_key)
+    log = Signal(str)
+    finished = Signal(str, int)  # source url, number of entries found (-1 if none)
+
+
+class PlaylistExpander(QThread):
+    """Lists a playlist/channel in the background and streams its entries page by page."""
+
+    def __init__(self, url: str, page_size: int = 50) -> None:
+        super().__init__()
+        self.url = url
+        self.page_size = page_size
+        self.signals = ExpanderSignals()
+
+    def run(self) -> None:
+        found = 0
+        try:
+            for page in iter_entry_pages(self.url, page_size=self.page_size):
+                found += len(page)
+                self.signals.entries.emit(self.url, page)
+        except Exception as exc:
+            self.signals.log.emit(f"Error while listing {self.url}: {exc}")
+        # Nothing listed (error or unsupported site): let the caller fall back
+        self.signals.finished.emit(self.url, found if found else -1)
@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+# What a plan costs after the download: nothing, a stream copy into another container, or a transcode
+ACTION_COPY = "copy"
+ACTION_REMUX = "remux"
+ACTION_ENCODE = "encode"
+
+# Audio modes: (codec the file should end up in, extension, FFmpegExtractAudio preferredcodec)
+AUDIO_TARGETS = {
+    "Audio only (m4a)": ("aac", "m4a", "m4a"),
+    "Audio only (mp3)": ("mp3", "mp3", "mp3"),
+}
+# Bitrate used when mp3 has to be encoded and no audio quality was chosen
+DEFAULT_MP3_QUALITY = "192"
+# A stream up to this much above the requested bitrate is copied rather than re-encoded down
+BITRATE_TOLERANCE = 1.25
+
+# Codecs each merge container can take by stream copy (mkv takes anything)
+CONTAINER_CODECS = {
+    "mp4": ({"h264", "hevc", "av1", "vp9"}, {"aac", "mp3", "opus", "ac3", "eac3", "flac"}),
+    "webm": ({"vp8", "vp9", "av1"}, {"opus", "vorbis"}),
+}
+
+_VIDEO_CODEC_PREFIXES = {"avc": "h264", "h264": "h264", "hev": "hevc", "hvc": "hevc", "h265": "hevc",
+                         "vp09": "vp9", "vp9": "vp9", "vp8": "vp8", "av01": "av1", "av1": "av1"}
+_AUDIO_CODEC_PREFIXES = {"mp4a": "aac", "aac": "aac", "opus": "opus", "vorbis": "vorbis", "mp3": "mp3",
+                         "ac-3": "ac3", "ac3": "ac3", "ec-3": "eac3", "eac3": "eac3", "flac": "flac"}
+
+
+@dataclass
+class FormatPlan:
+    """Formats to download and the post-processing they need."""
+
+    format: str
+    action: str
+    detail: str
+    postprocessors: List[Dict[str, Any]] = field(default_factory=list)
+    merge_output_format: Optional[str] = None
+
+    @property
+    def needs_ffmpeg(self) -> bool:
+        return self.action != ACTION_COPY or "+" in self.format
+
+    def describe(self) -> str:
+        return f"{self.action} ({self.detail})"
+
+
+def _codec(value: Any, prefixes: Dict[str, str]) -> str:
+    value = str(value or "").lower()
+    for prefix, name in prefixes.items():
+        if value.startswith(prefix):
+            return name
+    return ""
+
+
+def video_codec(fmt: Dict[str, Any]) -> str:
+    return _codec(fmt.get("vcodec"), _VIDEO_CODEC_PREFIXES)
+
+
+def audio_codec(fmt: Dict[str, Any]) -> str:
+    codec = _codec(fmt.get("acodec"), _AUDIO_CODEC_PREFIXES)
+    if not codec and fmt.get("acodec") is None:
+        # Unknown codec; the extension is the best remaining hint
+        codec = {"m4a": "aac", "mp3": "mp3", "opus": "opus", "ogg": "vorbis"}.get(fmt.get("ext") or "", "")
+    return codec
+
+
+def _abr(fmt: Dict[str, Any]) -> float:
+    return float(fmt.get("abr") or fmt.get("tbr") or 0.0)
+
+
+def _has_audio(fmt: Dict[str, Any]) -> bool:
+    return fmt.get("acodec") != "none"
+
+
+def _has_video(fmt: Dict[str, Any]) -> bool:
+    return fmt.get("vcodec") != "none"
+
+
+def _parse_height(video_quality: Any) -> Optional[int]:
+    if not isinstance(video_quality, str) or video_quality.lower() == "best":
+        return None
+    try:
+        return int(video_quality.lower().replace("p", ""))
+    except ValueError:
+        return None
+
+
+def _parse_bitrate(audio_quality: Any) -> Optional[int]:
+    if not isinstance(audio_quality, str) or audio_quality.lower() == "best":
+        return None
+    try:
+        return int(audio_quality.lower().replace("k", ""))
+    except ValueError:
+        return None
+
+
+def _usable(formats: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Storyboards and DRM-protected streams can't be downloaded into media files
+    return [
+        f for f in formats
+        if f.get("format_id") and (_has_audio(f) or _has_video(f)) and f.get("ext") != "mhtml" and not f.get("has_drm")
+    ]
+
+
+def plan_formats(info: Dict[str, Any], format_mode: str, advanced_options: dict | None = None) -> FormatPlan:
+    """Choose formats for ``info`` that avoid transcoding wherever the request allows it."""
+    options = advanced_options or {}
+    container = options.get("container") if options.get("container") in {"mp4", "mkv", "webm"} else None
+    height = _parse_height(options.get("video_quality"))
+    bitrate = _parse_bitrate(options.get("audio_quality"))
+    formats = _usable(info.get("formats") or [])
+    if not formats:
+        return fallback_plan(format_mode, options)
+    if format_mode in AUDIO_TARGETS:
+        return _plan_audio(formats, format_mode, bitrate)
+    return _plan_video(formats, format_mode, container, height, bitrate)
+
+
+def _plan_audio(formats: List[Dict[str, Any]], format_mode: str, bitrate: Optional[int]) -> FormatPlan:
+    codec, ext, preferred = AUDIO_TARGETS[format_mode]
+    audio_only = [f for f in formats if _has_audio(f) and not _has_video(f)]
+    sources = audio_only or [f for f in formats if _has_audio(f)]
+    if not sources:
+        return fallback_plan(format_mode, {"audio_quality": f"{bitrate}k" if bitrate else None})
+
+    pick = None
+    matching = [f for f in sources if audio_codec(f) == codec]
+    if matching:
+        within = [f for f in matching if bitrate is None or 0 < _abr(f) <= bitrate * BITRATE_TOLERANCE]
+        if within:
+            pick = max(within, key=_abr)
+        elif all(not _abr(f) for f in matching):
+            pick = matching[-1]
+    if pick is not None:
+        rate = f" {_abr(pick):.0f}k" if _abr(pick) else ""
+        if pick.get("ext") == ext and not _has_video(pick):
+            return FormatPlan(pick["format_id"], ACTION_COPY, f"{codec}{rate} as downloaded")
+        return FormatPlan(
+            pick["format_id"],
+            ACTION_REMUX,
+            f"{codec}{rate} copied into .{ext}",
+            [{"key": "FFmpegExtractAudio", "preferredcodec": preferred}],
+        )
+
+    # Nothing to copy: encode once, from the best source available
+    source = max(sources, key=_abr)
+    quality = str(bitrate) if bitrate else (DEFAULT_MP3_QUALITY if preferred == "mp3" else None)
+    pp: Dict[str, Any] = {"key": "FFmpegExtractAudio", "preferredcodec": preferred}
+    if quality:
+        pp["preferredquality"] = quality
+    src = audio_codec(source) or source.get("ext") or "audio"
+    return FormatPlan(
+        source["format_id"], ACTION_ENCODE, f"{src} -> {codec}" + (f" {quality}k" if quality else ""), [pp]
+    )
+
+
+def _compatible(container: str, video: Dict[str, Any] | None, audio: Dict[str, Any] | None) -> bool:
+    allowed = CONTAINER_CODECS.get(container)
+    if allowed is None:
+        return True
+    video_ok = video is None or video_codec(video) in allowed[0]
+    audio_ok = audio is None or audio_codec(audio) in allowed[1]
+    return video_ok and audio_ok
+
+
+def _into_container(pick: Dict[str, Any], container: Optional[str], what: str, as_is: str) -> FormatPlan:
+    """Plan for one downloaded file: kept as is, remuxed into ``container``, or converted once if its codecs don't fit."""
+    ext = pick.get("ext")
+    if container is None or ext == container:
+        return FormatPlan(pick["format_id"], ACTION_COPY, as_is)
+    if _compatible(container, pick, pick if _has_audio(pick) else None):
+        return FormatPlan(
+            pick["format_id"],
+            ACTION_REMUX,
+            f"{what} copied from .{ext} into .{container}",
+            [{"key": "FFmpegVideoRemuxer", "preferedformat": container}],
+        )
+    return FormatPlan(
+        pick["format_id"],
+        ACTION_ENCODE,
+        f"{what} -> .{container} (codecs don't fit)",
+        [{"key": "FFmpegVideoConvertor", "preferedformat": container}],
+    )
+
+
+def _plan_video(
+    formats: List[Dict[str, Any]],
+    format_mode: str,
+    container: Optional[str],
+    height: Optional[int],
+    bitrate: Optional[int],
+) -> FormatPlan:
+    def fits(f: Dict[str, Any]) -> bool:
+        return height is None or not f.get("height") or f["height"] <= height
+
+    videos = [f for f in formats if _has_video(f) and not _has_audio(f) and fits(f)]
+    muxed = [f for f in formats if _has_video(f) and _has_audio(f) and fits(f)]
+    audios = [f for f in formats if _has_audio(f) and not _has_video(f)]
+    target = container or "mp4"
+
+    def rank(f: Dict[str, Any], compatible: bool) -> tuple:
+        # A container the user picked outranks resolution: copying into it beats re-encoding a sharper stream
+        if container is not None:
+            return (compatible, f.get("height") or 0, f.get("tbr") or 0)
+        return (f.get("height") or 0, compatible, f.get("tbr") or 0)
+
+    def video_rank(f: Dict[str, Any]) -> tuple:
+        return rank(f, _compatible(target, f, None))
+
+    def muxed_rank(f: Dict[str, Any]) -> tuple:
+        return rank(f, _compatible(target, f, f))
+
+    def within(abr: float) -> bool:
+        return bitrate is None or 0 < abr <= bitrate * BITRATE_TOLERANCE
+
+    if format_mode == "Best video only":
+        candidates = videos or muxed
+        if not candidates:
+            return fallback_plan(format_mode, {"video_quality": f"{height}p" if height else None})
+        pick = max(candidates, key=video_rank)
+        codec = video_codec(pick) or pick.get("ext")
+        return _into_container(pick, container, codec, f"{codec} as downloaded")
+
+    best_muxed = max(muxed, key=muxed_rank) if muxed else None
+    best_video = max(videos, key=video_rank) if videos else None
+    audio = None
+    if best_video is not None and audios:
+        def audio_rank(f: Dict[str, Any]) -> tuple:
+            ok = within(_abr(f))
+            return (_compatible(target, best_video, f), ok, _abr(f) if ok else -_abr(f))
+
+        audio = max(audios, key=audio_rank)
+
+    use_muxed = audio is None
+    if best_muxed is not None and audio is not None:
+        # Muxed "tbr" covers both streams, so only a listed "abr" says anything about its audio
+        muxed_abr = float(best_muxed.get("abr") or 0.0)
+        muxed_score = (*muxed_rank(best_muxed)[:2], not muxed_abr or within(muxed_abr))
+        pair_score = (*rank(best_video, _compatible(target, best_video, audio))[:2], within(_abr(audio)))
+        # Ties go to the single file, which needs no merge
+        use_muxed = muxed_score >= pair_score
+    if use_muxed:
+        if best_muxed is None:
+            return fallback_plan(format_mode, {"video_quality": f"{height}p" if height else None})
+        # A single file with both streams needs no merge at all
+        codecs = f"{video_codec(best_muxed) or '?'}+{audio_codec(best_muxed) or '?'}"
+        return _into_container(best_muxed, container, codecs, f"{best_muxed.get('ext')} with audio, no merge")
+
+    pair = f"{video_codec(best_video) or '?'}+{audio_codec(audio) or '?'}"
+    format_id = f"{best_video['format_id']}+{audio['format_id']}"
+    if _compatible(target, best_video, audio):
+        return FormatPlan(format_id, ACTION_REMUX, f"{pair} merged into .{target}", merge_output_format=target)
+    if container is None:
+        # Merging is a stream copy; pick a container that takes these codecs rather than re-encoding
+        return FormatPlan(
+            format_id, ACTION_REMUX, f"{pair} merged into .mkv (not .{target}: codecs don't fit)", merge_output_format="mkv"
+        )
+    # The chosen container can't take any available pair: merge losslessly, then encode once into it
+    return FormatPlan(
+        format_id,
+        ACTION_ENCODE,
+        f"{pair} merged, then -> .{container} (codecs don't fit)",
+        [{"key": "FFmpegVideoConvertor", "preferedformat": container}],
+        merge_output_format="mkv",
+    )
+
+
+def fallback_plan(format_mode: str, advanced_options: dict | None = None) -> FormatPlan:
+    """Plan from yt-dlp format expressions alone, for when no format list is available."""
+    options = advanced_options or {}
+    height = _parse_height(options.get("video_quality"))
+    bitrate = _parse_bitrate(options.get("audio_quality"))
+    if format_mode in AUDIO_TARGETS:
+        codec, ext, preferred = AUDIO_TARGETS[format_mode]
+        quality = str(bitrate) if bitrate else (DEFAULT_MP3_QUALITY if preferred == "mp3" else None)
+        pp: Dict[str, Any] = {"key": "FFmpegExtractAudio", "preferredcodec": preferred}
+        if quality:
+            pp["preferredquality"] = quality
+        # FFmpegExtractAudio copies instead of encoding when the stream already has the target codec
+        return FormatPlan(f"bestaudio[ext={ext}]/bestaudio/best", ACTION_ENCODE, f"-> {codec}, copied if possible", [pp])
+    cap = f"[height<={height}]" if height else ""
+    if format_mode == "Best video only":
+        return FormatPlan(f"bestvideo{cap}/best{cap}", ACTION_COPY, "best video stream")
+    audio = f"(bestaudio[abr<={bitrate}]/bestaudio)" if bitrate else "bestaudio"
+    return FormatPlan(
+        f"bestvideo{cap}+{audio}/best{cap}",
+        ACTION_REMUX,
+        "best streams, merged",
+        merge_output_format=options.get("container") or None,
+    )
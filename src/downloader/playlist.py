@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import itertools
+import time
+from typing import Any, Dict, Iterator, List
+from urllib.parse import parse_qs, urlparse
+
+
+COLLECTION_PATH_MARKERS = ("/playlist", "/channel/", "/c/", "/user/", "/@")
+COLLECTION_PATH_SUFFIXES = ("/videos", "/shorts", "/streams", "/playlists", "/featured")
+
+
+def looks_like_collection(url: str, whole_playlist: bool = False) -> bool:
+    """Heuristic for URLs that point at a playlist or channel rather than one video.
+
+    A video opened from a playlist or mix (``watch?v=ID&list=...``) is that
+    one video, as with yt-dlp's ``--no-playlist``, unless ``whole_playlist``
+    asks for the playlist around it.
+    """
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return False
+    query = parse_qs(parsed.query)
+    if "list" in query:
+        names_video = "v" in query or ((parsed.hostname or "").endswith("youtu.be") and parsed.path.strip("/"))
+        return whole_playlist or not names_video
+    path = parsed.path.rstrip("/")
+    return any(marker in path for marker in COLLECTION_PATH_MARKERS) or path.endswith(COLLECTION_PATH_SUFFIXES)
+
+
+def _entry_record(entry: Dict[str, Any]) -> Dict[str, Any] | None:
+    url = entry.get("url") or entry.get("webpage_url")
+    if not url:
+        return None
+    return {
+        "url": url,
+        "title": entry.get("title") or "",
+        "id": entry.get("id"),
+        "ie_key": entry.get("ie_key") or entry.get("extractor_key"),
+        # Used to estimate how long the item takes; flat listings often carry only the duration
+        "duration": entry.get("duration"),
+        "filesize": entry.get("filesize") or entry.get("filesize_approx"),
+    }
+
+
+def iter_entry_pages(
+    url: str,
+    page_size: int = 50,
+    first_page_size: int = 10,
+    max_delay: float = 1.0,
+    max_depth: int = 2,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield the videos behind a playlist/channel URL in small pages.
+
+    Uses flat extraction with a lazy playlist so yt-dlp only fetches the
+    listing pages it needs; each page is yielded as soon as it is full, or
+    ``max_delay`` seconds after its first entry, so callers can start work on
+    the first videos long before the whole channel is listed. The first page
+    is kept small for the same reason. Nested playlists (e.g. a channel's
+    playlists tab) are expanded up to ``max_depth`` levels.
+    """
+    import yt_dlp as ytdlp
+
+    opts: Dict[str, Any] = {
+        "extract_flat": "in_playlist",
+        "lazy_playlist": True,
+        "skip_download": True,
+        "ignoreerrors": True,
+        "quiet": True,
+        "no_warnings": True,
+        "no_color": True,
+    }
+    page: List[Dict[str, Any]] = []
+    page_started = 0.0
+    limit = max(1, first_page_size)
+
+    with ytdlp.YoutubeDL(opts) as ydl:
+        for entry in _iter_flat_entries(ydl, url, max_depth):
+            record = _entry_record(entry)
+            if record is None:
+                continue
+            if not page:
+                page_started = time.monotonic()
+            page.append(record)
+            if len(page) >= limit or time.monotonic() - page_started >= max_delay:
+                yield page
+                page = []
+                limit = max(1, page_size)
+    if page:
+        yield page
+
+
+def _iter_flat_entries(ydl, url: str, depth: int, ie_key: str | None = None) -> Iterator[Dict[str, Any]]:
+    info = ydl.extract_info(url, download=False, process=False, ie_key=ie_key)
+    # Follow redirects such as a channel root pointing at its /videos tab
+    hops = 0
+    while isinstance(info, dict) and info.get("_type") in ("url", "url_transparent") and hops < 5:
+        if not looks_like_collection(info.get("url") or ""):
+            yield info
+            return
+        info = ydl.extract_info(info["url"], download=False, process=False, ie_key=info.get("ie_key"))
+        hops += 1
+    if not isinstance(info, dict):
+        return
+    entries = info.get("entries")
+    if entries is None:
+        yield info
+        return
+    for entry in _iter_lazily(entries):
+        if not isinstance(entry, dict):
+            continue
+        entry_url = entry.get("url") or ""
+        nested = entry.get("_type") == "playlist" or looks_like_collection(entry_url)
+        if nested and depth > 0:
+            if entry.get("entries") is not None:
+                for sub in _iter_lazily(entry["entries"]):
+                    if isinstance(sub, dict):
+                        yield sub
+            elif entry_url:
+                yield from _iter_flat_entries(ydl, entry_url, depth - 1, entry.get("ie_key"))
+            continue
+        yield entry
+
+
+def _iter_lazily(entries: Any, chunk: int = 50) -> Iterator[Any]:
+    """Iterate generators as-is and paged lists one slice at a time."""
+    from yt_dlp.utils import PagedList
+
+    if not isinstance(entries, PagedList):
+        yield from entries
+        return
+    for start in itertools.count(0, chunk):
+        items = entries.getslice(start, start + chunk)
+        if not items:
+            return
+        yield from items
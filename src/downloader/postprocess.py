@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+
+# Queue statuses of an item between its download and its final file
+STAGE_WAITING = "Waiting to process"
+STAGE_MERGING = "Merging"
+STAGE_CONVERTING = "Converting"
+STAGE_PROCESSING = "Processing"
+STAGE_STATUSES = (STAGE_WAITING, STAGE_MERGING, STAGE_CONVERTING, STAGE_PROCESSING)
+
+# Post-processors that re-encode rather than remux
+_ENCODING_PPS = {"FFmpegExtractAudio", "FFmpegVideoConvertor"}
+
+
+@dataclass
+class PostProcessTask:
+    """Everything a pool process needs to finish one download; must stay picklable."""
+
+    params: Dict[str, Any]
+    filename: str
+    info: Dict[str, Any]
+    files_to_move: Dict[str, Any] = field(default_factory=dict)
+    # Class names of the per-download post-processors yt-dlp attached (merger, fixups)
+    extra_pps: List[str] = field(default_factory=list)
+    # The format plan's action ("copy", "remux" or "encode"), when one was made
+    action: str = ""
+
+    @property
+    def stage(self) -> str:
+        configured = {pp.get("key") for pp in self.params.get("postprocessors") or []}
+        if self.action == "encode" or (not self.action and configured & _ENCODING_PPS):
+            return STAGE_CONVERTING
+        if "FFmpegMergerPP" in self.extra_pps:
+            return STAGE_MERGING
+        return STAGE_PROCESSING
+
+
+@dataclass
+class PostProcessResult:
+    ok: bool
+    path: str = ""
+    error: str = ""
+    # Seconds per phase (merge, postprocess, move), see time_postprocessors()
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def _phase_of(pp: Any) -> str:
+    name = type(pp).__name__
+    if "Merger" in name:
+        return "merge"
+    if "MoveFiles" in name:
+        return "move"
+    return "postprocess"
+
+
+def time_postprocessors(ydl: Any, timings: Dict[str, float]) -> None:
+    """Accumulate the time each post-processor of ``ydl`` takes into ``timings``, by phase."""
+    # The class method, so timing a reused YoutubeDL again replaces the old wrapper
+    run_pp = functools.partial(type(ydl).run_pp, ydl)
+
+    def _timed(pp: Any, info: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return run_pp(pp, info)
+        finally:
+            phase = _phase_of(pp)
+            timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+    ydl.run_pp = _timed
+
+
+def run_post_processing(task: PostProcessTask) -> PostProcessResult:
+    """Run yt-dlp's post-processing for one download; executed in a pool process."""
+    import yt_dlp
+    import yt_dlp.postprocessor as postprocessors
+
+    params = dict(task.params)
+    # Errors must surface here instead of only being printed
+    params.update({"ignoreerrors": False, "quiet": True, "noprogress": True})
+    timings: Dict[str, float] = {}
+    try:
+        with yt_dlp.YoutubeDL(params) as ydl:
+            time_postprocessors(ydl, timings)
+            info = dict(task.info)
+            info["__postprocessors"] = [getattr(postprocessors, name)(ydl) for name in task.extra_pps]
+            info = ydl.post_process(task.filename, info, dict(task.files_to_move))
+            return PostProcessResult(True, info.get("filepath") or task.filename, timings=timings)
+    except Exception as exc:
+        return PostProcessResult(False, error=str(exc), timings=timings)
+
+
+class PostProcessPool:
+    """Bounded pool of processes that merge and transcode finished downloads.
+
+    Post-processing is CPU-bound and would otherwise hold a download slot
+    while the network sits idle; running it here lets the next download
+    start right away and lets several transcodes use all cores.
+    """
+
+    _shared: "PostProcessPool | None" = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_workers: int | None = None, use_threads: bool = False) -> None:
+        self.max_workers = max_workers or os.cpu_count() or 2
+        # Threads for callers that already run in a process of their own (download pool processes)
+        self.use_threads = use_threads
+        self._lock = threading.Lock()
+        self._executor: Executor | None = None
+
+    @classmethod
+    def shared(cls) -> "PostProcessPool":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def submit(self, task: PostProcessTask) -> Future:
+        with self._lock:
+            if self._executor is None and self.use_threads:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="postprocess")
+            elif self._executor is None:
+                # Spawned rather than forked: the parent runs Qt and download threads
+                self._executor = ProcessPoolExecutor(
+                    self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor.submit(run_post_processing, task)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
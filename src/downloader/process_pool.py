@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import atexit
+import itertools
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import Connection, wait as wait_connections
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from downloader.progress import PHASE_DOWNLOADING, ProgressEvent
+from downloader.ratelimit import BandwidthLimiter
+from downloader.scheduler import host_key
+from utils.metrics import DownloadMetrics, MetricsRecorder
+
+
+# Seconds between progress messages a child sends per job; the GUI paints at 10 Hz anyway
+PROGRESS_INTERVAL = 0.1
+
+
+@dataclass
+class JobSpec:
+    """What a pool process needs to run one :class:`DownloadJob`; must stay picklable."""
+
+    url: str
+    output_dir: str
+    format_mode: str
+    advanced_options: Optional[dict] = None
+    video_key: Optional[Tuple[str, str]] = None
+    quiet: bool = False
+
+
+def _child_main(conn: Connection) -> None:
+    """Body of a pool process: run the jobs the parent sends, one at a time."""
+    # Ctrl+C reaches the whole process group; the parent decides what to pause
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Imported up front so that a prestarted process is ready when its first job arrives
+    import yt_dlp  # noqa: F401
+
+    from downloader.engine import DownloadJob
+    from downloader.postprocess import PostProcessPool
+    from downloader.session import SessionPool
+    from utils.toolchain import ToolchainService
+
+    send_lock = threading.Lock()
+    jobs: "queue.Queue[tuple | None]" = queue.Queue()
+    running: Dict[int, DownloadJob] = {}
+    # Pause/cancel requests by job id, including ones that arrive before the job starts
+    stops: Dict[int, str] = {}
+
+    def send(*message: Any) -> None:
+        with send_lock:
+            try:
+                conn.send(message)
+            except (OSError, ValueError):
+                # The parent is gone; the job finishes and the loop ends on EOF
+                pass
+
+    def read_commands() -> None:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                message = ("stop",)
+            kind = message[0]
+            if kind == "run":
+                jobs.put(message[1:])
+            elif kind in ("pause", "cancel"):
+                stops[message[1]] = kind
+                job = running.get(message[1])
+                if job is not None:
+                    getattr(job, kind)()
+            elif kind == "limit":
+                BandwidthLimiter.shared().configure(message[1])
+            elif kind == "stop":
+                jobs.put(None)
+                return
+
+    threading.Thread(target=read_commands, name="pool-commands", daemon=True).start()
+    # Merging runs on a thread here, so the parent hears "downloaded" as early as with thread workers
+    post_processor = PostProcessPool(max_workers=1, use_threads=True)
+    while True:
+        item = jobs.get()
+        if item is None:
+            break
+        job_id, spec = item
+        ToolchainService.shared().refresh()
+        last_sent = [0.0]
+
+        def on_progress(event: ProgressEvent, job_id: int = job_id) -> None:
+            now = time.monotonic()
+            if event.phase == PHASE_DOWNLOADING and now - last_sent[0] < PROGRESS_INTERVAL:
+                return
+            last_sent[0] = now
+            send("progress", job_id, event)
+
+        job = DownloadJob(
+            spec.url,
+            spec.output_dir,
+            spec.format_mode,
+            advanced_options=spec.advanced_options,
+            video_key=spec.video_key,
+            on_progress=on_progress,
+            on_title=lambda title, job_id=job_id: send("title", job_id, title),
+            on_log=lambda message, job_id=job_id: send("log", job_id, message),
+            quiet=spec.quiet,
+            on_status=lambda status, job_id=job_id: send("status", job_id, status),
+            on_downloaded=lambda job_id=job_id: send("downloaded", job_id),
+            post_processor=post_processor,
+            sessions=SessionPool.shared(),
+        )
+        running[job_id] = job
+        if job_id in stops:
+            getattr(job, stops[job_id])()
+        try:
+            ok, path = job.run()
+        except Exception as exc:
+            send("log", job_id, f"Error: {exc}")
+            ok, path = False, ""
+        running.pop(job_id, None)
+        stops.pop(job_id, None)
+        send("finished", job_id, ok, path, job.stopped, job.metrics)
+    post_processor.shutdown()
+
+
+class _Child:
+    def __init__(self, process: Any, conn: Connection) -> None:
+        self.process = process
+        self.conn = conn
+        self.job_id: Optional[int] = None
+        # Last bandwidth share sent, in KiB/s
+        self.limit_kbps: Optional[int] = None
+        self.idle_since = time.monotonic()
+        self._lock = threading.Lock()
+
+    def send(self, *message: Any) -> bool:
+        with self._lock:
+            try:
+                self.conn.send(message)
+                return True
+            except (OSError, ValueError):
+                return False
+
+
+class DownloadProcessPool:
+    """Child processes that run downloads, so extraction and fragment handling use all cores.
+
+    With thread workers every item's yt-dlp work (JSON parsing, signature
+    deciphering, format sorting, fragment bookkeeping) shares one GIL with
+    the GUI. Here each child runs one :class:`DownloadJob` at a time and
+    reports over a pipe; progress is sent at most every
+    ``PROGRESS_INTERVAL`` seconds per job. Children are spawned on demand
+    and reused, so their YoutubeDL sessions and caches stay warm; the
+    global bandwidth limit is split evenly between busy children.
+    """
+
+    _shared: "DownloadProcessPool | None" = None
+    _shared_lock = threading.Lock()
+
+    # How often the bandwidth schedule is re-checked while downloads run
+    LIMIT_CHECK_INTERVAL = 5.0
+
+    def __init__(self, max_idle: int = 4) -> None:
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._children: List[_Child] = []
+        self._listeners: Dict[int, Tuple[_Child, Callable[[tuple], None]]] = {}
+        self._ids = itertools.count(1)
+        self._reader: Optional[threading.Thread] = None
+        self._closed = False
+
+    @classmethod
+    def shared(cls) -> "DownloadProcessPool":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+                atexit.register(cls._shared.shutdown)
+            return cls._shared
+
+    def submit(self, spec: JobSpec, deliver: Callable[[tuple], None]) -> int:
+        """Start ``spec`` in a free child; its events are passed to ``deliver`` from a pool thread.
+
+        Events are ``("progress", ProgressEvent)``, ``("title", str)``,
+        ``("log", str)``, ``("status", str)``, ``("downloaded",)`` and
+        finally ``("finished", ok, path, stopped, metrics)``.
+        """
+        job_id = next(self._ids)
+        with self._lock:
+            child = next((c for c in self._children if c.job_id is None and c.process.is_alive()), None)
+            if child is None:
+                child = self._spawn()
+            child.job_id = job_id
+            self._listeners[job_id] = (child, deliver)
+            if self._reader is None:
+                self._reader = threading.Thread(target=self._read_events, name="download-pool", daemon=True)
+                self._reader.start()
+        if not child.send("run", job_id, spec):
+            self._child_lost(child)
+        self._share_bandwidth()
+        return job_id
+
+    def prestart(self, count: int) -> None:
+        """Start processes up to ``count`` ahead of time, so the first downloads skip their startup."""
+        with self._lock:
+            for _ in range(max(0, min(count, self.max_idle) - len(self._children))):
+                self._spawn()
+
+    def pause(self, job_id: int) -> None:
+        self._control("pause", job_id)
+
+    def cancel(self, job_id: int) -> None:
+        self._control("cancel", job_id)
+
+    def _control(self, kind: str, job_id: int) -> None:
+        with self._lock:
+            entry = self._listeners.get(job_id)
+        if entry is not None:
+            entry[0].send(kind, job_id)
+
+    def _spawn(self) -> _Child:
+        # Spawned rather than forked: the parent runs Qt and download threads
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=_child_main, args=(child_conn,), name="download-worker", daemon=True)
+        process.start()
+        child_conn.close()
+        child = _Child(process, parent_conn)
+        self._children.append(child)
+        return child
+
+    def _read_events(self) -> None:
+        checked = time.monotonic()
+        while not self._closed:
+            with self._lock:
+                children = {child.conn: child for child in self._children}
+            if not children:
+                time.sleep(0.2)
+                continue
+            for conn in wait_connections(list(children), timeout=0.5):
+                child = children[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    self._child_lost(child)
+                    continue
+                self._dispatch(child, message)
+            if time.monotonic() - checked >= self.LIMIT_CHECK_INTERVAL:
+                checked = time.monotonic()
+                self._share_bandwidth()
+
+    def _dispatch(self, child: _Child, message: tuple) -> None:
+        kind, job_id = message[0], message[1]
+        surplus: List[_Child] = []
+        with self._lock:
+            entry = self._listeners.get(job_id)
+            if kind == "finished":
+                self._listeners.pop(job_id, None)
+                child.job_id = None
+                child.idle_since = time.monotonic()
+                surplus = self._trim_idle()
+        if entry is not None:
+            entry[1]((kind,) + tuple(message[2:]))
+        if kind == "finished":
+            for old in surplus:
+                old.send("stop")
+                old.conn.close()
+            # Reaps children that have exited
+            multiprocessing.active_children()
+            self._share_bandwidth()
+
+    def _trim_idle(self) -> List[_Child]:
+        idle = sorted((c for c in self._children if c.job_id is None), key=lambda c: c.idle_since)
+        surplus = idle[: max(0, len(idle) - self.max_idle)]
+        for child in surplus:
+            self._children.remove(child)
+        return surplus
+
+    def _child_lost(self, child: _Child) -> None:
+        with self._lock:
+            if child in self._children:
+                self._children.remove(child)
+            entry = self._listeners.pop(child.job_id, None) if child.job_id is not None else None
+            child.job_id = None
+        if entry is not None:
+            entry[1](("log", "Error: the download process exited unexpectedly"))
+            entry[1](("finished", False, "", "", None))
+        try:
+            child.conn.close()
+        except OSError:
+            pass
+
+    def _share_bandwidth(self) -> None:
+        rate = BandwidthLimiter.shared().refresh()
+        with self._lock:
+            busy = [child for child in self._children if child.job_id is not None]
+        if not busy:
+            return
+        share = max(1, int(rate / 1024 / len(busy))) if rate > 0 else 0
+        for child in busy:
+            if child.limit_kbps != share and child.send("limit", share):
+                child.limit_kbps = share
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+            children, self._children = self._children, []
+        for child in children:
+            child.send("stop")
+        deadline = time.monotonic() + 2.0
+        for child in children:
+            child.process.join(max(0.0, deadline - time.monotonic()))
+            if child.process.is_alive():
+                child.process.terminate()
+
+
+class RemoteDownloadJob:
+    """A :class:`DownloadJob` that runs in a :class:`DownloadProcessPool` process.
+
+    Takes the same options and callbacks and has the same :meth:`run`,
+    :meth:`pause`, :meth:`cancel`, :attr:`stopped` and :attr:`metrics`;
+    callbacks are invoked on the thread that calls :meth:`run`.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        output_dir: str,
+        format_mode: str,
+        advanced_options: dict | None = None,
+        video_key: tuple[str, str] | None = None,
+        on_progress: Callable[[ProgressEvent], None] | None = None,
+        on_title: Callable[[str], None] | None = None,
+        on_log: Callable[[str], None] | None = None,
+        quiet: bool = False,
+        on_status: Callable[[str], None] | None = None,
+        on_downloaded: Callable[[], None] | None = None,
+        pool: DownloadProcessPool | None = None,
+    ) -> None:
+        self.url = url
+        self.spec = JobSpec(url, output_dir, format_mode, advanced_options, video_key, quiet)
+        self.on_progress = on_progress
+        self.on_title = on_title
+        self.on_log = on_log
+        self.on_status = on_status
+        self.on_downloaded = on_downloaded
+        self.pool = pool or DownloadProcessPool.shared()
+        self.metrics = DownloadMetrics(url, host_key(url))
+        self.stopped = ""
+        self._job_id: Optional[int] = None
+        self._stop_request = ""
+
+    def pause(self) -> None:
+        self._request_stop("pause")
+
+    def cancel(self) -> None:
+        self._request_stop("cancel")
+
+    def _request_stop(self, kind: str) -> None:
+        self._stop_request = kind
+        if self._job_id is not None:
+            getattr(self.pool, kind)(self._job_id)
+
+    def run(self) -> tuple[bool, str]:
+        """Download the item in a pool process; returns (success, final file path)."""
+        self.stopped = ""
+        events: "queue.Queue[tuple]" = queue.Queue()
+        try:
+            self._job_id = self.pool.submit(self.spec, events.put)
+        except Exception as exc:
+            # e.g. the pool process could not be started
+            events.put(("log", f"Error: {exc}"))
+            events.put(("finished", False, "", "", None))
+        if self._stop_request and self._job_id is not None:
+            getattr(self.pool, self._stop_request)(self._job_id)
+        callbacks = {
+            "progress": self.on_progress,
+            "title": self.on_title,
+            "log": self.on_log,
+            "status": self.on_status,
+            "downloaded": self.on_downloaded,
+        }
+        while True:
+            event = events.get()
+            kind = event[0]
+            if kind == "finished":
+                break
+            callback = callbacks.get(kind)
+            if callback is not None:
+                callback(*event[1:])
+        _, ok, path, stopped, metrics = event
+        self._job_id = None
+        self.stopped = stopped
+        if metrics is not None:
+            # The child wrote it to the metrics file; count it here for the Prometheus totals
+            self.metrics = metrics
+            MetricsRecorder.shared().record(metrics, persist=False)
+        else:
+            self.metrics.finish("error")
+            MetricsRecorder.shared().record(self.metrics)
+        return ok, path
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Dict, Hashable, Optional, Tuple
+
+
+# What yt-dlp reported: a file of the item is transferring, or one just finished (more may follow)
+PHASE_DOWNLOADING = "downloading"
+PHASE_FINISHED = "finished"
+
+
+@dataclass
+class ProgressEvent:
+    """Progress of one item in raw numbers; turning them into text is up to the consumer."""
+
+    # Cumulative over all files of the item (e.g. video + audio before merging)
+    downloaded_bytes: int = 0
+    total_bytes: int = 0
+    # The total is extrapolated (fragmented downloads) rather than announced by the server
+    total_is_estimate: bool = False
+    # Smoothed over a few seconds, see SpeedMeter
+    speed_bps: float = 0.0
+    eta_seconds: Optional[float] = None
+    fragment_index: Optional[int] = None
+    fragment_count: Optional[int] = None
+    # Which file of the item is transferring, from 0
+    file_index: int = 0
+    phase: str = PHASE_DOWNLOADING
+    status: str = "Downloading"
+    # Seconds since the current file started
+    elapsed: float = 0.0
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def percent(self) -> int:
+        if self.total_bytes <= 0:
+            return 0
+        return max(0, min(100, int(self.downloaded_bytes * 100 / self.total_bytes)))
+
+    @property
+    def speed(self) -> str:
+        return f"{format_bytes(self.speed_bps)}/s" if self.speed_bps >= 1 else ""
+
+    @property
+    def eta(self) -> str:
+        return format_eta(self.eta_seconds) if self.eta_seconds is not None else ""
+
+
+class SpeedMeter:
+    """Transfer rate from a growing byte count, as a time-weighted moving average.
+
+    Each sample counts with weight ``1 - exp(-dt / window)``, so the result
+    depends on elapsed time rather than on how often a downloader reports,
+    and native, fragmented and aria2c downloads are smoothed the same way.
+    """
+
+    # Reports closer together than this are folded into the next sample
+    MIN_INTERVAL = 0.1
+
+    def __init__(self, window: float = 3.0) -> None:
+        self.window = window
+        self.rate = 0.0
+        self._bytes: Optional[int] = None
+        self._time = 0.0
+
+    def update(self, transferred: int, now: float | None = None) -> float:
+        now = time.monotonic() if now is None else now
+        if self._bytes is None or transferred < self._bytes:
+            self._bytes, self._time = transferred, now
+            return self.rate
+        elapsed = now - self._time
+        if elapsed < self.MIN_INTERVAL:
+            return self.rate
+        instant = (transferred - self._bytes) / elapsed
+        if self.rate <= 0:
+            self.rate = instant
+        else:
+            self.rate += (1 - math.exp(-elapsed / self.window)) * (instant - self.rate)
+        self._bytes, self._time = transferred, now
+        return self.rate
+
+    def eta(self, remaining: int) -> Optional[float]:
+        if self.rate < 1 or remaining < 0:
+            return None
+        return remaining / self.rate
+
+
+def format_bytes(value: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(value) < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.2f} TiB"
+
+
+def format_eta(seconds: float | None) -> str:
+    if seconds is None:
+        return "-"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+
+class ProgressAggregator:
+    """Buffers the latest progress event per download between UI ticks.
+
+    Workers call :meth:`update` from their own threads as often as yt-dlp
+    reports; the GUI thread calls :meth:`drain` on a timer and only sees the
+    most recent event of each download. Superseded events are counted as
+    coalesced so the saving can be checked.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._pending: Dict[Hashable, ProgressEvent] = {}
+        self.received = 0
+        self.coalesced = 0
+        self.flushes = 0
+
+    def update(self, key: Hashable, event: ProgressEvent) -> None:
+        with self._lock:
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = event
+            self.received += 1
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            if self._pending.pop(key, None) is not None:
+                self.coalesced += 1
+
+    def drain(self) -> Dict[Hashable, ProgressEvent]:
+        with self._lock:
+            if not self._pending:
+                return {}
+            pending, self._pending = self._pending, {}
+            self.flushes += 1
+            return pending
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "received": self.received,
+                "coalesced": self.coalesced,
+                "flushes": self.flushes,
+            }
+
+
+class ProgressTotals:
+    """Running byte totals across all downloads.
+
+    Each report replaces the previous numbers of its download and adjusts the
+    sums by the difference, so the overall percentage, speed and ETA cost
+    O(1) per update regardless of queue length, and large files weigh more
+    than small ones.
+    """
+
+    def __init__(self) -> None:
+        self._items: Dict[Hashable, Tuple[int, int, float]] = {}
+        self.downloaded_bytes = 0
+        self.total_bytes = 0
+        self.speed_bps = 0.0
+
+    def update(self, key: Hashable, downloaded: int, total: int, speed: float) -> None:
+        # An unknown total counts as what has been seen so far
+        total = max(int(total or 0), int(downloaded or 0))
+        old_downloaded, old_total, old_speed = self._items.get(key, (0, 0, 0.0))
+        self._items[key] = (int(downloaded or 0), total, float(speed or 0.0))
+        self.downloaded_bytes += int(downloaded or 0) - old_downloaded
+        self.total_bytes += total - old_total
+        self.speed_bps += float(speed or 0.0) - old_speed
+
+    def complete(self, key: Hashable) -> None:
+        _, total, _ = self._items.get(key, (0, 0, 0.0))
+        self.update(key, total, total, 0.0)
+
+    def stop(self, key: Hashable) -> None:
+        downloaded, total, _ = self._items.get(key, (0, 0, 0.0))
+        self.update(key, downloaded, total, 0.0)
+
+    def remove(self, key: Hashable) -> None:
+        if key in self._items:
+            self.update(key, 0, 0, 0.0)
+            del self._items[key]
+
+    @property
+    def percent(self) -> int:
+        if self.total_bytes <= 0:
+            return 0
+        return max(0, min(100, int(self.downloaded_bytes * 100 / self.total_bytes)))
+
+    @property
+    def eta_seconds(self) -> float | None:
+        # Float drift from repeated +/- can leave tiny residues; treat as idle
+        if self.speed_bps < 1:
+            return None
+        return max(0, self.total_bytes - self.downloaded_bytes) / self.speed_bps
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Hashable, List, Optional
+
+
+# Progress-hook key set by downloaders that hold themselves to their ``rate_limit()`` share
+SELF_LIMITED = "self_limited"
+
+class TokenBucket:
+    """Thread-safe token bucket measured in bytes.
+
+    :meth:`consume` reserves tokens up front and sleeps for any deficit, so
+    concurrent callers queue behind each other in arrival order instead of
+    polling. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float = 0.0, burst_seconds: float = 1.0) -> None:
+        self._lock = threading.Lock()
+        self._burst_seconds = burst_seconds
+        self.rate = max(0.0, float(rate))
+        self._tokens = self.rate * burst_seconds
+        self._stamp = time.monotonic()
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(0.0, float(rate))
+            # Debt accrued under an older, lower rate would otherwise stall everyone
+            self._tokens = min(max(self._tokens, 0.0), self.rate * self._burst_seconds)
+
+    def reserve(self, amount: int) -> float:
+        """Take ``amount`` tokens and return how long the caller must wait for them."""
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def consume(self, amount: int) -> None:
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            capacity = self.rate * self._burst_seconds
+            self._tokens = min(capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+
+def _minutes(value: str) -> int:
+    hours, _, minutes = value.partition(":")
+    return (int(hours) % 24) * 60 + int(minutes or 0)
+
+
+class BandwidthSchedule:
+    """Time-of-day limits: a list of ``{"start": "HH:MM", "end": "HH:MM", "limit_kbps": N}`` rules.
+
+    The first rule whose window contains the current time wins (windows may
+    wrap past midnight); outside all windows ``default_kbps`` applies. A limit
+    of 0 means unlimited.
+    """
+
+    def __init__(self, default_kbps: int = 0, rules: Optional[List[dict]] = None) -> None:
+        self.default_kbps = max(0, int(default_kbps or 0))
+        self.rules = []
+        for rule in rules or []:
+            try:
+                self.rules.append((_minutes(rule["start"]), _minutes(rule["end"]), max(0, int(rule["limit_kbps"]))))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    def limit_kbps(self, when: Optional[datetime] = None) -> int:
+        when = when or datetime.now()
+        now = when.hour * 60 + when.minute
+        for start, end, limit in self.rules:
+            inside = start <= now < end if start <= end else (now >= start or now < end)
+            if inside:
+                return limit
+        return self.default_kbps
+
+
+class BandwidthLimiter:
+    """Global download budget shared by every active download.
+
+    Downloads report the bytes they receive through :meth:`throttle`, which
+    blocks the reporting thread while the budget is exhausted. Every
+    download also has its own bucket at an equal share of the global rate,
+    so one item with many parallel fragments cannot take the whole link.
+    The schedule is re-evaluated periodically and :meth:`configure` takes
+    effect immediately for running downloads.
+    """
+
+    _shared: "BandwidthLimiter | None" = None
+    _shared_lock = threading.Lock()
+
+    # Downloads that reported within this window count towards the fair share
+    ACTIVE_WINDOW = 2.0
+    SCHEDULE_CHECK_INTERVAL = 30.0
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._schedule = BandwidthSchedule()
+        self._global = TokenBucket()
+        self._items: Dict[Hashable, TokenBucket] = {}
+        self._last_seen: Dict[Hashable, float] = {}
+        self._share_count = 0
+        self._checked_at = 0.0
+
+    @classmethod
+    def shared(cls) -> "BandwidthLimiter":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def configure(self, default_kbps: int, rules: Optional[List[dict]] = None) -> None:
+        with self._lock:
+            self._schedule = BandwidthSchedule(default_kbps, rules)
+            self._checked_at = 0.0
+        self._apply_schedule(force=True)
+
+    @property
+    def rate(self) -> float:
+        """Current global limit in bytes/s (0 = unlimited)."""
+        return self._global.rate
+
+    def refresh(self) -> float:
+        """Re-evaluate the schedule now and return the global limit in bytes/s."""
+        self._apply_schedule(force=True)
+        return self._global.rate
+
+    def fair_share(self) -> float:
+        with self._lock:
+            return self._global.rate / max(1, self._share_count)
+
+    def register(self, key: Hashable) -> None:
+        with self._lock:
+            self._items[key] = TokenBucket(self._global.rate)
+            self._rebalance(time.monotonic())
+
+    def unregister(self, key: Hashable) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+            self._last_seen.pop(key, None)
+            self._rebalance(time.monotonic())
+
+    def throttle(self, key: Hashable, received: int) -> None:
+        wait = self._charge(key, received)
+        if wait > 0:
+            time.sleep(wait)
+
+    def account(self, key: Hashable, received: int) -> None:
+        """Charge bytes a download moved under its own cap (aria2c, segmented) without blocking it.
+
+        They still count against the global budget, so in-process downloads
+        leave room for them, and keep the download in the fair share.
+        """
+        self._charge(key, received)
+
+    def _charge(self, key: Hashable, received: int) -> float:
+        if received <= 0:
+            return 0.0
+        self._apply_schedule()
+        if self._global.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            first_report = now - self._last_seen.get(key, 0.0) > self.ACTIVE_WINDOW
+            self._last_seen[key] = now
+            if first_report:
+                self._rebalance(now)
+            bucket = self._items.get(key)
+        wait = bucket.reserve(received) if bucket is not None else 0.0
+        return max(wait, self._global.reserve(received))
+
+    def _apply_schedule(self, force: bool = False) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._checked_at < self.SCHEDULE_CHECK_INTERVAL:
+                return
+            self._checked_at = now
+            rate = self._schedule.limit_kbps() * 1024
+        if rate != self._global.rate:
+            self._global.set_rate(rate)
+        # Also lets idle downloads drop out of the fair share
+        with self._lock:
+            self._rebalance(now)
+
+    def _rebalance(self, now: float) -> None:
+        # Called with the lock held
+        active = [key for key, seen in self._last_seen.items() if now - seen <= self.ACTIVE_WINDOW]
+        self._share_count = max(1, len(active))
+        share = self._global.rate / self._share_count
+        for bucket in self._items.values():
+            bucket.set_rate(share)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import yt_dlp
+from yt_dlp.downloader.common import FileDownloader
+
+from downloader.ratelimit import SELF_LIMITED
+from utils.aria2_rpc import Aria2Client, Aria2RpcError
+
+
+STATUS_KEYS = ["status", "totalLength", "completedLength", "downloadSpeed", "errorMessage"]
+
+
+class Aria2RpcFD(FileDownloader):
+    """Downloads one HTTP(S) file through the shared aria2c daemon.
+
+    Progress comes from polling the daemon, so hooks see real byte counts
+    and speeds. The per-item bandwidth share is pushed to aria2c whenever
+    it changes, and the transfer is removed from the daemon if the
+    download is abandoned.
+    """
+
+    POLL_INTERVAL = 0.5
+
+    @staticmethod
+    def can_download(info: Dict[str, Any]) -> bool:
+        url = info.get("url") or ""
+        return info.get("protocol") in ("http", "https") and "\n" not in url and not info.get("requested_formats")
+
+    def real_download(self, filename: str, info_dict: Dict[str, Any]) -> bool:
+        ydl: RpcYoutubeDL = self.ydl
+        client = ydl.aria2
+        tmpfilename = self.temp_name(filename)
+        url = info_dict["url"]
+        headers = [f"{key}: {value}" for key, value in (info_dict.get("http_headers") or {}).items()]
+        cookie = self.ydl.cookiejar.get_cookie_header(url)
+        if cookie:
+            headers.append(f"Cookie: {cookie}")
+        connections = str(max(1, min(16, int(self.params.get("aria2_connections") or 16))))
+        options: Dict[str, Any] = {
+            "dir": os.path.dirname(os.path.abspath(tmpfilename)),
+            "out": os.path.basename(tmpfilename),
+            "header": headers,
+            "split": connections,
+            "max-connection-per-server": connections,
+            "min-split-size": "1M",
+            # Pick up the control file of a paused or interrupted earlier attempt
+            "continue": "true",
+        }
+        if self.params.get("proxy"):
+            options["all-proxy"] = self.params["proxy"]
+        limit = ydl.rate_limit()
+        if limit > 0:
+            options["max-download-limit"] = str(int(limit))
+
+        started = time.time()
+        try:
+            gid = client.add_uri([url], options)
+        except Aria2RpcError as exc:
+            self.report_error(f"aria2c RPC: {exc}")
+            return False
+        ydl.set_active(gid)
+        finished = False
+        try:
+            while True:
+                status = client.tell_status(gid, STATUS_KEYS)
+                state = status.get("status")
+                total = int(status.get("totalLength") or 0)
+                done = int(status.get("completedLength") or 0)
+                if state == "complete":
+                    finished = True
+                    break
+                if state in ("error", "removed"):
+                    self.report_error(f"aria2c: {status.get('errorMessage') or state}")
+                    return False
+                speed = int(status.get("downloadSpeed") or 0)
+                self._hook_progress(
+                    {
+                        "status": "downloading",
+                        "downloaded_bytes": done,
+                        "total_bytes": total or None,
+                        "speed": speed,
+                        "eta": (total - done) / speed if speed and total else None,
+                        "filename": filename,
+                        "tmpfilename": tmpfilename,
+                        "elapsed": time.time() - started,
+                        SELF_LIMITED: True,
+                    },
+                    info_dict,
+                )
+                share = ydl.rate_limit()
+                if share != limit:
+                    # 0 lifts the cap in aria2c too
+                    client.change_option(gid, {"max-download-limit": str(int(share))})
+                    limit = share
+                time.sleep(self.POLL_INTERVAL)
+        except Aria2RpcError as exc:
+            self.report_error(f"aria2c RPC: {exc}")
+            return False
+        finally:
+            ydl.set_active(None)
+            try:
+                if not finished:
+                    client.remove(gid)
+                client.remove_result(gid)
+            except Aria2RpcError:
+                pass
+
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress(
+            {
+                "status": "finished",
+                "downloaded_bytes": total,
+                "total_bytes": total,
+                "filename": filename,
+                "elapsed": time.time() - started,
+            },
+            info_dict,
+        )
+        return True
+
+
+class RpcYoutubeDL(yt_dlp.YoutubeDL):
+    """YoutubeDL that hands plain HTTP(S) downloads to a running aria2c daemon.
+
+    Everything else (HLS/DASH, subtitles, test downloads) goes through
+    yt-dlp's usual downloader selection.
+    """
+
+    def __init__(
+        self,
+        params: Dict[str, Any],
+        aria2: Aria2Client,
+        rate_limit: Callable[[], float] = lambda: 0.0,
+    ) -> None:
+        super().__init__(params)
+        self.aria2 = aria2
+        self.rate_limit = rate_limit
+        self._active_lock = threading.Lock()
+        self._active_gid: Optional[str] = None
+
+    def set_active(self, gid: Optional[str]) -> None:
+        with self._active_lock:
+            self._active_gid = gid
+
+    def pause(self) -> bool:
+        """Pause the transfer in progress; False if there is none to pause."""
+        return self._control(self.aria2.pause)
+
+    def resume(self) -> bool:
+        return self._control(self.aria2.unpause)
+
+    def _control(self, action: Callable[[str], None]) -> bool:
+        with self._active_lock:
+            gid = self._active_gid
+        if gid is None:
+            return False
+        try:
+            action(gid)
+        except Aria2RpcError:
+            return False
+        return True
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if test or subtitle or name == "-" or not Aria2RpcFD.can_download(info):
+            return super().dl(name, info, subtitle=subtitle, test=test)
+        fd = Aria2RpcFD(self, self.params)
+        for hook in self._progress_hooks:
+            fd.add_progress_hook(hook)
+        new_info = self._copy_infodict(info)
+        if new_info.get("http_headers") is None:
+            new_info["http_headers"] = self._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
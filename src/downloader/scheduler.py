@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import random
+import time
+from typing import Dict, Hashable, List, Tuple
+from urllib.parse import urlparse
+
+
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -1
+PRIORITY_NAMES = {PRIORITY_HIGH: "High", PRIORITY_NORMAL: "Normal", PRIORITY_LOW: "Low"}
+
+# Cost of an item whose length is unknown (seconds of media), so it neither jumps
+# every estimated clip nor waits behind hour-long videos
+DEFAULT_COST = 600.0
+# Rough bytes per second of media, to compare items known only by file size
+BYTES_PER_MEDIA_SECOND = 256 * 1024
+
+# Status of a failed item until its automatic retry is due
+WAITING_TO_RETRY = "Waiting to retry"
+
+# Automatic retries of failed items wait RETRY_BASE_DELAY, then twice as long each time
+RETRY_BASE_DELAY = 30.0
+RETRY_MAX_DELAY = 3600.0
+
+
+def host_key(url: str) -> str:
+    """Return the host a URL is served from, used to group concurrent downloads."""
+    try:
+        host = (urlparse(url).hostname or "").lower()
+    except ValueError:
+        host = ""
+    for prefix in ("www.", "m.", "music."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    return host
+
+
+def estimate_cost(duration: float | None = None, size: float | None = None) -> float | None:
+    """Expected cost of downloading an item, in seconds of media; None when nothing is known."""
+    if duration:
+        return float(duration)
+    if size:
+        return float(size) / BYTES_PER_MEDIA_SECOND
+    return None
+
+
+def retry_delay(attempt: int) -> float:
+    """Seconds to wait before automatic retry number ``attempt`` (1 for the first), with jitter."""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** max(0, attempt - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class DownloadScheduler:
+    """Decides which queued items may start, given a bounded pool of workers.
+
+    Each free slot goes to the best queued item: higher user priority first,
+    then items put ``front`` (resumed ones), then - with ``shortest_first`` -
+    the smallest estimated cost, and finally the order items were queued.
+    Running short items first keeps one long livestream VOD from holding up
+    dozens of clips and minimises the mean time until an item completes.
+    At most ``max_workers`` items run at once, and at most ``max_per_host``
+    of them against the same host; a host at its cap is skipped so its
+    queue cannot starve the rest. Items enqueued with a ``delay`` (failed
+    ones waiting to be retried) only become eligible once it has passed.
+    """
+
+    def __init__(self, max_workers: int = 3, max_per_host: int = 2, shortest_first: bool = True) -> None:
+        self.max_workers = max(1, int(max_workers))
+        self.max_per_host = max(1, int(max_per_host))
+        self.shortest_first = shortest_first
+        # Per-host heaps of (rank, key); entries whose rank no longer matches _queued are stale
+        self._queues: Dict[str, List[Tuple[tuple, Hashable]]] = {}
+        self._queued: Dict[Hashable, Tuple[str, tuple]] = {}
+        # Items not eligible yet: key -> (monotonic time they become ready, host, rank)
+        self._waiting: Dict[Hashable, Tuple[float, str, tuple]] = {}
+        # What each queued or waiting item was enqueued with, to rebuild its rank
+        self._params: Dict[Hashable, Tuple[int, bool, float | None, int]] = {}
+        self._active: Dict[Hashable, str] = {}
+        self._active_per_host: Dict[str, int] = {}
+        self._seq = itertools.count()
+
+    def configure(self, max_workers: int, max_per_host: int, shortest_first: bool | None = None) -> None:
+        self.max_workers = max(1, int(max_workers))
+        self.max_per_host = max(1, int(max_per_host))
+        if shortest_first is not None and shortest_first != self.shortest_first:
+            self.shortest_first = shortest_first
+            for key in list(self._queued) + list(self._waiting):
+                self._rerank(key)
+
+    @property
+    def active_count(self) -> int:
+        return len(self._active)
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._queued) + len(self._waiting)
+
+    def is_idle(self) -> bool:
+        return not self._active and not self._queued and not self._waiting
+
+    def is_scheduled(self, key: Hashable) -> bool:
+        return key in self._queued or key in self._waiting or key in self._active
+
+    def enqueue(
+        self,
+        key: Hashable,
+        url: str,
+        front: bool = False,
+        priority: int = PRIORITY_NORMAL,
+        cost: float | None = None,
+        delay: float = 0.0,
+    ) -> None:
+        """Queue an item.
+
+        ``front`` puts it ahead of the items of the same priority (e.g. when
+        resumed), ``cost`` is its :func:`estimate_cost` and ``delay`` holds it
+        back for that many seconds.
+        """
+        if self.is_scheduled(key):
+            return
+        self._params[key] = (priority, front, cost, next(self._seq))
+        rank = self._rank(key)
+        host = host_key(url)
+        if delay > 0:
+            self._waiting[key] = (time.monotonic() + delay, host, rank)
+        else:
+            self._push(key, host, rank)
+
+    def set_priority(self, key: Hashable, priority: int) -> None:
+        """Change the priority of a queued or waiting item; running items are not affected."""
+        params = self._params.get(key)
+        if params is None:
+            return
+        self._params[key] = (priority,) + params[1:]
+        self._rerank(key)
+
+    def discard(self, key: Hashable) -> None:
+        """Forget a queued item; stale heap entries are skipped lazily."""
+        self._queued.pop(key, None)
+        self._waiting.pop(key, None)
+        self._params.pop(key, None)
+
+    def next_ready_in(self) -> float | None:
+        """Seconds until the next delayed item becomes eligible, or None if none is waiting."""
+        if not self._waiting:
+            return None
+        return max(0.0, min(ready for ready, _, _ in self._waiting.values()) - time.monotonic())
+
+    def next_batch(self) -> List[Hashable]:
+        """Pop the best eligible items, as many as there are free slots."""
+        self._release_ready()
+        started: List[Hashable] = []
+        while len(self._active) < self.max_workers:
+            best = None
+            for host in list(self._queues):
+                if self._active_per_host.get(host, 0) >= self.max_per_host:
+                    continue
+                head = self._head(host)
+                if head is not None and (best is None or head < best[0]):
+                    best = (head, host)
+            if best is None:
+                break
+            (_, key), host = best
+            heapq.heappop(self._queues[host])
+            if not self._queues[host]:
+                del self._queues[host]
+            del self._queued[key]
+            self._params.pop(key, None)
+            self._active[key] = host
+            self._active_per_host[host] = self._active_per_host.get(host, 0) + 1
+            started.append(key)
+        return started
+
+    def finish(self, key: Hashable) -> None:
+        host = self._active.pop(key, None)
+        if host is None:
+            return
+        remaining = self._active_per_host.get(host, 1) - 1
+        if remaining > 0:
+            self._active_per_host[host] = remaining
+        else:
+            self._active_per_host.pop(host, None)
+
+    def _rank(self, key: Hashable) -> tuple:
+        priority, front, cost, seq = self._params[key]
+        if not self.shortest_first:
+            return (-priority, not front, seq)
+        return (-priority, not front, DEFAULT_COST if cost is None else cost, seq)
+
+    def _push(self, key: Hashable, host: str, rank: tuple) -> None:
+        self._queued[key] = (host, rank)
+        heapq.heappush(self._queues.setdefault(host, []), (rank, key))
+
+    def _rerank(self, key: Hashable) -> None:
+        rank = self._rank(key)
+        if key in self._waiting:
+            ready, host, _ = self._waiting[key]
+            self._waiting[key] = (ready, host, rank)
+        elif key in self._queued:
+            self._push(key, self._queued[key][0], rank)
+
+    def _head(self, host: str) -> Tuple[tuple, Hashable] | None:
+        heap = self._queues[host]
+        while heap:
+            rank, key = heap[0]
+            if self._queued.get(key) == (host, rank):
+                return heap[0]
+            heapq.heappop(heap)
+        del self._queues[host]
+        return None
+
+    def _release_ready(self) -> None:
+        if not self._waiting:
+            return
+        now = time.monotonic()
+        for key, (ready, host, rank) in list(self._waiting.items()):
+            if ready <= now:
+                del self._waiting[key]
+                self._push(key, host, rank)
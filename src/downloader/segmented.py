@@ -0,0 +1,448 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import yt_dlp
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import HTTPError, RequestError
+
+from downloader.ratelimit import SELF_LIMITED, TokenBucket
+from utils.fileio import preallocate, write_at
+
+
+# Smallest piece worth its own connection, as aria2c's --min-split-size
+MIN_SPLIT = 1024 * 1024
+BLOCK_SIZE = 64 * 1024
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+
+class _Range:
+    """Bytes [pos, end) of the file still to fetch; ``end`` shrinks when another worker steals the tail."""
+
+    __slots__ = ("pos", "end", "started", "received")
+
+    def __init__(self, pos: int, end: int) -> None:
+        self.pos = pos
+        self.end = end
+        self.started = time.monotonic()
+        self.received = 0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.end - self.pos)
+
+    def seconds_left(self) -> float:
+        rate = self.received / max(1e-3, time.monotonic() - self.started)
+        return self.remaining / max(1.0, rate)
+
+
+class SegmentedHttpFD(HttpFD):
+    """Downloads one progressive HTTP(S) file over several connections at once.
+
+    The file is split into byte ranges fetched concurrently, each written
+    in place into the preallocated ``.part`` file. A worker that runs out
+    of ranges takes the second half of the range expected to finish last,
+    so one slow connection does not hold up the end of the download.
+    What is left to fetch is kept next to the ``.part`` file, so a paused
+    or interrupted download continues where it stopped, even when the
+    site hands out a new URL for the same format by then. Servers without
+    range support get yt-dlp's usual single-connection download.
+    """
+
+    REPORT_INTERVAL = 0.2
+    SAVE_INTERVAL = 1.0
+
+    @staticmethod
+    def can_download(info: Dict[str, Any]) -> bool:
+        url = info.get("url") or ""
+        return (
+            info.get("protocol") in ("http", "https")
+            and "\n" not in url
+            and not info.get("requested_formats")
+            and not info.get("is_live")
+        )
+
+    def real_download(self, filename: str, info_dict: Dict[str, Any]) -> bool:
+        tmpfilename = self.temp_name(filename)
+        control = tmpfilename + ".segments"
+        self._url = info_dict["url"]
+        self._headers = dict(info_dict.get("http_headers") or {})
+        self._extensions: Dict[str, Any] = {}
+        target = self._get_impersonate_target(info_dict)
+        if target is not None:
+            self._extensions["impersonate"] = target
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._format_id = info_dict.get("format_id")
+        self._validator: Optional[str] = None
+
+        resume = self.params.get("continuedl", True) and os.path.isfile(tmpfilename)
+        saved = self._load_control(control, tmpfilename) if resume else None
+        if resume and saved is None and os.path.exists(control):
+            # Preallocated for another format or version of the file: none of it is a prefix of this one
+            os.remove(tmpfilename)
+            resume = False
+        # A .part without a control file was written by HttpFD: a contiguous prefix
+        prefix = os.path.getsize(tmpfilename) if resume and saved is None else 0
+        if saved is not None and not saved[1]:
+            # Everything was fetched before the last run stopped; only the rename is left
+            return self._finish(filename, tmpfilename, control, saved[0], info_dict, time.time())
+        start = saved[1][0][0] if saved is not None else prefix
+        # ...unless this downloader preallocated it and stopped before saving its state: then it is
+        # exactly as large as the file, so the size is learnt from the start before trusting it
+        response = self._probe(0 if prefix else start, saved[1][0][1] if saved is not None else None)
+        total = self._probe_total(response, 0 if prefix else start)
+        if prefix and total is not None:
+            if prefix >= total:
+                start = 0
+            else:
+                response.close()
+                response = self._probe(start, None)
+                total = self._probe_total(response, start)
+        if total is None:
+            # No usable ranges (or nothing left to fetch); HttpFD must not take a preallocated file for a finished one
+            if response is not None:
+                response.close()
+            if saved is not None:
+                for path in (tmpfilename, control):
+                    os.remove(path)
+            return super().real_download(filename, info_dict)
+        self._validator = self._probe_validator(response)
+        if saved is not None and saved[0] == total and saved[2] in (None, self._validator):
+            remaining = saved[1]
+        elif saved is None and start < total:
+            remaining = [[start, total]]
+        else:
+            # The file changed on the server since the last run; start over
+            response.close()
+            saved, start = None, 0
+            response = self._probe(0, None)
+            if self._probe_total(response, 0) != total:
+                response.close()
+                self.report_error("The file changed on the server while probing it")
+                return False
+            self._validator = self._probe_validator(response)
+            remaining = [[0, total]]
+        if saved is None and start == 0 and os.path.exists(tmpfilename):
+            os.remove(tmpfilename)
+
+        first = _Range(start, min(remaining[0][1], self._response_end(response)))
+        pending = self._split(remaining, first.end)
+
+        fd = os.open(tmpfilename, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o666)
+        started = time.time()
+        try:
+            try:
+                preallocate(fd, total)
+            except OSError as exc:
+                response.close()
+                self.report_error(f"Cannot reserve {total} bytes for {tmpfilename}: {exc}")
+                return False
+            ok = self._fetch_all(fd, first, response, pending, total, tmpfilename, filename, control, info_dict)
+        finally:
+            os.close(fd)
+        if not ok:
+            return False
+        return self._finish(filename, tmpfilename, control, total, info_dict, started)
+
+    def _fetch_all(
+        self,
+        fd: int,
+        first: _Range,
+        response: Any,
+        pending: List[_Range],
+        total: int,
+        tmpfilename: str,
+        filename: str,
+        control: str,
+        info_dict: Dict[str, Any],
+    ) -> bool:
+        ydl: SegmentedYoutubeDL = self.ydl
+        bucket = TokenBucket(ydl.rate_limit())
+        connections = max(1, min(16, int(self.params.get("segment_connections") or 8)))
+        self._pending = pending
+        self._ranges = [first]
+        write_lock = threading.Lock()
+        todo = first.remaining + sum(r.remaining for r in pending)
+        count = max(1, min(connections, todo // MIN_SPLIT))
+
+        def _worker(initial: Optional[_Range], opened: Any) -> None:
+            current, resp = initial, opened
+            try:
+                while not self._stop.is_set():
+                    if current is None:
+                        current = self._take()
+                        if current is None:
+                            return
+                    self._fetch(current, resp, fd, bucket, write_lock)
+                    current, resp = None, None
+            except BaseException as exc:
+                with self._lock:
+                    if self._error is None:
+                        self._error = exc
+                self._stop.set()
+            finally:
+                if resp is not None:
+                    resp.close()
+
+        workers = [threading.Thread(target=_worker, args=(first, response), daemon=True)]
+        workers += [threading.Thread(target=_worker, args=(None, None), daemon=True) for _ in range(count - 1)]
+        started = time.time()
+        done_before = total - todo
+        saved_at = 0.0
+        try:
+            self._report(filename, tmpfilename, info_dict, done_before, total, 0.0, started)
+        except BaseException:
+            response.close()
+            raise
+        for worker in workers:
+            worker.start()
+        try:
+            while any(worker.is_alive() for worker in workers):
+                self._stop.wait(self.REPORT_INTERVAL)
+                done = total - self._left()
+                elapsed = time.time() - started
+                speed = (done - done_before) / elapsed if elapsed > 0 else 0.0
+                self._report(filename, tmpfilename, info_dict, done, total, speed, started)
+                # The item's share of the bandwidth budget changes as other downloads come and go
+                bucket.set_rate(ydl.rate_limit())
+                if time.monotonic() - saved_at >= self.SAVE_INTERVAL:
+                    self._save_control(control, total)
+                    saved_at = time.monotonic()
+        except BaseException:
+            # Paused or cancelled from the progress hook: stop the workers, keep what they fetched
+            self._stop.set()
+            for worker in workers:
+                worker.join()
+            self._save_control(control, total)
+            raise
+        for worker in workers:
+            worker.join()
+        self._save_control(control, total)
+        if self._error is not None or self._left():
+            self.report_error(f"Segmented download failed: {self._error or 'incomplete'}")
+            return False
+        return True
+
+    def _finish(
+        self, filename: str, tmpfilename: str, control: str, total: int, info_dict: Dict[str, Any], started: float
+    ) -> bool:
+        try:
+            os.remove(control)
+        except OSError:
+            pass
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress(
+            {
+                "status": "finished",
+                "downloaded_bytes": total,
+                "total_bytes": total,
+                "filename": filename,
+                "elapsed": time.time() - started,
+            },
+            info_dict,
+        )
+        return True
+
+    def _report(
+        self,
+        filename: str,
+        tmpfilename: str,
+        info_dict: Dict[str, Any],
+        done: int,
+        total: int,
+        speed: float,
+        started: float,
+    ) -> None:
+        self._hook_progress(
+            {
+                "status": "downloading",
+                "downloaded_bytes": done,
+                "total_bytes": total,
+                "speed": speed,
+                "eta": (total - done) / speed if speed else None,
+                "filename": filename,
+                "tmpfilename": tmpfilename,
+                "elapsed": time.time() - started,
+                SELF_LIMITED: True,
+            },
+            info_dict,
+        )
+
+    def _take(self) -> Optional[_Range]:
+        """The next unstarted range, or the tail of the range expected to finish last."""
+        with self._lock:
+            if self._pending:
+                piece = self._pending.pop(0)
+                piece.started = time.monotonic()
+                self._ranges.append(piece)
+                return piece
+            candidates = [r for r in self._ranges if r.remaining >= 2 * MIN_SPLIT]
+            if not candidates:
+                return None
+            victim = max(candidates, key=_Range.seconds_left)
+            middle = victim.pos + victim.remaining // 2
+            piece = _Range(middle, victim.end)
+            victim.end = middle
+            self._ranges.append(piece)
+            return piece
+
+    def _left(self) -> int:
+        with self._lock:
+            return sum(r.remaining for r in self._ranges) + sum(r.remaining for r in self._pending)
+
+    def _fetch(self, piece: _Range, response: Any, fd: int, bucket: TokenBucket, write_lock: threading.Lock) -> None:
+        retries = int(self.params.get("retries") or 10)
+        attempt = 0
+        while piece.remaining and not self._stop.is_set():
+            try:
+                if response is None:
+                    response = self._open(piece.pos, piece.end - 1)
+                    if response.status != 206:
+                        raise RequestError(f"server ignored the requested range (HTTP {response.status})")
+                while not self._stop.is_set():
+                    with self._lock:
+                        wanted = min(BLOCK_SIZE, piece.end - piece.pos)
+                    if wanted <= 0:
+                        break
+                    block = response.read(wanted)
+                    if not block:
+                        raise RequestError(f"connection closed with {piece.remaining} bytes left")
+                    bucket.consume(len(block))
+                    write_at(fd, piece.pos, block, write_lock)
+                    with self._lock:
+                        piece.pos += len(block)
+                        piece.received += len(block)
+                attempt = 0
+            except (RequestError, OSError) as exc:
+                if isinstance(exc, HTTPError) and 400 <= exc.status < 500 and exc.status != 429:
+                    raise
+                attempt += 1
+                if attempt > retries:
+                    raise
+                self.to_screen(f"[download] Retrying range at {piece.pos} ({attempt}/{retries}): {exc}")
+                time.sleep(min(5.0, float(attempt)))
+            finally:
+                if response is not None:
+                    # Closed early when the tail was stolen; otherwise fully read and back in the pool
+                    response.close()
+                    response = None
+
+    def _open(self, start: int, end: Optional[int]) -> Any:
+        headers = dict(self._headers)
+        headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+        return self.ydl.urlopen(Request(self._url, None, headers, extensions=self._extensions))
+
+    def _probe(self, start: int, end: Optional[int]) -> Any:
+        """Request the first range; it also tells whether ranges work and how large the file is."""
+        last = start + MIN_SPLIT - 1 if end is None else min(end, start + MIN_SPLIT) - 1
+        try:
+            return self._open(start, last)
+        except RequestError:
+            return None
+
+    @staticmethod
+    def _probe_total(response: Any, start: int) -> Optional[int]:
+        if response is None or response.status != 206:
+            return None
+        match = CONTENT_RANGE.match(response.headers.get("Content-Range") or "")
+        if not match or match.group(3) == "*" or int(match.group(1)) != start:
+            return None
+        return int(match.group(3))
+
+    @staticmethod
+    def _probe_validator(response: Any) -> Optional[str]:
+        """What tells this version of the file from another one served under the same size, if anything."""
+        return response.headers.get("ETag") or response.headers.get("Last-Modified") or None
+
+    @staticmethod
+    def _response_end(response: Any) -> int:
+        return int(CONTENT_RANGE.match(response.headers["Content-Range"]).group(2)) + 1
+
+    @staticmethod
+    def _split(remaining: List[List[int]], first_end: int) -> List[_Range]:
+        """Unstarted ranges: what is left after the first one, in pieces of at least MIN_SPLIT."""
+        pieces: List[_Range] = []
+        for index, (pos, end) in enumerate(remaining):
+            if index == 0:
+                pos = first_end
+            if pos >= end:
+                continue
+            size = max(MIN_SPLIT, -(-(end - pos) // 4))
+            while pos < end:
+                pieces.append(_Range(pos, min(end, pos + size)))
+                pos += size
+        return pieces
+
+    def _load_control(
+        self, control: str, tmpfilename: str
+    ) -> Optional[tuple[int, List[List[int]], Optional[str]]]:
+        """(total size, ranges still missing, validator) saved by a previous run for this format, or None.
+
+        The state belongs to the format, not its URL: sites hand out new,
+        differently signed or hosted URLs for the same file between runs.
+        The size and validator are checked against the server once probed.
+        """
+        try:
+            with open(control, encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("format_id") != self._format_id:
+                return None
+            total = int(state["total"])
+            ranges = sorted([int(pos), int(end)] for pos, end in state["remaining"] if int(pos) < int(end))
+            validator = state.get("validator")
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+        if os.path.getsize(tmpfilename) != total:
+            return None
+        return total, ranges, validator
+
+    def _save_control(self, control: str, total: int) -> None:
+        with self._lock:
+            ranges = [[r.pos, r.end] for r in self._ranges + self._pending if r.remaining]
+        try:
+            with open(control, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "format_id": self._format_id,
+                        "total": total,
+                        "validator": self._validator,
+                        "remaining": sorted(ranges),
+                    },
+                    f,
+                )
+        except OSError:
+            # Losing the control file only means starting this file over next time
+            pass
+
+
+class SegmentedYoutubeDL(yt_dlp.YoutubeDL):
+    """YoutubeDL that fetches plain HTTP(S) files over several connections itself.
+
+    The connections come from this YoutubeDL's request handlers, so a
+    session reused across items keeps them alive between ranges and items.
+    Everything else (HLS/DASH, subtitles, test downloads) goes through
+    yt-dlp's usual downloader selection.
+    """
+
+    def __init__(self, params: Dict[str, Any], rate_limit: Callable[[], float] = lambda: 0.0) -> None:
+        super().__init__(params)
+        self.rate_limit = rate_limit
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if test or subtitle or name == "-" or not SegmentedHttpFD.can_download(info):
+            return super().dl(name, info, subtitle=subtitle, test=test)
+        fd = SegmentedHttpFD(self, self.params)
+        for hook in self._progress_hooks:
+            fd.add_progress_hook(hook)
+        new_info = self._copy_infodict(info)
+        if new_info.get("http_headers") is None:
+            new_info["http_headers"] = self._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import atexit
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+# Params YoutubeDL only reads in its constructor; changing them needs a new session
+_INIT_ONLY = ("progress_hooks", "postprocessors", "postprocessor_hooks", "post_hooks", "logger")
+
+
+class DownloadSession:
+    """A YoutubeDL kept alive across queue items.
+
+    A new YoutubeDL per item starts with an empty cookie jar, new request
+    handlers (and connection pools) and no extractor instances. A session
+    builds one and lets each job swap in only what belongs to the item:
+    params such as the output template and format, post-processors, and
+    the progress hook. One job uses a session at a time.
+    """
+
+    def __init__(self, key: Hashable, factory: Callable[[Dict[str, Any]], Any], params: Dict[str, Any]) -> None:
+        self.key = key
+        self.progress_hook: Optional[Callable[[Dict[str, Any]], None]] = None
+        params = {k: v for k, v in params.items() if k not in _INIT_ONLY}
+        params["progress_hooks"] = [self._on_progress]
+        self.ydl = factory(params)
+        # What every item starts from; per-item params are laid over a copy of this
+        self._base_params = dict(self.ydl.params)
+        self._base_pps = {when: list(pps) for when, pps in self.ydl._pps.items()}
+        self.items = 0
+        self.idle_since = time.monotonic()
+
+    def _on_progress(self, d: Dict[str, Any]) -> None:
+        hook = self.progress_hook
+        if hook is not None:
+            hook(d)
+
+    def begin(self, params: Dict[str, Any], progress_hook: Callable[[Dict[str, Any]], None]) -> Any:
+        """Prepare the YoutubeDL for the next item and return it."""
+        ydl = self.ydl
+        ydl.params.clear()
+        ydl.params.update(self._base_params)
+        for key, value in params.items():
+            if key in _INIT_ONLY:
+                continue
+            if key == "outtmpl" and isinstance(value, str):
+                value = {**self._base_params.get("outtmpl", {}), "default": value}
+            ydl.params[key] = value
+        for when, pps in self._base_pps.items():
+            ydl._pps[when][:] = pps
+        if params.get("format"):
+            ydl.format_selector = ydl.build_format_selector(params["format"])
+        self.progress_hook = progress_hook
+        self.items += 1
+        return ydl
+
+    def end(self) -> None:
+        """Detach the finished item: its hook and any per-item method overrides."""
+        self.progress_hook = None
+        for name in ("post_process", "to_screen", "run_pp"):
+            self.ydl.__dict__.pop(name, None)
+        self.idle_since = time.monotonic()
+
+    def close(self) -> None:
+        self.end()
+        try:
+            self.ydl.close()
+        except Exception:
+            # Best-effort; saving cookies or closing handlers should not fail a download
+            pass
+
+
+class SessionPool:
+    """Idle download sessions, lent to one job at a time.
+
+    Jobs return their session when done, so the pool settles at about one
+    session per worker slot. Sessions are matched by key (a plain or an
+    aria2c-RPC YoutubeDL), and ones left idle too long are closed.
+    """
+
+    _shared: "SessionPool | None" = None
+    _shared_lock = threading.Lock()
+
+    IDLE_TIMEOUT = 300.0
+
+    def __init__(self, max_idle: int = 16) -> None:
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle: List[DownloadSession] = []
+        self.created = 0
+        self.reused = 0
+
+    @classmethod
+    def shared(cls) -> "SessionPool":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+                atexit.register(cls._shared.clear)
+            return cls._shared
+
+    def acquire(
+        self, key: Hashable, factory: Callable[[Dict[str, Any]], Any], params: Dict[str, Any]
+    ) -> DownloadSession:
+        """An idle session for ``key``, or a new one built from ``params``."""
+        expired: List[DownloadSession] = []
+        session = None
+        with self._lock:
+            now = time.monotonic()
+            keep = []
+            for idle in self._idle:
+                if now - idle.idle_since > self.IDLE_TIMEOUT:
+                    expired.append(idle)
+                else:
+                    keep.append(idle)
+            self._idle = keep
+            # Most recently used first: its connections are the likeliest to still be open
+            for index in range(len(self._idle) - 1, -1, -1):
+                if self._idle[index].key == key:
+                    session = self._idle.pop(index)
+                    self.reused += 1
+                    break
+        for old in expired:
+            old.close()
+        if session is None:
+            session = DownloadSession(key, factory, params)
+            with self._lock:
+                self.created += 1
+        return session
+
+    def release(self, session: DownloadSession, reusable: bool = True) -> None:
+        session.end()
+        if not reusable:
+            session.close()
+            return
+        with self._lock:
+            self._idle.append(session)
+            surplus, self._idle = self._idle[: -self.max_idle], self._idle[-self.max_idle:]
+        for old in surplus:
+            old.close()
+
+    def clear(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            session.close()
+
+    def stats(self) -> Tuple[int, int]:
+        """(sessions created, items that reused a session)."""
+        with self._lock:
+            return self.created, self.reused
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import json
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict
+
+
+TUNING_FILE = Path.home() / ".ytdlp_gui_tuning.json"
+
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 32
+START_CONCURRENCY = 4
+# Additive step while more connections keep paying off
+INCREASE_STEP = 2
+# Samples between probes above the best setting, in case the link got faster
+PROBE_EVERY = 8
+# Files smaller than this finish too fast to say anything about throughput
+MIN_SAMPLE_BYTES = 4 * 1024 * 1024
+
+
+@dataclass
+class HostTuning:
+    concurrency: int = START_CONCURRENCY
+    best: int = START_CONCURRENCY
+    best_bps: float = 0.0
+    samples: int = 0
+
+
+class ConcurrencyTuner:
+    """Picks fragment/connection concurrency per host with AIMD.
+
+    Each finished file is one sample: the throughput achieved at the
+    concurrency it was downloaded with. A clear gain over the best rate
+    seen so far adds connections; a collapse (typically a CDN throttling
+    too many connections) or a failed transfer halves them; no gain falls
+    back to the best known setting, with an occasional probe above it. The
+    state per host is persisted, so a new session starts from what worked
+    last time.
+    """
+
+    _shared: "ConcurrencyTuner | None" = None
+    _shared_lock = threading.Lock()
+
+    # Throughput ratios (against the best seen) that count as a gain or a collapse
+    GAIN = 1.1
+    COLLAPSE = 0.6
+
+    def __init__(self, path: Path = TUNING_FILE) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, HostTuning] = self._load()
+
+    @classmethod
+    def shared(cls) -> "ConcurrencyTuner":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def concurrency(self, host: str) -> int:
+        with self._lock:
+            return self._hosts.get(host, HostTuning()).concurrency
+
+    def report(self, host: str, concurrency: int, size: int, elapsed: float) -> int:
+        """Record a finished file; returns the concurrency to use next for the host."""
+        if size < MIN_SAMPLE_BYTES or elapsed <= 0:
+            return self.concurrency(host)
+        bps = size / elapsed
+        with self._lock:
+            state = self._hosts.setdefault(host, HostTuning())
+            state.samples += 1
+            if bps > state.best_bps * self.GAIN:
+                state.best, state.best_bps = concurrency, bps
+                state.concurrency = min(MAX_CONCURRENCY, concurrency + INCREASE_STEP)
+            elif bps < state.best_bps * self.COLLAPSE:
+                state.concurrency = max(MIN_CONCURRENCY, concurrency // 2)
+                # Let the peak fade so a link that got slower is not chased forever
+                state.best_bps *= 0.9
+            else:
+                if concurrency == state.best:
+                    state.best_bps = 0.8 * state.best_bps + 0.2 * bps
+                state.concurrency = state.best
+                if state.samples % PROBE_EVERY == 0:
+                    state.concurrency = min(MAX_CONCURRENCY, state.best + INCREASE_STEP)
+            self._save()
+            return state.concurrency
+
+    def report_failure(self, host: str, concurrency: int) -> int:
+        with self._lock:
+            state = self._hosts.setdefault(host, HostTuning())
+            state.concurrency = max(MIN_CONCURRENCY, concurrency // 2)
+            self._save()
+            return state.concurrency
+
+    def _load(self) -> Dict[str, HostTuning]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            return {host: HostTuning(**fields) for host, fields in data.items()}
+        except Exception:
+            return {}
+
+    def _save(self) -> None:
+        # Called with the lock held
+        try:
+            self.path.write_text(
+                json.dumps({host: asdict(state) for host, state in self._hosts.items()}, indent=2),
+                encoding="utf-8",
+            )
+        except Exception:
+            # Best-effort; tuning starts over next session
+            pass
@@ -1,8 +1,9 @@
+import multiprocessing
 import sys
 from PySide6.QtWidgets import QApplication
 from PySide6.QtCore import QCoreApplication
 from ui.main_window import MainWindow
-from utils.ffmpeg import ensure_ffmpeg
+from utils.toolchain import ToolchainService
 
 
 def main() -> int:
@@ -10,17 +11,19 @@ def main() -> int:
     QCoreApplication.setApplicationName("YT-DLP Studio")
 
     app = QApplication(sys.argv)
-    # Warm up ffmpeg (non-blocking UI creation still happens)
-    try:
-        ensure_ffmpeg()
-    except Exception:
-        pass
     window = MainWindow()
+    # Provision tools in the background; downloads that need them wait, others start right away
+    tools = ["ffmpeg"]
+    if window.settings.use_aria2c:
+        tools.append("aria2c")
+    ToolchainService.shared().start(*tools)
     window.show()
     return app.exec()
 
 
 if __name__ == "__main__":
+    # Post-processing pool processes re-enter here in frozen builds
+    multiprocessing.freeze_support()
     raise SystemExit(main())
 
 
@@ -1,5 +1,5 @@
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QAction
+from PySide6.QtCore import Qt, QTime, QTimer, QObject, Signal
+from PySide6.QtGui import QAction, QTextCursor
 from PySide6.QtWidgets import (
     QMainWindow,
     QWidget,
@@ -10,17 +10,41 @@ from PySide6.QtWidgets import (
     QFileDialog,
     QLabel,
     QComboBox,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
+    QAbstractItemView,
     QHeaderView,
-    QTextEdit,
+    QPlainTextEdit,
     QProgressBar,
+    QMenu,
 )
 
 from utils.settings import AppSettings
 from downloader.worker import DownloadWorker
-from PySide6.QtWidgets import QDialog, QFormLayout, QCheckBox, QSpinBox, QComboBox
-from utils.aria2 import ensure_aria2c
+from downloader.process_pool import DownloadProcessPool
+from downloader.engine import CANCELLED, PAUSED, archived_path
+from downloader.scheduler import (
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    PRIORITY_NAMES,
+    PRIORITY_NORMAL,
+    WAITING_TO_RETRY,
+    DownloadScheduler,
+    retry_delay,
+)
+from downloader.expander import PlaylistExpander
+from downloader.playlist import looks_like_collection
+from downloader.ratelimit import BandwidthLimiter
+from downloader.progress import ProgressAggregator, ProgressEvent, ProgressTotals, format_bytes, format_eta
+from ui.queue_model import QueueModel, ProgressDelegate, COLUMN_PROGRESS
+from PySide6.QtWidgets import QDialog, QFormLayout, QCheckBox, QSpinBox, QComboBox, QTimeEdit
+from utils.toolchain import ToolchainService
+from utils.queue_store import QueueJournal
+from utils.metrics import MetricsRecorder
+from utils.log_buffer import LEVEL_NAMES, INFO, LogBuffer
+
+
+class ToolchainSignals(QObject):
+    message = Signal(str, str)  # tool, message
 
 
 class MainWindow(QMainWindow):
@@ -30,13 +54,57 @@ class MainWindow(QMainWindow):
         self.resize(1000, 700)
 
         self.settings = AppSettings.load()
-        self.current_worker: DownloadWorker | None = None
-        self.active_row: int | None = None
+        self.workers: dict[int, DownloadWorker] = {}
+        self.expanders: list[PlaylistExpander] = []
+        self.scheduler = DownloadScheduler(
+            self.settings.max_concurrent_downloads,
+            self.settings.max_downloads_per_host,
+            shortest_first=self.settings.queue_order == "shortest",
+        )
+        self._running = False
+        # Pause pressed: running items are paused and nothing new starts until Resume
+        self._paused = False
+        BandwidthLimiter.shared().configure(self.settings.bandwidth_limit_kbps, self.settings.bandwidth_schedule)
+        self.queue = QueueModel(self)
         self.advanced_options: dict | None = None
+        self.progress = ProgressAggregator()
+        self.totals = ProgressTotals()
+        self.log_buffer = LogBuffer(self.settings.log_max_lines)
+        self.toolchain = ToolchainService.shared()
+        # Provisioning reports from its own threads; hop to the GUI thread through a signal
+        self.toolchain_signals = ToolchainSignals(self)
+        self.toolchain.add_listener(self.toolchain_signals.message.emit)
+
+        if self.settings.worker_backend == "process":
+            pool = DownloadProcessPool.shared()
+            pool.max_idle = self.settings.max_concurrent_downloads
+            pool.prestart(pool.max_idle)
 
         self._build_menu()
         self._build_ui()
         self._apply_theme(self.settings.theme)
+        self.toolchain_signals.message.connect(self._on_toolchain_message)
+        self._restore_queue()
+        if self.settings.metrics_port:
+            if MetricsRecorder.shared().serve(self.settings.metrics_port):
+                self.log_buffer.append(f"Metrics at http://127.0.0.1:{self.settings.metrics_port}/metrics")
+            else:
+                self.log_buffer.append(f"Could not serve metrics on port {self.settings.metrics_port}")
+
+        # Progress from workers is buffered and painted at a fixed 10 Hz tick
+        self._progress_timer = QTimer(self)
+        self._progress_timer.setInterval(100)
+        self._progress_timer.timeout.connect(self._flush_progress)
+        self._progress_timer.start()
+        # Log lines are appended in batches as well
+        self._log_timer = QTimer(self)
+        self._log_timer.setInterval(250)
+        self._log_timer.timeout.connect(self._flush_logs)
+        self._log_timer.start()
+        # Wakes the dispatcher when the next failed item is due for a retry
+        self._retry_timer = QTimer(self)
+        self._retry_timer.setSingleShot(True)
+        self._retry_timer.timeout.connect(self._dispatch)
 
     def _build_menu(self) -> None:
         menubar = self.menuBar()
@@ -95,16 +163,24 @@ class MainWindow(QMainWindow):
         if self.settings.output_dir:
             self.dest_value.setText(self.settings.output_dir)
 
-        # Queue table
-        self.table = QTableWidget(0, 6)
-        self.table.setHorizontalHeaderLabels(["URL", "Title", "Progress", "Speed", "ETA", "Status"])
+        # Queue table: a view over QueueModel; progress bars are painted, not widgets.
+        # Fixed section sizes keep layout cost independent of the number of rows.
+        self.table = QTableView()
+        self.table.setModel(self.queue)
+        self.table.setItemDelegateForColumn(COLUMN_PROGRESS, ProgressDelegate(self.table))
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setWordWrap(False)
+        self.table.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.table.customContextMenuRequested.connect(self._on_queue_menu)
+        vheader = self.table.verticalHeader()
+        vheader.setSectionResizeMode(QHeaderView.Fixed)
+        vheader.setDefaultSectionSize(26)
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.Stretch)
         header.setSectionResizeMode(1, QHeaderView.Stretch)
-        header.setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents)
-        header.setSectionResizeMode(3, QHeaderView.ResizeMode.ResizeToContents)
-        header.setSectionResizeMode(4, QHeaderView.ResizeMode.ResizeToContents)
-        header.setSectionResizeMode(5, QHeaderView.ResizeMode.ResizeToContents)
+        for column, width in ((2, 120), (3, 100), (4, 80), (5, 100), (6, 70)):
+            header.setSectionResizeMode(column, QHeaderView.Interactive)
+            header.resizeSection(column, width)
         root.addWidget(self.table)
 
         # Controls row
@@ -114,6 +190,7 @@ class MainWindow(QMainWindow):
         self.clear_button = QPushButton("Clear")
         self.power_button = QPushButton("Power Download…")
         self.pause_button.setEnabled(False)
+        self.pause_button.setToolTip("Pause all downloads, keeping what was downloaded so far.")
         controls.addWidget(self.start_button)
         controls.addWidget(self.power_button)
         controls.addWidget(self.pause_button)
@@ -128,14 +205,28 @@ class MainWindow(QMainWindow):
         self.overall_bar.setFormat("Overall: %p%")
         root.addWidget(self.overall_bar)
 
-        # Logs
-        self.logs = QTextEdit()
+        # Logs: plain text with a block cap, so old lines fall off instead of piling up
+        log_row = QHBoxLayout()
+        log_row.addWidget(QLabel("Log"))
+        log_row.addStretch(1)
+        log_row.addWidget(QLabel("Show"))
+        self.log_level_combo = QComboBox()
+        for level, name in LEVEL_NAMES.items():
+            self.log_level_combo.addItem(name, level)
+        self.log_level_combo.setCurrentText(self.settings.log_level)
+        self.log_level_combo.currentIndexChanged.connect(self._on_log_level_changed)
+        log_row.addWidget(self.log_level_combo)
+        root.addLayout(log_row)
+        self.logs = QPlainTextEdit()
         self.logs.setReadOnly(True)
+        self.logs.setUndoRedoEnabled(False)
+        self.logs.setMaximumBlockCount(self.log_buffer.max_lines)
         self.logs.setMaximumHeight(140)
         root.addWidget(self.logs)
 
         # Wire actions
         self.start_button.clicked.connect(self._on_start)
+        self.pause_button.clicked.connect(self._on_pause_all)
         self.clear_button.clicked.connect(self._on_clear)
         self.power_button.clicked.connect(self._on_open_power)
 
@@ -144,10 +235,10 @@ class MainWindow(QMainWindow):
             self.setStyleSheet(
                 """
                 QWidget { background: #0f1115; color: #e6e6e6; }
-                QLineEdit, QTextEdit, QComboBox { background: #171a21; border: 1px solid #2a2f3a; border-radius: 6px; padding: 6px; }
+                QLineEdit, QPlainTextEdit, QComboBox { background: #171a21; border: 1px solid #2a2f3a; border-radius: 6px; padding: 6px; }
                 QPushButton { background: #222735; border: 1px solid #2f3545; border-radius: 6px; padding: 8px 14px; }
                 QPushButton:hover { background: #2a3040; }
-                QTableWidget { background: #141820; gridline-color: #2a2f3a; }
+                QTableView { background: #141820; gridline-color: #2a2f3a; }
                 QHeaderView::section { background: #141820; border: 0; padding: 6px; }
                 QProgressBar { background: #171a21; border: 1px solid #2a2f3a; border-radius: 6px; text-align: center; }
                 QProgressBar::chunk { background-color: #3a86ff; border-radius: 6px; }
@@ -172,20 +263,124 @@ class MainWindow(QMainWindow):
         aria2_chk.setChecked(self.settings.use_aria2c)
         layout.addRow(aria2_chk)
 
+        rpc_chk = QCheckBox("Keep the faster engine running between downloads")
+        rpc_chk.setToolTip("Drives one background aria2c for all downloads, reusing its connections.")
+        rpc_chk.setChecked(self.settings.aria2_rpc)
+        rpc_chk.setEnabled(aria2_chk.isChecked())
+        aria2_chk.toggled.connect(rpc_chk.setEnabled)
+        layout.addRow(rpc_chk)
+
+        segmented_chk = QCheckBox("Split single files into parallel parts (built-in)")
+        segmented_chk.setToolTip(
+            "Downloads each single-file video over several connections without aria2c, on any system.\n"
+            "Used when the faster engine is off or not ready yet; the speed mode sets the number of connections."
+        )
+        segmented_chk.setChecked(self.settings.segmented_download)
+        layout.addRow(segmented_chk)
+
         speed_label = QLabel("Speed mode")
         speed_combo = QComboBox()
-        speed_combo.addItems(["Normal", "Faster", "Fastest"])
+        speed_combo.addItems(["Auto", "Normal", "Faster", "Fastest"])
         # Map existing numeric setting to a selection
         current = int(self.settings.concurrent_fragments or 8)
-        if current <= 4:
+        if self.settings.auto_concurrency:
+            speed_combo.setCurrentText("Auto")
+        elif current <= 4:
             speed_combo.setCurrentText("Normal")
         elif current <= 8:
             speed_combo.setCurrentText("Faster")
         else:
             speed_combo.setCurrentText("Fastest")
-        speed_combo.setToolTip("Choose how aggressive the app should be to speed up downloads.")
+        speed_combo.setToolTip(
+            "Choose how aggressive the app should be to speed up downloads.\n"
+            "Auto measures each site and remembers the number of connections that works best."
+        )
         layout.addRow(speed_label, speed_combo)
 
+        parallel_label = QLabel("Parallel downloads")
+        parallel_spin = QSpinBox()
+        parallel_spin.setRange(1, 16)
+        parallel_spin.setValue(int(self.settings.max_concurrent_downloads or 3))
+        parallel_spin.setToolTip("How many items of the queue are downloaded at the same time.")
+        layout.addRow(parallel_label, parallel_spin)
+
+        backend_label = QLabel("Run downloads in")
+        backend_combo = QComboBox()
+        backend_combo.addItem("The app (threads)", "thread")
+        backend_combo.addItem("Separate processes", "process")
+        backend_combo.setCurrentIndex(max(0, backend_combo.findData(self.settings.worker_backend)))
+        backend_combo.setToolTip(
+            "Separate processes spread the work of many parallel downloads over all CPU cores\n"
+            "and keep the window responsive. Applies to downloads started from now on."
+        )
+        layout.addRow(backend_label, backend_combo)
+
+        per_host_label = QLabel("Per-site limit")
+        per_host_spin = QSpinBox()
+        per_host_spin.setRange(1, 16)
+        per_host_spin.setValue(int(self.settings.max_downloads_per_host or 2))
+        per_host_spin.setToolTip("Maximum simultaneous downloads from the same website.")
+        layout.addRow(per_host_label, per_host_spin)
+
+        order_label = QLabel("Queue order")
+        order_combo = QComboBox()
+        order_combo.addItem("Shortest first", "shortest")
+        order_combo.addItem("As added", "added")
+        order_combo.setCurrentIndex(max(0, order_combo.findData(self.settings.queue_order)))
+        order_combo.setToolTip(
+            "Shortest first starts short videos before long ones (when their length is known),\n"
+            "so most of the queue finishes sooner. Items marked High priority always go first."
+        )
+        layout.addRow(order_label, order_combo)
+
+        retry_label = QLabel("Retry failed downloads")
+        retry_spin = QSpinBox()
+        retry_spin.setRange(0, 10)
+        retry_spin.setSuffix(" times")
+        retry_spin.setValue(int(self.settings.retry_attempts))
+        retry_spin.setToolTip("Failed items are tried again after 30 s, then 1 min, 2 min and so on.")
+        layout.addRow(retry_label, retry_spin)
+
+        playlist_chk = QCheckBox("Queue the whole playlist for videos opened from one")
+        playlist_chk.setToolTip(
+            "Links like watch?v=...&list=... normally add just that video.\n"
+            "Turn this on to add every video of the playlist or mix instead."
+        )
+        playlist_chk.setChecked(self.settings.yes_playlist)
+        layout.addRow(playlist_chk)
+
+        # A single time window is offered here; more rules can be added to the settings file
+        schedule = self.settings.bandwidth_schedule[0] if self.settings.bandwidth_schedule else None
+        limit_label = QLabel("Speed limit")
+        limit_spin = QSpinBox()
+        limit_spin.setRange(0, 1024 * 1024)
+        limit_spin.setSingleStep(256)
+        limit_spin.setSuffix(" KiB/s")
+        limit_spin.setSpecialValueText("Unlimited")
+        limit_spin.setValue(int(schedule["limit_kbps"] if schedule else self.settings.bandwidth_limit_kbps or 0))
+        limit_spin.setToolTip("Total download speed shared by all downloads.")
+        layout.addRow(limit_label, limit_spin)
+
+        window_chk = QCheckBox("Only between")
+        window_start = QTimeEdit(QTime.fromString(schedule["start"] if schedule else "08:00", "HH:mm"))
+        window_end = QTimeEdit(QTime.fromString(schedule["end"] if schedule else "18:00", "HH:mm"))
+        for edit in (window_start, window_end):
+            edit.setDisplayFormat("HH:mm")
+        window_chk.setChecked(schedule is not None)
+        window_row = QHBoxLayout()
+        window_row.addWidget(window_start)
+        window_row.addWidget(QLabel("and"))
+        window_row.addWidget(window_end)
+        layout.addRow(window_chk, window_row)
+
+        log_label = QLabel("Log lines kept")
+        log_spin = QSpinBox()
+        log_spin.setRange(100, 100000)
+        log_spin.setSingleStep(1000)
+        log_spin.setValue(self.log_buffer.max_lines)
+        log_spin.setToolTip("Older lines are dropped from the window; the full log is kept in ~/.ytdlp_gui.log.")
+        layout.addRow(log_label, log_spin)
+
         default_dir_label = QLabel("Default downloads folder")
         default_dir_btn = QPushButton("Choose…")
         default_dir_val = QLineEdit(self.settings.output_dir or "")
@@ -200,6 +395,29 @@ class MainWindow(QMainWindow):
         layout.addRow(default_dir_label, QWidget())
         layout.addRow(row)
 
+        staging_label = QLabel("Staging folder (optional)")
+        staging_label.setToolTip(
+            "Downloads and merges happen in this folder (pick a fast local disk), and only the\n"
+            "finished file is moved to the output folder, e.g. a network share."
+        )
+        staging_val = QLineEdit(self.settings.staging_dir or "")
+        staging_val.setReadOnly(True)
+        staging_val.setPlaceholderText("Off: work directly in the output folder")
+        staging_btn = QPushButton("Choose…")
+        staging_clear = QPushButton("Clear")
+        def _pick_staging():
+            path = QFileDialog.getExistingDirectory(self, "Select staging folder")
+            if path:
+                staging_val.setText(path)
+        staging_btn.clicked.connect(_pick_staging)
+        staging_clear.clicked.connect(staging_val.clear)
+        staging_row = QHBoxLayout()
+        staging_row.addWidget(staging_val)
+        staging_row.addWidget(staging_btn)
+        staging_row.addWidget(staging_clear)
+        layout.addRow(staging_label, QWidget())
+        layout.addRow(staging_row)
+
         btns = QHBoxLayout()
         ok_btn = QPushButton("OK")
         cancel_btn = QPushButton("Cancel")
@@ -212,25 +430,79 @@ class MainWindow(QMainWindow):
 
         def _accept():
             self.settings.use_aria2c = aria2_chk.isChecked()
+            self.settings.aria2_rpc = rpc_chk.isChecked()
+            self.settings.segmented_download = segmented_chk.isChecked()
             # Map selection back to numeric fragments
             sel = speed_combo.currentText()
+            self.settings.auto_concurrency = sel == "Auto"
             if sel == "Normal":
                 self.settings.concurrent_fragments = 4
             elif sel == "Faster":
                 self.settings.concurrent_fragments = 8
-            else:
+            elif sel == "Fastest":
                 self.settings.concurrent_fragments = 16
+            self.settings.max_concurrent_downloads = parallel_spin.value()
+            self.settings.max_downloads_per_host = per_host_spin.value()
+            self.settings.worker_backend = backend_combo.currentData()
+            self.settings.queue_order = order_combo.currentData()
+            self.settings.retry_attempts = retry_spin.value()
+            self.settings.yes_playlist = playlist_chk.isChecked()
+            self.scheduler.configure(
+                self.settings.max_concurrent_downloads,
+                self.settings.max_downloads_per_host,
+                shortest_first=self.settings.queue_order == "shortest",
+            )
+            self._dispatch()
+            if window_chk.isChecked():
+                self.settings.bandwidth_limit_kbps = 0
+                self.settings.bandwidth_schedule = [
+                    {
+                        "start": window_start.time().toString("HH:mm"),
+                        "end": window_end.time().toString("HH:mm"),
+                        "limit_kbps": limit_spin.value(),
+                    }
+                ]
+            else:
+                self.settings.bandwidth_limit_kbps = limit_spin.value()
+                self.settings.bandwidth_schedule = []
+            # Running downloads pick the new limit up immediately
+            BandwidthLimiter.shared().configure(self.settings.bandwidth_limit_kbps, self.settings.bandwidth_schedule)
+            self.settings.log_max_lines = log_spin.value()
+            self.log_buffer.set_max_lines(self.settings.log_max_lines)
+            self.logs.setMaximumBlockCount(self.settings.log_max_lines)
             self.settings.output_dir = default_dir_val.text() or None
+            self.settings.staging_dir = staging_val.text() or None
             self.settings.save()
             if self.settings.output_dir:
                 self.dest_value.setText(self.settings.output_dir)
             if self.settings.use_aria2c:
-                ensure_aria2c()
+                self.toolchain.request("aria2c")
             dlg.accept()
         ok_btn.clicked.connect(_accept)
 
         dlg.exec()
 
+    def _log_level(self) -> int:
+        return int(self.log_level_combo.currentData() or INFO)
+
+    def _flush_logs(self) -> None:
+        level = self._log_level()
+        lines = [line.format() for line in self.log_buffer.drain() if line.level >= level]
+        if lines:
+            self.logs.appendPlainText("\n".join(lines))
+
+    def _on_log_level_changed(self) -> None:
+        self.settings.log_level = self.log_level_combo.currentText()
+        self.settings.save()
+        level = self._log_level()
+        self.logs.setPlainText("\n".join(line.format() for line in self.log_buffer.lines(level)))
+        self.logs.moveCursor(QTextCursor.End)
+
+    def _on_toolchain_message(self, tool: str, message: str) -> None:
+        self.statusBar().showMessage(message, 5000)
+        if not message.startswith("Downloading"):
+            self.log_buffer.append(message)
+
     def _on_about(self) -> None:
         from PySide6.QtWidgets import QMessageBox
         version = "1.0.0"
@@ -254,111 +526,302 @@ class MainWindow(QMainWindow):
         if not text:
             return
         urls = [u.strip() for u in text.splitlines() if u.strip()]
+        # Playlists/channels are listed in the background and stream into the queue
+        singles = []
         for url in urls:
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(url))
-            self.table.setItem(row, 1, QTableWidgetItem(""))
-            # Progress cell: single bar with centered percent text
-            bar = QProgressBar()
-            bar.setRange(0, 100)
-            bar.setValue(0)
-            bar.setTextVisible(True)
-            bar.setFormat("0%")
-            self.table.setCellWidget(row, 2, bar)
-            self.table.setItem(row, 3, QTableWidgetItem("-"))
-            self.table.setItem(row, 4, QTableWidgetItem("-"))
-            self.table.setItem(row, 5, QTableWidgetItem("Queued"))
+            if looks_like_collection(url, self.settings.yes_playlist):
+                self._expand_collection(url)
+            else:
+                singles.append(url)
+        self._enqueue_entries([{"url": url} for url in singles])
         self.url_input.clear()
 
-    # Download flow
-    def _find_next_queued_row(self) -> int | None:
-        for row in range(self.table.rowCount()):
-            status_item = self.table.item(row, 5)
-            if status_item and status_item.text() in ("Queued", "Error"):
-                return row
-        return None
+    def _restore_queue(self) -> None:
+        interrupted = self.queue.attach_journal(QueueJournal())
+        for item_id in self.queue.ids_with_status("Queued"):
+            self._enqueue(item_id)
+        for item_id in self.queue.ids_with_status(WAITING_TO_RETRY):
+            self._enqueue(item_id, delay=retry_delay(self.queue.item(item_id).attempts))
+        for item in self.queue.items():
+            if item.downloaded_bytes or item.total_bytes:
+                self.totals.update(item.item_id, item.downloaded_bytes, item.total_bytes, 0.0)
+        self._update_overall_progress()
+        if interrupted:
+            # yt-dlp continues from the .part files left in each item's output folder
+            self.log_buffer.append(f"Resuming {len(interrupted)} interrupted downloads")
+            self._running = True
+            self._dispatch()
+
+    def _enqueue_entries(self, entries: list[dict]) -> None:
+        fmt = self.format_combo.currentText()
+        skipped = 0
+        for item_id, entry in zip(self.queue.add_entries(entries), entries):
+            # Entries from playlist listing carry their id: skip what is already on disk
+            video_key = (entry["ie_key"], entry["id"]) if entry.get("ie_key") and entry.get("id") else None
+            if archived_path(video_key, fmt, self.advanced_options):
+                self.queue.set_status(item_id, "Skipped")
+                skipped += 1
+                continue
+            self._enqueue(item_id)
+        if skipped:
+            self.log_buffer.append(f"Skipped {skipped} already downloaded items")
+        self._dispatch()
+
+    def _expand_collection(self, url: str) -> None:
+        expander = PlaylistExpander(url)
+        self.expanders.append(expander)
+        expander.signals.entries.connect(lambda _source, page: self._enqueue_entries(page))
+        expander.signals.log.connect(self.log_buffer.append)
+        expander.signals.finished.connect(lambda source, count: self._on_expanded(expander, source, count))
+        self.log_buffer.append(f"Listing {url}…")
+        expander.start()
+
+    def _on_expanded(self, expander: PlaylistExpander, url: str, count: int) -> None:
+        if count < 0:
+            # Listing failed; fall back to handing the URL to yt-dlp as a single item
+            self._enqueue_entries([{"url": url}])
+        else:
+            self.log_buffer.append(f"Added {count} items from {url}")
+        expander.wait()
+        self.expanders.remove(expander)
+        expander.deleteLater()
 
+    # Download flow
     def _on_start(self) -> None:
-        if self.current_worker is not None:
-            return
         if not self.dest_value.text():
-            self.logs.append("Please select an output directory.")
+            self.log_buffer.append("Please select an output directory.")
+            return
+        # Paused items continue first; failed items are retried when the queue is (re)started
+        self._requeue(self.queue.ids_with_status(PAUSED), front=True)
+        for item_id in self.queue.ids_with_status("Queued", "Error"):
+            if item_id not in self.workers:
+                self.queue.set_status(item_id, "Queued")
+                self.queue.set_attempts(item_id, 0)
+                self._enqueue(item_id)
+        if self.scheduler.is_idle():
+            self.log_buffer.append("No queued items.")
             return
-        next_row = self._find_next_queued_row()
-        if next_row is None:
-            self.logs.append("No queued items.")
+        self._paused = False
+        self._running = True
+        self._dispatch()
+
+    def _on_pause_all(self) -> None:
+        if self._paused:
+            self._paused = False
+            self._running = True
+            self._requeue(self.queue.ids_with_status(PAUSED), front=True)
+            self.log_buffer.append("Resuming downloads")
+            self._dispatch()
             return
-        self._start_row_download(next_row)
+        # Queued items stay queued; they start again on Resume
+        self._paused = True
+        self._running = False
+        for item_id, worker in self.workers.items():
+            if self.queue.status_of(item_id) == "Downloading":
+                worker.pause()
+        self.log_buffer.append("Pausing downloads…")
+        self._update_pause_button()
+
+    def _on_queue_menu(self, pos) -> None:
+        ids = [index.data(Qt.UserRole) for index in self.table.selectionModel().selectedRows()]
+        if not ids:
+            return
+        menu = QMenu(self)
+        pause_action = menu.addAction("Pause")
+        resume_action = menu.addAction("Resume")
+        cancel_action = menu.addAction("Cancel")
+        priority_menu = menu.addMenu("Priority")
+        priority_actions = {
+            priority_menu.addAction(PRIORITY_NAMES[priority]): priority
+            for priority in (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+        }
+        chosen = menu.exec(self.table.viewport().mapToGlobal(pos))
+        if chosen in priority_actions:
+            for item_id in ids:
+                self.queue.set_priority(item_id, priority_actions[chosen])
+                self.scheduler.set_priority(item_id, priority_actions[chosen])
+        elif chosen is pause_action:
+            self._stop_items(ids, PAUSED)
+        elif chosen is cancel_action:
+            self._stop_items(ids, CANCELLED)
+        elif chosen is resume_action:
+            self._requeue([i for i in ids if self.queue.status_of(i) in (PAUSED, CANCELLED, "Error", WAITING_TO_RETRY)], front=True)
+            if not self._paused:
+                self._running = True
+                self._dispatch()
+
+    def _stop_items(self, ids: list[int], reason: str) -> None:
+        """Pause or cancel items; running downloads stop at their next progress report."""
+        for item_id in ids:
+            status = self.queue.status_of(item_id)
+            worker = self.workers.get(item_id)
+            if worker is not None and status == "Downloading" and reason == CANCELLED:
+                worker.cancel()
+            elif worker is not None and status == "Downloading":
+                worker.pause()
+            elif status in ("Queued", WAITING_TO_RETRY) or (status == PAUSED and reason == CANCELLED):
+                self.scheduler.discard(item_id)
+                self.queue.set_status(item_id, reason)
+        self._update_pause_button()
+
+    def _requeue(self, ids: list[int], front: bool = False) -> None:
+        for item_id in ids:
+            if item_id in self.workers:
+                continue
+            self.queue.set_status(item_id, "Queued")
+            self.queue.set_attempts(item_id, 0)
+            # Items waiting for a retry start now
+            self.scheduler.discard(item_id)
+            self._enqueue(item_id, front=front)
+
+    def _enqueue(self, item_id: int, front: bool = False, delay: float = 0.0) -> None:
+        item = self.queue.item(item_id)
+        self.scheduler.enqueue(
+            item_id, item.url, front=front, priority=item.priority, cost=item.cost, delay=delay
+        )
 
-    def _start_row_download(self, row: int) -> None:
-        url = self.table.item(row, 0).text()
-        fmt = self.format_combo.currentText()
-        out_dir = self.dest_value.text()
+    def _update_pause_button(self) -> None:
+        self.pause_button.setText("Resume" if self._paused else "Pause")
+        self.pause_button.setEnabled(self._paused or bool(self.workers))
 
-        worker = DownloadWorker(url=url, output_dir=out_dir, format_mode=fmt, advanced_options=self.advanced_options)
-        self.current_worker = worker
-        self.active_row = row
+    def _dispatch(self) -> None:
+        self._update_pause_button()
+        if not self._running:
+            return
+        for item_id in self.scheduler.next_batch():
+            self._start_download(item_id)
+        self._update_pause_button()
+        wait = self.scheduler.next_ready_in()
+        if wait is not None:
+            self._retry_timer.start(int(wait * 1000) + 50)
+        if self.scheduler.is_idle() and not self.workers:
+            self._running = False
+            stats = self.progress.stats()
+            self.log_buffer.append(
+                f"Queue finished. Progress events: {stats['received']} received, "
+                f"{stats['coalesced']} coalesced into {stats['flushes']} UI updates."
+            )
 
-        self.table.setItem(row, 5, QTableWidgetItem("Downloading"))
+    def _start_download(self, item_id: int) -> None:
+        item = self.queue.item(item_id)
+        if item is None:
+            self.scheduler.finish(item_id)
+            return
+        url = item.url
+        # Items keep the options they were first started with, so a resumed download
+        # writes to the same .part file
+        fmt = item.format_mode or self.format_combo.currentText()
+        advanced = item.advanced_options if item.format_mode else self.advanced_options
+        out_dir = item.output_dir or self.dest_value.text()
+        if not out_dir:
+            self.scheduler.finish(item_id)
+            self.queue.set_status(item_id, "Error")
+            self.log_buffer.append("Please select an output directory.")
+            return
+        self.queue.set_options(item_id, fmt, advanced, out_dir)
+        process_pool = None
+        if self.settings.worker_backend == "process":
+            process_pool = DownloadProcessPool.shared()
+            # One warm process per download slot
+            process_pool.max_idle = self.settings.max_concurrent_downloads
+
+        worker = DownloadWorker(
+            url=url,
+            output_dir=out_dir,
+            format_mode=fmt,
+            advanced_options=advanced,
+            progress_sink=lambda event: self.progress.update(item_id, event),
+            log_sink=self.log_buffer.append,
+            video_key=(item.extractor, item.video_id) if item.extractor and item.video_id else None,
+            process_pool=process_pool,
+        )
+        self.workers[item_id] = worker
+
+        self.queue.set_status(item_id, "Downloading")
 
-        worker.signals.title.connect(lambda title: self._on_title(row, title))
-        worker.signals.progress.connect(lambda pct, speed, eta, status: self._on_progress(row, pct, speed, eta, status))
-        worker.signals.log.connect(self.logs.append)
-        worker.signals.finished.connect(lambda ok, path: self._on_finished(row, ok, path))
+        worker.signals.title.connect(lambda title: self._on_title(item_id, title))
+        worker.signals.status.connect(lambda status: self.queue.set_status(item_id, status))
+        worker.signals.downloaded.connect(lambda: self._on_downloaded(item_id))
+        worker.signals.finished.connect(lambda ok, path: self._on_finished(item_id, ok, path))
         worker.start()
 
-    def _on_title(self, row: int, title: str) -> None:
-        self.table.setItem(row, 1, QTableWidgetItem(title))
-
-    def _on_progress(self, row: int, percent: int, speed: str, eta: str, status: str) -> None:
-        widget = self.table.cellWidget(row, 2)
-        if isinstance(widget, QProgressBar):
-            clamped = max(0, min(100, percent))
-            widget.setValue(clamped)
-            widget.setFormat(f"{clamped}%")
-        self.table.setItem(row, 3, QTableWidgetItem(speed or "-"))
-        self.table.setItem(row, 4, QTableWidgetItem(eta or "-"))
-        self.table.setItem(row, 5, QTableWidgetItem(status or "Downloading"))
-        # Update overall bar
+    def _on_title(self, item_id: int, title: str) -> None:
+        self.queue.set_title(item_id, title)
+
+    def _flush_progress(self) -> None:
+        updates = self.progress.drain()
+        if not updates:
+            return
+        for item_id, event in updates.items():
+            self._on_progress(item_id, event)
+        # Update overall bar once per tick rather than once per event
+        self._update_overall_progress()
+        stats = self.progress.stats()
+        self.overall_bar.setToolTip(
+            f"Progress events: {stats['received']} received, {stats['coalesced']} coalesced, "
+            f"{stats['flushes']} UI updates"
+        )
+
+    def _on_progress(self, item_id: int, event: ProgressEvent) -> None:
+        self.queue.update_progress(item_id, event)
+        self.totals.update(item_id, event.downloaded_bytes, event.total_bytes, event.speed_bps)
+
+    def _on_downloaded(self, item_id: int) -> None:
+        # Post-processing continues in the background; free the slot for the next download
+        self.progress.discard(item_id)
+        self.totals.complete(item_id)
+        self.scheduler.finish(item_id)
+        self._dispatch()
         self._update_overall_progress()
 
-    def _on_finished(self, row: int, ok: bool, path: str) -> None:
-        self.table.setItem(row, 5, QTableWidgetItem("Completed" if ok else "Error"))
-        self.current_worker = None
-        self.active_row = None
-        # Auto-continue next item
-        next_row = self._find_next_queued_row()
-        if next_row is not None:
-            self._start_row_download(next_row)
+    def _on_finished(self, item_id: int, ok: bool, path: str) -> None:
+        # Drop any buffered tick so it cannot overwrite the final status
+        self.progress.discard(item_id)
+        worker = self.workers.pop(item_id, None)
+        stopped = worker.job.stopped if worker is not None else ""
+        item = self.queue.item(item_id)
+        if ok or stopped or item is None:
+            self.queue.set_status(item_id, "Completed" if ok else stopped or "Error")
+        elif item.attempts < self.settings.retry_attempts:
+            # Retry later rather than at once, waiting longer after every failure
+            self.queue.set_attempts(item_id, item.attempts + 1)
+            delay = retry_delay(item.attempts)
+            self.queue.set_status(item_id, WAITING_TO_RETRY)
+            self.log_buffer.append(f"Retrying in {format_eta(delay)}: {item.url}")
+            self.scheduler.finish(item_id)
+            self._enqueue(item_id, delay=delay)
         else:
-            self._update_overall_progress()
+            self.queue.set_status(item_id, "Error")
+        if ok:
+            self.totals.complete(item_id)
+        else:
+            self.totals.stop(item_id)
+        if worker is not None:
+            worker.wait()
+            worker.deleteLater()
+        self.scheduler.finish(item_id)
+        # Auto-continue with the next queued items
+        self._dispatch()
+        self._update_overall_progress()
 
     def _on_clear(self) -> None:
-        # remove rows that are Completed or Error
-        rows_to_remove = []
-        for row in range(self.table.rowCount()):
-            status = self.table.item(row, 5)
-            if status and status.text() in ("Completed", "Error"):
-                rows_to_remove.append(row)
-        for idx in reversed(rows_to_remove):
-            self.table.removeRow(idx)
+        # remove rows that are Completed, Error, Skipped or Cancelled (their partial files stay on disk)
+        for item_id in self.queue.remove_with_status("Completed", "Error", "Skipped", CANCELLED):
+            self.scheduler.discard(item_id)
+            self.totals.remove(item_id)
         self._update_overall_progress()
 
     def _update_overall_progress(self) -> None:
-        total = self.table.rowCount()
-        if total == 0:
+        totals = self.totals
+        if len(self.queue) == 0 or totals.total_bytes <= 0:
             self.overall_bar.setValue(0)
+            self.overall_bar.setFormat("Overall: %p%")
             return
-        percents = []
-        for row in range(total):
-            widget = self.table.cellWidget(row, 2)
-            if isinstance(widget, QProgressBar):
-                percents.append(widget.value())
-            else:
-                percents.append(0)
-        overall = int(sum(percents) / max(1, len(percents)))
-        self.overall_bar.setValue(overall)
+        self.overall_bar.setValue(totals.percent)
+        text = f"Overall: %p% · {format_bytes(totals.downloaded_bytes)} of {format_bytes(totals.total_bytes)}"
+        if totals.speed_bps >= 1:
+            text += f" · {format_bytes(totals.speed_bps)}/s · ETA {format_eta(totals.eta_seconds)}"
+        self.overall_bar.setFormat(text)
 
     def _on_open_power(self) -> None:
         dlg = QDialog(self)
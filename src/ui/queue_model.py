@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Iterable, List
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionProgressBar
+
+from downloader.postprocess import STAGE_STATUSES
+from downloader.progress import ProgressEvent
+from downloader.scheduler import PRIORITY_NAMES, PRIORITY_NORMAL, estimate_cost
+from utils.queue_store import QueueJournal
+
+
+COLUMN_URL = 0
+COLUMN_TITLE = 1
+COLUMN_PROGRESS = 2
+COLUMN_SPEED = 3
+COLUMN_ETA = 4
+COLUMN_STATUS = 5
+COLUMN_PRIORITY = 6
+
+HEADERS = ["URL", "Title", "Progress", "Speed", "ETA", "Status", "Priority"]
+
+# Fields persisted per item; speed/ETA are transient
+RECORD_FIELDS = (
+    "url", "title", "extractor", "video_id", "status", "percent",
+    "downloaded_bytes", "total_bytes", "format_mode", "advanced_options", "output_dir",
+    "priority", "cost", "attempts",
+)
+
+# Minimum seconds between journaled progress checkpoints of one item
+PROGRESS_JOURNAL_INTERVAL = 5.0
+
+
+class QueueItem:
+    """One queue entry; slotted so that large queues stay small in memory."""
+
+    __slots__ = (
+        "item_id", "url", "title", "extractor", "video_id", "percent", "speed", "eta", "status",
+        "downloaded_bytes", "total_bytes", "format_mode", "advanced_options", "output_dir",
+        "priority", "cost", "attempts",
+    )
+
+    def __init__(
+        self,
+        item_id: int,
+        url: str,
+        title: str = "",
+        status: str = "Queued",
+        extractor: str | None = None,
+        video_id: str | None = None,
+        cost: float | None = None,
+    ) -> None:
+        self.item_id = item_id
+        self.url = url
+        self.title = title
+        self.extractor = extractor
+        self.video_id = video_id
+        self.percent = 0
+        self.speed = ""
+        self.eta = ""
+        self.status = status
+        self.downloaded_bytes = 0
+        self.total_bytes = 0
+        # Options the item was started with; None until it first starts
+        self.format_mode: str | None = None
+        self.advanced_options: dict | None = None
+        self.output_dir: str | None = None
+        self.priority = PRIORITY_NORMAL
+        # Estimated length in seconds of media (see estimate_cost); None if unknown
+        self.cost = cost
+        # Failed attempts since the item was last queued by hand
+        self.attempts = 0
+
+    def to_record(self) -> Dict[str, Any]:
+        record = {field: getattr(self, field) for field in RECORD_FIELDS}
+        record["id"] = self.item_id
+        return record
+
+
+class QueueModel(QAbstractTableModel):
+    """Table model over a flat list of :class:`QueueItem` records.
+
+    Besides row order, the model keeps an id -> row index and a per-status
+    index (insertion-ordered dicts used as sets), so finding an item by id or
+    the next item with a given status does not scan the queue.
+    """
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._rows: List[QueueItem] = []
+        self._row_of: Dict[int, int] = {}
+        self._by_status: Dict[str, Dict[int, None]] = {}
+        self._next_id = 0
+        self._journal: QueueJournal | None = None
+        self._journaled_at: Dict[int, float] = {}
+
+    # Qt model API
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return None
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        item = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == COLUMN_URL:
+                return item.url
+            if column == COLUMN_TITLE:
+                return item.title
+            if column == COLUMN_PROGRESS:
+                return f"{item.percent}%"
+            if column == COLUMN_SPEED:
+                return item.speed or "-"
+            if column == COLUMN_ETA:
+                return item.eta or "-"
+            if column == COLUMN_STATUS:
+                return item.status
+            if column == COLUMN_PRIORITY:
+                return PRIORITY_NAMES.get(item.priority, "") if item.priority != PRIORITY_NORMAL else ""
+        elif role == Qt.UserRole:
+            return item.percent if column == COLUMN_PROGRESS else item.item_id
+        elif role == Qt.ToolTipRole and column in (COLUMN_URL, COLUMN_TITLE):
+            return item.url if column == COLUMN_URL else item.title
+        return None
+
+    # Queue API
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add_urls(self, urls: Iterable[str]) -> List[int]:
+        return self.add_entries({"url": url} for url in urls)
+
+    def add_entries(self, entries: Iterable[Dict[str, Any]]) -> List[int]:
+        """Append entry dicts (url, title, ie_key, id, duration, filesize) in a single insert and return their ids."""
+        new_items = []
+        for entry in entries:
+            new_items.append(
+                QueueItem(
+                    self._next_id,
+                    entry["url"],
+                    entry.get("title") or "",
+                    extractor=entry.get("ie_key"),
+                    video_id=entry.get("id"),
+                    cost=estimate_cost(entry.get("duration"), entry.get("filesize")),
+                )
+            )
+            self._next_id += 1
+        ids = self._insert(new_items)
+        if self._journal is not None and new_items:
+            self._journal.add(item.to_record() for item in new_items)
+        return ids
+
+    def attach_journal(self, journal: QueueJournal) -> List[int]:
+        """Restore the queue saved in ``journal`` and record all further changes to it.
+
+        Items that were downloading or post-processing when the app stopped
+        come back as Queued;
+        the ids of those items are returned so the caller can resume them.
+        """
+        restored = []
+        interrupted = []
+        for record in journal.load():
+            item = QueueItem(self._next_id, record.get("url") or "")
+            self._next_id += 1
+            for field in RECORD_FIELDS:
+                if field in record and field != "url":
+                    setattr(item, field, record[field])
+            if item.status == "Downloading" or item.status in STAGE_STATUSES:
+                item.status = "Queued"
+                interrupted.append(item.item_id)
+            if item.url:
+                restored.append(item)
+        self._insert(restored)
+        # Compact once at startup so the journal does not grow across sessions
+        journal.rewrite(item.to_record() for item in restored)
+        self._journal = journal
+        return interrupted
+
+    def _insert(self, new_items: List[QueueItem]) -> List[int]:
+        if not new_items:
+            return []
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(new_items) - 1)
+        for offset, item in enumerate(new_items):
+            self._rows.append(item)
+            self._row_of[item.item_id] = first + offset
+            self._index_status(item.item_id, item.status)
+        self.endInsertRows()
+        return [item.item_id for item in new_items]
+
+    def item(self, item_id: int) -> QueueItem | None:
+        row = self._row_of.get(item_id)
+        return self._rows[row] if row is not None else None
+
+    def status_of(self, item_id: int) -> str | None:
+        item = self.item(item_id)
+        return item.status if item is not None else None
+
+    def first_with_status(self, status: str) -> int | None:
+        ids = self._by_status.get(status)
+        return next(iter(ids)) if ids else None
+
+    def ids_with_status(self, *statuses: str) -> List[int]:
+        ids: List[int] = []
+        for status in statuses:
+            ids.extend(self._by_status.get(status, ()))
+        return ids
+
+    def count_with_status(self, status: str) -> int:
+        return len(self._by_status.get(status, ()))
+
+    def set_status(self, item_id: int, status: str) -> None:
+        item = self.item(item_id)
+        if item is None or item.status == status:
+            return
+        self._unindex_status(item_id, item.status)
+        item.status = status
+        self._index_status(item_id, status)
+        self._emit_row_changed(item_id, COLUMN_STATUS, COLUMN_STATUS)
+        if self._journal is not None:
+            self._journal.update(
+                item_id,
+                status=status,
+                percent=item.percent,
+                downloaded_bytes=item.downloaded_bytes,
+                total_bytes=item.total_bytes,
+            )
+            self._compact_journal()
+
+    def set_options(self, item_id: int, format_mode: str, advanced_options: dict | None, output_dir: str) -> None:
+        item = self.item(item_id)
+        if item is None:
+            return
+        item.format_mode = format_mode
+        item.advanced_options = advanced_options
+        item.output_dir = output_dir
+        if self._journal is not None:
+            self._journal.update(
+                item_id, format_mode=format_mode, advanced_options=advanced_options, output_dir=output_dir
+            )
+
+    def set_priority(self, item_id: int, priority: int) -> None:
+        item = self.item(item_id)
+        if item is None:
+            return
+        item.priority = priority
+        self._emit_row_changed(item_id, COLUMN_PRIORITY, COLUMN_PRIORITY)
+        if self._journal is not None:
+            self._journal.update(item_id, priority=priority)
+
+    def set_attempts(self, item_id: int, attempts: int) -> None:
+        item = self.item(item_id)
+        if item is None:
+            return
+        item.attempts = attempts
+        if self._journal is not None:
+            self._journal.update(item_id, attempts=attempts)
+
+    def set_title(self, item_id: int, title: str) -> None:
+        item = self.item(item_id)
+        if item is None:
+            return
+        item.title = title
+        self._emit_row_changed(item_id, COLUMN_TITLE, COLUMN_TITLE)
+        if self._journal is not None:
+            self._journal.update(item_id, durable=False, title=title)
+
+    def update_progress(self, item_id: int, event: ProgressEvent) -> None:
+        item = self.item(item_id)
+        if item is None:
+            return
+        item.percent = event.percent
+        item.speed = event.speed
+        item.eta = event.eta
+        item.downloaded_bytes = event.downloaded_bytes
+        item.total_bytes = event.total_bytes
+        if event.status and event.status != item.status:
+            self.set_status(item_id, event.status)
+        self._emit_row_changed(item_id, COLUMN_PROGRESS, COLUMN_STATUS)
+        if self._journal is not None:
+            now = time.monotonic()
+            if now - self._journaled_at.get(item_id, 0.0) >= PROGRESS_JOURNAL_INTERVAL:
+                self._journaled_at[item_id] = now
+                self._journal.update(
+                    item_id,
+                    durable=False,
+                    percent=item.percent,
+                    downloaded_bytes=item.downloaded_bytes,
+                    total_bytes=item.total_bytes,
+                )
+                self._compact_journal()
+
+    def remove_with_status(self, *statuses: str) -> List[int]:
+        doomed = set(self.ids_with_status(*statuses))
+        if not doomed:
+            return []
+        self.beginResetModel()
+        self._rows = [item for item in self._rows if item.item_id not in doomed]
+        self._row_of = {item.item_id: row for row, item in enumerate(self._rows)}
+        for status in statuses:
+            self._by_status.pop(status, None)
+        for item_id in doomed:
+            self._journaled_at.pop(item_id, None)
+        self.endResetModel()
+        if self._journal is not None:
+            self._journal.remove(doomed)
+            self._compact_journal()
+        return list(doomed)
+
+    def _compact_journal(self) -> None:
+        # Rewriting costs one line per live item, so doing it every few multiples of that keeps appends O(1)
+        if self._journal is not None and self._journal.needs_compaction(len(self._rows)):
+            self._journal.rewrite(item.to_record() for item in self._rows)
+
+    def items(self) -> Iterable[QueueItem]:
+        return iter(self._rows)
+
+    def _index_status(self, item_id: int, status: str) -> None:
+        self._by_status.setdefault(status, {})[item_id] = None
+
+    def _unindex_status(self, item_id: int, status: str) -> None:
+        ids = self._by_status.get(status)
+        if ids is not None:
+            ids.pop(item_id, None)
+            if not ids:
+                del self._by_status[status]
+
+    def _emit_row_changed(self, item_id: int, first_column: int, last_column: int) -> None:
+        row = self._row_of[item_id]
+        self.dataChanged.emit(self.index(row, first_column), self.index(row, last_column))
+
+
+class ProgressDelegate(QStyledItemDelegate):
+    """Paints the progress column as a progress bar without per-row widgets."""
+
+    def paint(self, painter, option, index) -> None:
+        percent = index.data(Qt.UserRole) or 0
+        bar = QStyleOptionProgressBar()
+        bar.rect = option.rect.adjusted(2, 2, -2, -2)
+        bar.minimum = 0
+        bar.maximum = 100
+        bar.progress = int(percent)
+        bar.text = f"{int(percent)}%"
+        bar.textVisible = True
+        bar.textAlignment = Qt.AlignCenter
+        bar.state = option.state
+        style = option.widget.style() if option.widget is not None else QApplication.style()
+        style.drawControl(QStyle.CE_ProgressBar, bar, painter, option.widget)
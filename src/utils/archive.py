@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Set, Tuple
+
+from utils.info_cache import cache_key
+
+
+ARCHIVE_FILE = Path.home() / ".ytdlp_gui_archive.sqlite3"
+
+# Bytes hashed from each end of a file; enough to tell files apart without reading them whole
+SAMPLE_BYTES = 64 * 1024
+
+
+def quick_hash(path: str) -> str:
+    """Hash of the file size plus its first and last SAMPLE_BYTES."""
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        digest.update(f.read(SAMPLE_BYTES))
+        if size > 2 * SAMPLE_BYTES:
+            f.seek(-SAMPLE_BYTES, os.SEEK_END)
+            digest.update(f.read(SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+@dataclass
+class ArchiveEntry:
+    path: str
+    size: int
+    sha256: str
+    format_id: str
+
+    def is_present(self) -> bool:
+        try:
+            return os.path.getsize(self.path) == self.size
+        except OSError:
+            return False
+
+
+class DownloadArchive:
+    """Persistent record of finished downloads.
+
+    Entries are keyed by video (extractor + id, as in yt-dlp's archive) and
+    by the requested format, so the same video fetched as mp3 and as video
+    are tracked separately. All keys are loaded into a set on first use,
+    making the "was this downloaded?" check O(1) in memory; the row itself
+    is only read on a hit. Other processes (the process download backend,
+    a second app instance) write to the same file, so the set is reloaded
+    whenever SQLite reports a commit from another connection.
+    """
+
+    _shared: "DownloadArchive | None" = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: Path = ARCHIVE_FILE) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS downloads ("
+            " video TEXT NOT NULL, request TEXT NOT NULL, format_id TEXT, path TEXT NOT NULL,"
+            " size INTEGER NOT NULL, sha256 TEXT, added REAL NOT NULL,"
+            " PRIMARY KEY (video, request))"
+        )
+        self._keys: Optional[Set[Tuple[str, str]]] = None
+        # PRAGMA data_version when the keys were loaded; it changes on commits by other connections
+        self._data_version = -1
+
+    @classmethod
+    def shared(cls) -> "DownloadArchive | None":
+        """Process-wide instance; None if the archive file cannot be opened."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                try:
+                    cls._shared = cls()
+                except (OSError, sqlite3.Error):
+                    return None
+            return cls._shared
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._loaded_keys())
+
+    def lookup(self, extractor: str, video_id: str, request: str) -> Optional[ArchiveEntry]:
+        """The archived download of a video for a request, if its file is still on disk."""
+        key = (cache_key(extractor, video_id), request)
+        with self._lock:
+            if key not in self._loaded_keys():
+                return None
+            row = self._db.execute(
+                "SELECT path, size, sha256, format_id FROM downloads WHERE video = ? AND request = ?", key
+            ).fetchone()
+        if row is None:
+            return None
+        entry = ArchiveEntry(row[0], row[1], row[2] or "", row[3] or "")
+        return entry if entry.is_present() else None
+
+    def record(self, extractor: str, video_id: str, request: str, format_id: str, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            digest = quick_hash(path)
+        except OSError:
+            return
+        key = (cache_key(extractor, video_id), request)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO downloads (video, request, format_id, path, size, sha256, added)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, format_id, path, size, digest, time.time()),
+            )
+            self._loaded_keys().add(key)
+
+    def _loaded_keys(self) -> Set[Tuple[str, str]]:
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if self._keys is None or version != self._data_version:
+            self._keys = set(self._db.execute("SELECT video, request FROM downloads"))
+            self._data_version = version
+        return self._keys
@@ -4,8 +4,9 @@ import shutil
 import tempfile
 import zipfile
 from pathlib import Path
-from typing import Optional
-import urllib.request
+from typing import Callable, Optional
+
+from utils.fetch import download_file
 
 
 BIN_DIR = Path(__file__).resolve().parent.parent / "bin"
@@ -18,20 +19,14 @@ ARIA2_ZIP_URL = (
 )
 
 
-def _download(url: str, dest: Path) -> None:
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    with urllib.request.urlopen(url) as r, open(dest, "wb") as f:
-        shutil.copyfileobj(r, f)
-
-
-def ensure_aria2c() -> Optional[str]:
+def ensure_aria2c(progress: Callable[[int, int], None] | None = None) -> Optional[str]:
     """Ensure aria2c.exe exists in local bin, return its path directory."""
     if ARIA2_EXE.exists():
         return str(BIN_DIR)
     try:
         with tempfile.TemporaryDirectory() as td:
             tmp_zip = Path(td) / "aria2.zip"
-            _download(ARIA2_ZIP_URL, tmp_zip)
+            download_file(ARIA2_ZIP_URL, tmp_zip, progress)
             with zipfile.ZipFile(tmp_zip, "r") as zf:
                 zf.extractall(td)
             extracted = Path(td)
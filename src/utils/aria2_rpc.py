@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import atexit
+import http.client
+import itertools
+import json
+import os
+import secrets
+import socket
+import subprocess
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+
+class Aria2RpcError(Exception):
+    pass
+
+
+class Aria2Client:
+    """Minimal aria2 JSON-RPC client over one kept-alive HTTP connection.
+
+    Works against any endpoint speaking aria2's protocol, so a local fake
+    server can stand in for aria2c.
+    """
+
+    def __init__(self, url: str, secret: str = "", timeout: float = 10.0) -> None:
+        parsed = urlparse(url)
+        self._host = parsed.hostname or "127.0.0.1"
+        self._port = parsed.port or 6800
+        self._path = parsed.path or "/jsonrpc"
+        self._secret = secret
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._ids = itertools.count(1)
+
+    def call(self, method: str, *params: Any) -> Any:
+        args = ([f"token:{self._secret}"] if self._secret else []) + list(params)
+        body = json.dumps({"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": args})
+        with self._lock:
+            data = self._post(body)
+        try:
+            reply = json.loads(data)
+        except ValueError as exc:
+            raise Aria2RpcError(f"invalid reply to {method}") from exc
+        if reply.get("error"):
+            raise Aria2RpcError(reply["error"].get("message") or f"{method} failed")
+        return reply.get("result")
+
+    def _post(self, body: str) -> bytes:
+        # A kept-alive connection may have been closed by the server; retry once on a fresh one
+        for attempt in range(2):
+            try:
+                if self._conn is None:
+                    self._conn = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+                self._conn.request("POST", self._path, body, {"Content-Type": "application/json"})
+                return self._conn.getresponse().read()
+            except (OSError, http.client.HTTPException) as exc:
+                self.close()
+                if attempt:
+                    raise Aria2RpcError(str(exc)) from exc
+        raise Aria2RpcError("unreachable")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def get_version(self) -> str:
+        return (self.call("aria2.getVersion") or {}).get("version", "")
+
+    def add_uri(self, uris: List[str], options: Dict[str, Any]) -> str:
+        return self.call("aria2.addUri", uris, options)
+
+    def tell_status(self, gid: str, keys: List[str]) -> Dict[str, Any]:
+        return self.call("aria2.tellStatus", gid, keys) or {}
+
+    def pause(self, gid: str) -> None:
+        self.call("aria2.pause", gid)
+
+    def unpause(self, gid: str) -> None:
+        self.call("aria2.unpause", gid)
+
+    def remove(self, gid: str) -> None:
+        self.call("aria2.forceRemove", gid)
+
+    def remove_result(self, gid: str) -> None:
+        self.call("aria2.removeDownloadResult", gid)
+
+    def change_option(self, gid: str, options: Dict[str, str]) -> None:
+        self.call("aria2.changeOption", gid, options)
+
+    def change_global_option(self, options: Dict[str, str]) -> None:
+        self.call("aria2.changeGlobalOption", options)
+
+    def shutdown(self) -> None:
+        self.call("aria2.forceShutdown")
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Aria2Daemon:
+    """One long-lived aria2c with RPC enabled, shared by all downloads.
+
+    Started on first use and stopped when the app exits (aria2c also exits
+    on its own if this process dies). Keeping it running saves a process
+    start per item and lets aria2c reuse connections across items.
+    """
+
+    _shared: "Aria2Daemon | None" = None
+    _shared_lock = threading.Lock()
+
+    START_TIMEOUT = 10.0
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._client: Optional[Aria2Client] = None
+        self._registered = False
+
+    @classmethod
+    def shared(cls) -> "Aria2Daemon":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def client(self, executable: str) -> Optional[Aria2Client]:
+        """RPC client for the running daemon, starting it if needed; None if it cannot run."""
+        with self._lock:
+            if self._client is not None and self._process is not None and self._process.poll() is None:
+                return self._client
+            self._stop()
+            return self._start(executable)
+
+    def _start(self, executable: str) -> Optional[Aria2Client]:
+        port = _free_port()
+        secret = secrets.token_hex(16)
+        cmd = [
+            executable,
+            "--enable-rpc",
+            "--rpc-listen-all=false",
+            f"--rpc-listen-port={port}",
+            f"--rpc-secret={secret}",
+            f"--stop-with-process={os.getpid()}",
+            "--max-concurrent-downloads=64",
+            "--continue=true",
+            "--allow-overwrite=true",
+            "--auto-file-renaming=false",
+            "--file-allocation=none",
+            "--max-tries=20",
+            "--retry-wait=2",
+            "--summary-interval=0",
+            "--console-log-level=warn",
+        ]
+        try:
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+            )
+        except OSError:
+            return None
+        client = Aria2Client(f"http://127.0.0.1:{port}/jsonrpc", secret)
+        deadline = time.monotonic() + self.START_TIMEOUT
+        while time.monotonic() < deadline and process.poll() is None:
+            try:
+                client.get_version()
+                break
+            except Aria2RpcError:
+                time.sleep(0.1)
+        else:
+            process.kill()
+            return None
+        self._process, self._client = process, client
+        if not self._registered:
+            atexit.register(self.stop)
+            self._registered = True
+        return client
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stop()
+
+    def _stop(self) -> None:
+        # Called with the lock held
+        if self._client is not None:
+            try:
+                self._client.shutdown()
+            except Aria2RpcError:
+                pass
+            self._client.close()
+            self._client = None
+        if self._process is not None:
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
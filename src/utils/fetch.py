@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import shutil
+import urllib.request
+from pathlib import Path
+from typing import Callable
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def download_file(url: str, dest: Path, progress: Callable[[int, int], None] | None = None) -> None:
+    """Save ``url`` to ``dest``, calling ``progress(done, total)`` after each chunk (total 0 if unknown)."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with urllib.request.urlopen(url) as r, open(dest, "wb") as f:
+        if progress is None:
+            shutil.copyfileobj(r, f)
+            return
+        total = int(r.headers.get("Content-Length") or 0)
+        done = 0
+        while True:
+            chunk = r.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            f.write(chunk)
+            done += len(chunk)
+            progress(done, total)
@@ -5,8 +5,9 @@ import shutil
 import tempfile
 import zipfile
 from pathlib import Path
-from typing import Optional
-import urllib.request
+from typing import Callable, Optional
+
+from utils.fetch import download_file
 
 
 BIN_DIR = Path(__file__).resolve().parent.parent / "bin"
@@ -24,13 +25,7 @@ FFMPEG_ZIP_FALLBACK = (
 )
 
 
-def _download(url: str, dest: Path) -> None:
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    with urllib.request.urlopen(url) as r, open(dest, "wb") as f:
-        shutil.copyfileobj(r, f)
-
-
-def ensure_ffmpeg() -> Optional[str]:
+def ensure_ffmpeg(progress: Callable[[int, int], None] | None = None) -> Optional[str]:
     """Ensure ffmpeg.exe exists in local bin, return its directory for yt-dlp.
 
     Returns the directory path as string if available, or None on failure.
@@ -43,7 +38,7 @@ def ensure_ffmpeg() -> Optional[str]:
     try:
         with tempfile.TemporaryDirectory() as td:
             tmp_zip = Path(td) / "ffmpeg.zip"
-            _download(FFMPEG_ZIP_FALLBACK, tmp_zip)
+            download_file(FFMPEG_ZIP_FALLBACK, tmp_zip, progress)
             with zipfile.ZipFile(tmp_zip, "r") as zf:
                 # Find the bin directory inside the extracted folder
                 root_dir_name = None
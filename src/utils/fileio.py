@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import errno
+import os
+import shutil
+import threading
+
+
+# copy_file_range/sendfile refusing this pair of files (other filesystem, old kernel, O_APPEND, ...)
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EBADF, errno.EOPNOTSUPP, errno.ENOTSUP}
+BUFFER_SIZE = 1024 * 1024
+
+
+def preallocate(fd: int, size: int) -> None:
+    """Reserve ``size`` bytes for the file, so a full disk fails now rather than at 99%."""
+    try:
+        os.posix_fallocate(fd, 0, size)
+        return
+    except AttributeError:
+        pass
+    except OSError as exc:
+        if exc.errno == errno.ENOSPC:
+            raise
+        # Not supported by the filesystem (e.g. some network shares); a sparse file will do
+    if os.fstat(fd).st_size < size:
+        os.ftruncate(fd, size)
+
+
+def write_at(fd: int, offset: int, data: bytes, lock: threading.Lock) -> None:
+    """Write ``data`` at ``offset``; ``lock`` serialises writers where there is no pwrite (Windows)."""
+    if hasattr(os, "pwrite"):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+        return
+    with lock:
+        os.lseek(fd, offset, os.SEEK_SET)
+        os.write(fd, data)
+
+
+def copy_range(src_fd: int, dst_fd: int, count: int, src_offset: int = 0, dst_offset: int = 0) -> int:
+    """Copy ``count`` bytes between two files; returns how many were copied inside the kernel.
+
+    Tries copy_file_range first (a server-side copy on NFS 4.2 and SMB3,
+    a reflink on Btrfs/XFS), then sendfile; whatever they refuse is
+    copied through a buffer.
+    """
+    done = 0
+    if hasattr(os, "copy_file_range"):
+        try:
+            while done < count:
+                copied = os.copy_file_range(src_fd, dst_fd, count - done, src_offset + done, dst_offset + done)
+                if not copied:
+                    break
+                done += copied
+        except OSError as exc:
+            if exc.errno not in _UNSUPPORTED:
+                raise
+    if done < count and hasattr(os, "sendfile"):
+        try:
+            os.lseek(dst_fd, dst_offset + done, os.SEEK_SET)
+            while done < count:
+                copied = os.sendfile(dst_fd, src_fd, src_offset + done, count - done)
+                if not copied:
+                    break
+                done += copied
+        except OSError as exc:
+            if exc.errno not in _UNSUPPORTED:
+                raise
+    in_kernel = done
+    os.lseek(src_fd, src_offset + done, os.SEEK_SET)
+    os.lseek(dst_fd, dst_offset + done, os.SEEK_SET)
+    while done < count:
+        block = os.read(src_fd, min(BUFFER_SIZE, count - done))
+        if not block:
+            raise OSError(errno.EIO, f"source ended {count - done} bytes early")
+        view = memoryview(block)
+        while view:
+            view = view[os.write(dst_fd, view):]
+        done += len(block)
+    return in_kernel
+
+
+def move_into_place(src: str, dst: str) -> int:
+    """Move a finished file to ``dst`` so that ``dst`` only ever appears complete.
+
+    A rename when both are on one filesystem; otherwise the file is copied
+    to a hidden temporary name next to ``dst`` (preallocated, in the kernel
+    where possible, then synced) and renamed over it. Returns the bytes
+    copied inside the kernel, 0 for a rename.
+    """
+    try:
+        os.replace(src, dst)
+        return 0
+    except OSError as exc:
+        if exc.errno != errno.EXDEV:
+            raise
+    partial = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.moving")
+    try:
+        with open(src, "rb") as fsrc, open(partial, "wb") as fdst:
+            size = os.fstat(fsrc.fileno()).st_size
+            preallocate(fdst.fileno(), size)
+            in_kernel = copy_range(fsrc.fileno(), fdst.fileno(), size)
+            os.fsync(fdst.fileno())
+        shutil.copystat(src, partial)
+        os.replace(partial, dst)
+    except BaseException:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        raise
+    os.remove(src)
+    return in_kernel
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+CACHE_FILE = Path.home() / ".ytdlp_gui_info_cache.sqlite3"
+
+DEFAULT_TTL = 6 * 3600
+# Stream URLs must still be valid when the download actually starts
+EXPIRY_MARGIN = 10 * 60
+_EXPIRE_PATH_RE = re.compile(r"/expire/(\d+)")
+
+
+def cache_key(extractor: str, video_id: str) -> str:
+    """Same shape as yt-dlp's archive ids: lowercased extractor key + ' ' + id."""
+    return f"{extractor.lower()} {video_id}"
+
+
+def stream_expiry(info: Dict[str, Any]) -> Optional[float]:
+    """Earliest expiry timestamp advertised by the info's stream URLs, if any."""
+    earliest: Optional[float] = None
+    for fmt in info.get("formats") or [info]:
+        url = fmt.get("url") if isinstance(fmt, dict) else None
+        if not url:
+            continue
+        try:
+            values = parse_qs(urlparse(url).query).get("expire") or _EXPIRE_PATH_RE.findall(url)
+            expires = float(values[0]) if values else None
+        except (ValueError, IndexError):
+            expires = None
+        if expires is not None and (earliest is None or expires < earliest):
+            earliest = expires
+    return earliest
+
+
+class InfoCache:
+    """On-disk cache of extracted info dicts, keyed by extractor + video id.
+
+    Entries live for ``ttl`` seconds or until shortly before their stream
+    URLs expire, whichever comes first. The cache is capped by entry count
+    and by total (compressed) size; least recently used entries go first.
+    URLs that were extracted are remembered as aliases of their key so a
+    retry can hit the cache before the video id is known.
+    """
+
+    _shared: "InfoCache | None" = None
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        path: Path = CACHE_FILE,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = 2000,
+        max_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS info ("
+            " key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL,"
+            " expires REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS info_last_used ON info(last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS aliases (url TEXT PRIMARY KEY, key TEXT NOT NULL)")
+
+    @classmethod
+    def shared(cls) -> "InfoCache | None":
+        """Process-wide instance; None if the cache file cannot be opened."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                try:
+                    cls._shared = cls()
+                except (OSError, sqlite3.Error):
+                    return None
+            return cls._shared
+
+    def get(self, extractor: str, video_id: str) -> Optional[Dict[str, Any]]:
+        return self._get_key(cache_key(extractor, video_id))
+
+    def get_for_url(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT key FROM aliases WHERE url = ?", (url,)).fetchone()
+        return self._get_key(row[0]) if row else None
+
+    def put(self, info: Dict[str, Any], url: str | None = None) -> bool:
+        """Store a sanitized single-video info dict; returns False if not cacheable."""
+        extractor = info.get("extractor_key") or info.get("ie_key")
+        video_id = info.get("id")
+        if not extractor or not video_id or info.get("_type", "video") != "video":
+            return False
+        now = time.time()
+        expires = now + self.ttl
+        streams_expire = stream_expiry(info)
+        if streams_expire is not None:
+            expires = min(expires, streams_expire - EXPIRY_MARGIN)
+        if expires <= now:
+            return False
+        data = zlib.compress(json.dumps(info, separators=(",", ":")).encode("utf-8"))
+        key = cache_key(extractor, video_id)
+        with self._lock:
+            try:
+                self._db.execute("BEGIN")
+                self._db.execute(
+                    "INSERT OR REPLACE INTO info (key, data, size, expires, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, data, len(data), expires, now),
+                )
+                if url:
+                    self._db.execute("INSERT OR REPLACE INTO aliases (url, key) VALUES (?, ?)", (url, key))
+                self._evict(now)
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                return False
+        return True
+
+    def invalidate(self, extractor: str, video_id: str) -> None:
+        key = cache_key(extractor, video_id)
+        with self._lock:
+            self._db.execute("DELETE FROM info WHERE key = ?", (key,))
+            self._db.execute("DELETE FROM aliases WHERE key = ?", (key,))
+
+    def _get_key(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT data, expires FROM info WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM info WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE info SET last_used = ? WHERE key = ?", (now, key))
+        try:
+            return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+        except (zlib.error, ValueError):
+            return None
+
+    def _evict(self, now: float) -> None:
+        removed = self._db.execute("DELETE FROM info WHERE expires <= ?", (now,)).rowcount
+        count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM info").fetchone()
+        if count > self.max_entries or total > self.max_bytes:
+            excess_rows = max(0, count - self.max_entries)
+            excess_bytes = max(0, total - self.max_bytes)
+            doomed = []
+            for key, size in self._db.execute("SELECT key, size FROM info ORDER BY last_used"):
+                if excess_rows <= 0 and excess_bytes <= 0:
+                    break
+                doomed.append((key,))
+                excess_rows -= 1
+                excess_bytes -= size
+            self._db.executemany("DELETE FROM info WHERE key = ?", doomed)
+            removed += len(doomed)
+        if removed:
+            self._db.execute("DELETE FROM aliases WHERE key NOT IN (SELECT key FROM info)")
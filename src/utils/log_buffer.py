@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Deque, List, Optional
+
+
+LOG_FILE = Path.home() / ".ytdlp_gui.log"
+# The log file is rotated at this size, keeping LOG_BACKUPS older files (.log.1, .log.2, ...)
+LOG_FILE_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+DEBUG, INFO, WARNING, ERROR = logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR
+# Shown in the level filter, lowest first
+LEVEL_NAMES = {INFO: "Info", WARNING: "Warnings", ERROR: "Errors"}
+
+_ERROR_PREFIXES = ("error", "post-processing error", "could not", "failed")
+_WARNING_PREFIXES = ("warning", "cached metadata did not work")
+
+
+def classify(message: str) -> int:
+    """Guess the level of a plain log message from how it starts."""
+    head = message.lstrip().lower()
+    if head.startswith(_ERROR_PREFIXES):
+        return ERROR
+    if head.startswith(_WARNING_PREFIXES) or " is not available" in head:
+        return WARNING
+    return INFO
+
+
+@dataclass
+class LogLine:
+    created: float
+    level: int
+    message: str
+
+    def format(self) -> str:
+        return f"{time.strftime('%H:%M:%S', time.localtime(self.created))}  {self.message}"
+
+
+class LogBuffer:
+    """The last ``max_lines`` log lines, plus the ones the view has not shown yet.
+
+    Any thread may :meth:`append`; the GUI drains new lines on a timer and
+    adds them to the view in one go, so a burst of messages costs one
+    repaint instead of one per line. Memory stays bounded however long
+    the app runs, and every line also goes to a size-rotated log file.
+    """
+
+    def __init__(
+        self,
+        max_lines: int = 5000,
+        path: Optional[Path] = LOG_FILE,
+        max_bytes: int = LOG_FILE_BYTES,
+        backups: int = LOG_BACKUPS,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._lines: Deque[LogLine] = deque(maxlen=max(1, int(max_lines)))
+        self._pending: Deque[LogLine] = deque(maxlen=self._lines.maxlen)
+        self._file: Optional[logging.Logger] = None
+        if path is not None:
+            self._file = self._open_file(Path(path), max_bytes, backups)
+
+    @staticmethod
+    def _open_file(path: Path, max_bytes: int, backups: int) -> Optional[logging.Logger]:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        except OSError:
+            # Best-effort; the in-memory log still works
+            return None
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s"))
+        logger = logging.getLogger(f"ytdlp_gui.{path}")
+        logger.propagate = False
+        logger.setLevel(DEBUG)
+        for old in list(logger.handlers):
+            logger.removeHandler(old)
+            old.close()
+        logger.addHandler(handler)
+        return logger
+
+    @property
+    def max_lines(self) -> int:
+        return self._lines.maxlen or 0
+
+    def set_max_lines(self, max_lines: int) -> None:
+        max_lines = max(1, int(max_lines))
+        with self._lock:
+            if max_lines != self._lines.maxlen:
+                self._lines = deque(self._lines, maxlen=max_lines)
+                self._pending = deque(self._pending, maxlen=max_lines)
+
+    def append(self, message: str, level: int | None = None) -> None:
+        line = LogLine(time.time(), classify(message) if level is None else level, str(message))
+        with self._lock:
+            # Both deques are capped: a burst larger than the view keeps only its newest lines
+            self._lines.append(line)
+            self._pending.append(line)
+        if self._file is not None:
+            self._file.log(line.level, line.message)
+
+    def drain(self) -> List[LogLine]:
+        """Lines appended since the last call, oldest first."""
+        with self._lock:
+            if not self._pending:
+                return []
+            pending = list(self._pending)
+            self._pending.clear()
+            return pending
+
+    def lines(self, min_level: int = DEBUG) -> List[LogLine]:
+        """Retained lines at or above ``min_level``; pending lines are marked as shown."""
+        with self._lock:
+            self._pending.clear()
+            return [line for line in self._lines if line.level >= min_level]
+
+    def close(self) -> None:
+        if self._file is not None:
+            for handler in list(self._file.handlers):
+                self._file.removeHandler(handler)
+                handler.close()
+            self._file = None
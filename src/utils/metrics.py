@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+METRICS_FILE = Path.home() / ".ytdlp_gui_metrics.jsonl"
+
+
+@dataclass
+class DownloadMetrics:
+    """Timings and counters of one download, written as one JSON line when it ends."""
+
+    url: str
+    host: str = ""
+    extractor: str = ""
+    video_id: str = ""
+    # "ok", "error" or "skipped" (already in the archive)
+    result: str = ""
+    # copy / remux / encode, from the format plan
+    plan: str = ""
+    cache_hit: bool = False
+    started: float = field(default_factory=time.time)
+    # Seconds per phase: extract, download, merge, postprocess, move, postprocess_wait
+    phases: Dict[str, float] = field(default_factory=dict)
+    bytes: int = 0
+    average_bps: float = 0.0
+    peak_bps: float = 0.0
+    retries: int = 0
+    # Bytes copied inside the kernel instead of read and written by the app (fragment assembly, staging moves)
+    io_saved_bytes: int = 0
+    total_seconds: float = 0.0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + max(0.0, seconds)
+
+    def finish(self, result: str) -> None:
+        self.result = result
+        self.total_seconds = time.time() - self.started
+        download = self.phases.get("download", 0.0)
+        self.average_bps = self.bytes / download if download > 0 else 0.0
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRecorder:
+    """Appends finished downloads to a JSONL file and keeps totals for Prometheus.
+
+    :meth:`serve` exposes the totals in the Prometheus text format on a
+    local port, so a scraper can track throughput, retries and slow
+    phases per host and extractor.
+    """
+
+    _shared: "MetricsRecorder | None" = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: Path = METRICS_FILE) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._downloads: Dict[Tuple[str, str], int] = {}
+        self._bytes: Dict[str, int] = {}
+        self._retries: Dict[str, int] = {}
+        self._io_saved: Dict[str, int] = {}
+        self._peak: Dict[str, float] = {}
+        self._throughput: Dict[str, float] = {}
+        self._phases: Dict[Tuple[str, str], List[float]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @classmethod
+    def shared(cls) -> "MetricsRecorder":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def record(self, metrics: DownloadMetrics, persist: bool = True) -> None:
+        """Count a finished download; ``persist=False`` when another process already wrote its line."""
+        line = json.dumps(asdict(metrics), separators=(",", ":"))
+        host = metrics.host or "unknown"
+        with self._lock:
+            try:
+                if persist:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(line + "\n")
+            except OSError:
+                # Best-effort; the totals below still count it
+                pass
+            key = (host, metrics.result)
+            self._downloads[key] = self._downloads.get(key, 0) + 1
+            self._bytes[host] = self._bytes.get(host, 0) + metrics.bytes
+            self._retries[host] = self._retries.get(host, 0) + metrics.retries
+            self._io_saved[host] = self._io_saved.get(host, 0) + metrics.io_saved_bytes
+            self._peak[host] = max(self._peak.get(host, 0.0), metrics.peak_bps)
+            if metrics.average_bps > 0:
+                self._throughput[host] = metrics.average_bps
+            for phase, seconds in metrics.phases.items():
+                totals = self._phases.setdefault((phase, metrics.extractor or "unknown"), [0.0, 0])
+                totals[0] += seconds
+                totals[1] += 1
+
+    def render(self) -> str:
+        """The totals in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def header(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def sample(name: str, labels: Dict[str, str], value: float) -> None:
+            rendered = ",".join(f'{key}="{_label(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{{{rendered}}} {value}")
+
+        def family(name: str, kind: str, help_text: str, samples: List[Tuple[Dict[str, str], float]]) -> None:
+            header(name, kind, help_text)
+            for labels, value in samples:
+                sample(name, labels, value)
+
+        with self._lock:
+            family("ytdlp_downloads_total", "counter", "Finished downloads by host and result.",
+                   [({"host": h, "result": r}, n) for (h, r), n in sorted(self._downloads.items())])
+            family("ytdlp_download_bytes_total", "counter", "Bytes received by host.",
+                   [({"host": h}, n) for h, n in sorted(self._bytes.items())])
+            family("ytdlp_download_retries_total", "counter", "Download and fragment retries by host.",
+                   [({"host": h}, n) for h, n in sorted(self._retries.items())])
+            family("ytdlp_io_saved_bytes_total", "counter", "Bytes copied inside the kernel instead of by the app, by host.",
+                   [({"host": h}, n) for h, n in sorted(self._io_saved.items())])
+            family("ytdlp_download_peak_bytes_per_second", "gauge", "Highest speed seen by host.",
+                   [({"host": h}, v) for h, v in sorted(self._peak.items())])
+            family("ytdlp_download_throughput_bytes_per_second", "gauge", "Average speed of the last download by host.",
+                   [({"host": h}, v) for h, v in sorted(self._throughput.items())])
+            # One summary (no quantiles): _sum is the time spent, _count the downloads that went through the phase
+            header("ytdlp_phase_seconds", "summary", "Time spent per phase and extractor.")
+            for (phase, extractor), (seconds, count) in sorted(self._phases.items()):
+                labels = {"phase": phase, "extractor": extractor}
+                sample("ytdlp_phase_seconds_sum", labels, seconds)
+                sample("ytdlp_phase_seconds_count", labels, count)
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> bool:
+        """Serve /metrics on a background thread; False if the port can't be bound."""
+        if self._server is not None:
+            return True
+        recorder = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = recorder.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), _Handler)
+        except OSError:
+            return False
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+        return True
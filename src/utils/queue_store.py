@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, IO, Iterable, List, Optional
+
+
+QUEUE_FILE = Path.home() / ".ytdlp_gui_queue.jsonl"
+
+# The journal is compacted once it has this many lines per live record (progress checkpoints pile up)...
+COMPACT_FACTOR = 4
+# ...but not before it has this many, so a short queue is not rewritten every few checkpoints
+COMPACT_MIN_LINES = 1000
+
+
+class QueueJournal:
+    """Append-only journal of queue changes.
+
+    Each change is one JSON line: ``add`` (a full record), ``set`` (changed
+    fields of one item) or ``remove``. Nothing is rewritten during normal
+    operation; :meth:`load` replays the journal (ignoring a torn last line
+    from a crash) and :meth:`rewrite` compacts it atomically, on startup and
+    whenever :meth:`needs_compaction` says it has outgrown the live queue.
+    Structural changes are fsynced, frequent progress updates only flushed.
+    """
+
+    def __init__(self, path: Path = QUEUE_FILE) -> None:
+        self.path = Path(path)
+        self._handle: Optional[IO[str]] = None
+        # Lines in the journal file, as read, rewritten and appended by this instance
+        self.lines = 0
+
+    def load(self) -> List[Dict[str, Any]]:
+        records: Dict[Any, Dict[str, Any]] = {}
+        self.lines = 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    self.lines += 1
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        continue
+                    kind = op.get("op")
+                    if kind == "add":
+                        records[op["id"]] = dict(op["item"])
+                    elif kind == "set" and op.get("id") in records:
+                        records[op["id"]].update(op["fields"])
+                    elif kind == "remove":
+                        for item_id in op.get("ids", []):
+                            records.pop(item_id, None)
+        except OSError:
+            return []
+        return list(records.values())
+
+    def rewrite(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Replace the journal with one ``add`` per record (records must carry their ``id``)."""
+        self.close()
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            written = 0
+            with open(tmp, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps({"op": "add", "id": record["id"], "item": record}, separators=(",", ":")) + "\n")
+                    written += 1
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self.lines = written
+        except OSError:
+            pass
+
+    def needs_compaction(self, live: int) -> bool:
+        """True once the journal holds COMPACT_FACTOR lines per live record (and at least COMPACT_MIN_LINES)."""
+        return self.lines >= max(COMPACT_FACTOR * live, COMPACT_MIN_LINES)
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Journal new records; a whole batch costs a single fsync."""
+        for record in records:
+            self._write({"op": "add", "id": record["id"], "item": record}, durable=False)
+        self._sync()
+
+    def update(self, item_id: int, durable: bool = True, **fields: Any) -> None:
+        self._write({"op": "set", "id": item_id, "fields": fields}, durable=durable)
+
+    def remove(self, item_ids: Iterable[int]) -> None:
+        self._write({"op": "remove", "ids": list(item_ids)}, durable=True)
+
+    def close(self) -> None:
+        if self._handle is not None:
+            try:
+                self._handle.close()
+            except OSError:
+                pass
+            self._handle = None
+
+    def _write(self, op: Dict[str, Any], durable: bool) -> None:
+        try:
+            if self._handle is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._handle = open(self.path, "a", encoding="utf-8")
+            self._handle.write(json.dumps(op, separators=(",", ":")) + "\n")
+            self._handle.flush()
+            self.lines += 1
+        except OSError:
+            # Best-effort; the queue keeps working in memory
+            return
+        if durable:
+            self._sync()
+
+    def _sync(self) -> None:
+        try:
+            if self._handle is not None:
+                self._handle.flush()
+                os.fsync(self._handle.fileno())
+        except OSError:
+            pass
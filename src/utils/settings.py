@@ -1,19 +1,49 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 import json
 
 
 SETTINGS_FILE = Path.home() / ".ytdlp_gui_settings.json"
 
+# (mtime of the settings file, settings read from it), see AppSettings.cached()
+_cached: "tuple[int, AppSettings] | None" = None
+
 
 @dataclass
 class AppSettings:
     theme: str = "light"
     output_dir: str | None = None
     use_aria2c: bool = False
+    # Drive one long-lived aria2c over RPC instead of starting it for every download
+    aria2_rpc: bool = True
+    # Fetch single-file formats over several connections in-process when aria2c is not used
+    segmented_download: bool = False
+    # Fast local folder where items are downloaded and merged before moving to the output folder (None = off)
+    staging_dir: str | None = None
     concurrent_fragments: int = 8
+    # "Auto" speed mode: tune concurrency per site instead of using concurrent_fragments
+    auto_concurrency: bool = False
+    max_concurrent_downloads: int = 3
+    max_downloads_per_host: int = 2
+    # Global download cap in KiB/s (0 = unlimited) and time-of-day overrides:
+    # [{"start": "08:00", "end": "18:00", "limit_kbps": 2048}, ...]
+    bandwidth_limit_kbps: int = 0
+    bandwidth_schedule: list = field(default_factory=list)
+    # Local port for Prometheus metrics (0 = off); per-download metrics always go to a JSONL file
+    metrics_port: int = 0
+    # Lines kept in the log view, and the lowest level it shows (Info, Warnings or Errors)
+    log_max_lines: int = 5000
+    log_level: str = "Info"
+    # "thread": downloads run on threads of the app; "process": in a pool of child processes
+    worker_backend: str = "thread"
+    # "shortest": start the items with the shortest estimated length first; "added": in the order added
+    queue_order: str = "shortest"
+    # Times a failed item is retried automatically, waiting longer before each attempt
+    retry_attempts: int = 3
+    # Queue the whole playlist for links to a video in a playlist or mix, not just the video
+    yes_playlist: bool = False
 
     @classmethod
     def load(cls) -> "AppSettings":
@@ -25,6 +55,18 @@ class AppSettings:
                 pass
         return cls()
 
+    @classmethod
+    def cached(cls) -> "AppSettings":
+        """Settings as last saved, re-read only when the file has changed; treat as read-only."""
+        global _cached
+        try:
+            mtime = SETTINGS_FILE.stat().st_mtime_ns
+        except OSError:
+            mtime = -1
+        if _cached is None or _cached[0] != mtime:
+            _cached = (mtime, cls.load())
+        return _cached[1]
+
     def save(self) -> None:
         try:
             SETTINGS_FILE.write_text(
@@ -33,7 +75,22 @@ class AppSettings:
                         "theme": self.theme,
                         "output_dir": self.output_dir,
                         "use_aria2c": self.use_aria2c,
+                        "aria2_rpc": self.aria2_rpc,
+                        "segmented_download": self.segmented_download,
+                        "staging_dir": self.staging_dir,
                         "concurrent_fragments": self.concurrent_fragments,
+                        "auto_concurrency": self.auto_concurrency,
+                        "max_concurrent_downloads": self.max_concurrent_downloads,
+                        "max_downloads_per_host": self.max_downloads_per_host,
+                        "bandwidth_limit_kbps": self.bandwidth_limit_kbps,
+                        "bandwidth_schedule": self.bandwidth_schedule,
+                        "metrics_port": self.metrics_port,
+                        "log_max_lines": self.log_max_lines,
+                        "log_level": self.log_level,
+                        "worker_backend": self.worker_backend,
+                        "queue_order": self.queue_order,
+                        "retry_attempts": self.retry_attempts,
+                        "yes_playlist": self.yes_playlist,
                     },
                     indent=2,
                 ),
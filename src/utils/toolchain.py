@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from utils.aria2 import ARIA2_EXE, ensure_aria2c
+from utils.ffmpeg import BIN_DIR, FFMPEG_EXE, ensure_ffmpeg
+
+
+MANIFEST_FILE = BIN_DIR / "toolchain.json"
+
+# tool -> (provisioner, bundled executable, name on PATH, version flag)
+TOOLS = {
+    "ffmpeg": (ensure_ffmpeg, FFMPEG_EXE, "ffmpeg", "-version"),
+    "aria2c": (ensure_aria2c, ARIA2_EXE, "aria2c", "--version"),
+}
+
+
+@dataclass
+class ToolInfo:
+    path: str
+    version: str
+    sha256: str
+    # Stat of the executable when it was validated; a mismatch means it was replaced or upgraded
+    size: int = 0
+    mtime: float = 0.0
+
+    @property
+    def directory(self) -> str:
+        return str(Path(self.path).parent)
+
+    def matches_disk(self) -> bool:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        return st.st_size == self.size and st.st_mtime == self.mtime
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _version(path: Path, flag: str) -> str:
+    try:
+        result = subprocess.run(
+            [str(path), flag],
+            capture_output=True,
+            text=True,
+            timeout=15,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    lines = (result.stdout or "").splitlines()
+    return lines[0].strip() if lines else ""
+
+
+class ToolchainService:
+    """Provisions ffmpeg and aria2c in the background.
+
+    Tools are fetched concurrently on a small thread pool. Once a tool has
+    been found (bundled, downloaded or on PATH) and validated by running it,
+    its path, version, checksum, size and mtime are recorded in a manifest;
+    later runs read that manifest once and check each tool with a single
+    stat on first use, provisioning it again if it was deleted, moved or
+    replaced. Callers that need a tool either ask for its location
+    without blocking (:meth:`location`) or wait for it (:meth:`wait`).
+    """
+
+    _shared: "ToolchainService | None" = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, manifest_path: Path = MANIFEST_FILE) -> None:
+        self.manifest_path = Path(manifest_path)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=len(TOOLS), thread_name_prefix="toolchain")
+        self._futures: Dict[str, Future] = {}
+        self._listeners: List[Callable[[str, str], None]] = []
+        self._tools: Dict[str, ToolInfo] = self._load_manifest()
+        # Tools whose manifest entry has been checked against the disk in this process
+        self._checked: Set[str] = set()
+
+    @classmethod
+    def shared(cls) -> "ToolchainService":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def add_listener(self, callback: Callable[[str, str], None]) -> None:
+        """Register ``callback(tool, message)``; called from provisioning threads."""
+        self._listeners.append(callback)
+
+    def location(self, tool: str) -> Optional[str]:
+        """Directory of a ready tool, or None if it is not (yet) available."""
+        info = self._checked_info(tool)
+        return info.directory if info is not None else None
+
+    def path(self, tool: str) -> Optional[str]:
+        """Executable of a ready tool, or None if it is not (yet) available."""
+        info = self._checked_info(tool)
+        return info.path if info is not None else None
+
+    def refresh(self) -> None:
+        """Pick up tools another process has provisioned and recorded in the manifest since."""
+        found = self._load_manifest()
+        with self._lock:
+            for tool, info in found.items():
+                self._tools.setdefault(tool, info)
+
+    def start(self, *tools: str) -> None:
+        for tool in tools:
+            self.request(tool)
+
+    def request(self, tool: str) -> Future:
+        """Future resolving to the tool's directory (or None); provisioning starts if needed."""
+        self._checked_info(tool)
+        with self._lock:
+            future = self._futures.get(tool)
+            # A finished attempt that failed or found nothing is retried on the next request
+            if future is not None and not (
+                future.done() and (future.exception() is not None or future.result() is None)
+            ):
+                return future
+            if tool in self._tools:
+                future = Future()
+                future.set_result(self._tools[tool].directory)
+            else:
+                future = self._executor.submit(self._provision, tool)
+            self._futures[tool] = future
+            return future
+
+    def wait(self, tool: str, timeout: float | None = None) -> Optional[str]:
+        return self.request(tool).result(timeout)
+
+    def invalidate(self, tool: str) -> None:
+        """Forget a cached tool, e.g. after it was deleted; the next request re-provisions it."""
+        with self._lock:
+            self._tools.pop(tool, None)
+            self._futures.pop(tool, None)
+            self._checked.discard(tool)
+            self._save_manifest()
+
+    def _checked_info(self, tool: str) -> Optional[ToolInfo]:
+        """The tool's manifest entry, stat-checked once per process; a stale entry is invalidated."""
+        info = self._tools.get(tool)
+        if info is None or tool in self._checked:
+            return info
+        if not info.matches_disk():
+            self._notify(tool, f"{tool} at {info.path} changed or is missing; preparing it again")
+            self.invalidate(tool)
+            return None
+        self._checked.add(tool)
+        return info
+
+    def _notify(self, tool: str, message: str) -> None:
+        for callback in list(self._listeners):
+            try:
+                callback(tool, message)
+            except Exception:
+                pass
+
+    def _provision(self, tool: str) -> Optional[str]:
+        provisioner, bundled, path_name, version_flag = TOOLS[tool]
+        reported = [-1]
+
+        def _progress(done: int, total: int) -> None:
+            if total <= 0:
+                return
+            percent = done * 100 // total
+            if percent >= reported[0] + 10:
+                reported[0] = percent
+                self._notify(tool, f"Downloading {tool}: {percent}%")
+
+        self._notify(tool, f"Preparing {tool}...")
+        # The bundled builds are Windows executables; elsewhere rely on PATH
+        if os.name == "nt" and not bundled.exists():
+            try:
+                provisioner(progress=_progress)
+            except Exception:
+                pass
+        executable: Optional[Path] = bundled if bundled.exists() else None
+        if executable is None:
+            found = shutil.which(path_name)
+            executable = Path(found) if found else None
+        if executable is None:
+            self._notify(tool, f"{tool} is not available")
+            return None
+        version = _version(executable, version_flag)
+        if not version:
+            self._notify(tool, f"{tool} at {executable} did not run")
+            return None
+        st = executable.stat()
+        info = ToolInfo(str(executable), version, _sha256(executable), st.st_size, st.st_mtime)
+        with self._lock:
+            self._tools[tool] = info
+            self._checked.add(tool)
+            self._save_manifest()
+        self._notify(tool, f"{tool} ready: {version}")
+        return info.directory
+
+    def _load_manifest(self) -> Dict[str, ToolInfo]:
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            return {tool: ToolInfo(**fields) for tool, fields in data.items() if tool in TOOLS}
+        except Exception:
+            return {}
+
+    def _save_manifest(self) -> None:
+        try:
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            self.manifest_path.write_text(
+                json.dumps({tool: asdict(info) for tool, info in self._tools.items()}, indent=2),
+                encoding="utf-8",
+            )
+        except Exception:
+            # Best-effort; the tools are provisioned again next launch
+            pass
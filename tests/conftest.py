@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# The app runs from src/ with its packages at the top level (see main.py and the PyInstaller spec)
+SRC = Path(__file__).resolve().parent.parent / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+# Downloader tests serve synthetic media from the benchmarks' local server
+BENCHMARKS = SRC.parent / "benchmarks"
+if str(BENCHMARKS) not in sys.path:
+    sys.path.insert(1, str(BENCHMARKS))
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+import pytest
+
+from downloader.rpc_download import Aria2RpcFD, RpcYoutubeDL
+from utils.aria2_rpc import Aria2Client, Aria2RpcError
+
+
+SECRET = "s3cret"
+
+
+class FakeAria2:
+    """Speaks enough of aria2's JSON-RPC to drive a download; each tellStatus advances it by ``step`` bytes."""
+
+    def __init__(self, total: int = 4000, step: int = 1000) -> None:
+        self.total = total
+        self.step = step
+        self.calls: List[tuple] = []
+        self.downloads: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        fake = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                body = json.dumps(fake.handle(request)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/jsonrpc"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def methods(self) -> List[str]:
+        return [call[0] for call in self.calls]
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        method, params = request["method"], list(request["params"])
+        if params[:1] != [f"token:{SECRET}"]:
+            return {"jsonrpc": "2.0", "id": request["id"], "error": {"code": 1, "message": "Unauthorized"}}
+        params = params[1:]
+        with self._lock:
+            self.calls.append((method, *params))
+            try:
+                result = getattr(self, "rpc_" + method.split(".", 1)[1])(*params)
+            except KeyError:
+                return {"jsonrpc": "2.0", "id": request["id"], "error": {"code": 1, "message": "GID not found"}}
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    def rpc_getVersion(self) -> Dict[str, Any]:
+        return {"version": "1.37.0"}
+
+    def rpc_addUri(self, uris: List[str], options: Dict[str, Any]) -> str:
+        gid = f"{len(self.downloads) + 1:016x}"
+        self.downloads[gid] = {"uris": uris, "options": dict(options), "status": "active", "completed": 0}
+        return gid
+
+    def rpc_tellStatus(self, gid: str, keys: List[str]) -> Dict[str, str]:
+        download = self.downloads[gid]
+        if download["status"] == "active":
+            download["completed"] = min(self.total, download["completed"] + self.step)
+            if download["completed"] == self.total:
+                download["status"] = "complete"
+                path = os.path.join(download["options"]["dir"], download["options"]["out"])
+                with open(path, "wb") as f:
+                    f.write(b"x" * self.total)
+        status = {
+            "status": download["status"],
+            "totalLength": str(self.total),
+            "completedLength": str(download["completed"]),
+            "downloadSpeed": "1000",
+        }
+        return {key: status[key] for key in keys if key in status}
+
+    def rpc_pause(self, gid: str) -> str:
+        self.downloads[gid]["status"] = "paused"
+        return gid
+
+    def rpc_unpause(self, gid: str) -> str:
+        self.downloads[gid]["status"] = "active"
+        return gid
+
+    def rpc_forceRemove(self, gid: str) -> str:
+        self.downloads[gid]["status"] = "removed"
+        return gid
+
+    def rpc_removeDownloadResult(self, gid: str) -> str:
+        del self.downloads[gid]
+        return "OK"
+
+    def rpc_changeOption(self, gid: str, options: Dict[str, str]) -> str:
+        self.downloads[gid]["options"].update(options)
+        return "OK"
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def aria2():
+    fake = FakeAria2()
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def client(aria2):
+    client = Aria2Client(aria2.url, SECRET, timeout=5.0)
+    yield client
+    client.close()
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(Aria2RpcFD, "POLL_INTERVAL", 0.0)
+
+
+def _download(client: Aria2Client, tmp_path, rate_limit=lambda: 0.0, hook=None):
+    ydl = RpcYoutubeDL({"quiet": True, "noprogress": True}, client, rate_limit=rate_limit)
+    fd = Aria2RpcFD(ydl, ydl.params)
+    events: List[Dict[str, Any]] = []
+    fd.add_progress_hook(events.append)
+    if hook is not None:
+        fd.add_progress_hook(lambda d: hook(ydl, d))
+    filename = str(tmp_path / "video.mp4")
+    info = {"id": "v", "url": "https://example.com/video.mp4", "protocol": "https", "http_headers": {"X-Test": "1"}}
+    ok = fd.download(filename, info)
+    return ok, filename, events
+
+
+def test_client_sends_secret_and_params(aria2, client):
+    assert client.get_version() == "1.37.0"
+    gid = client.add_uri(["https://example.com/a"], {"out": "a"})
+    assert client.tell_status(gid, ["status", "totalLength"]) == {"status": "active", "totalLength": "4000"}
+    assert aria2.calls[1] == ("aria2.addUri", ["https://example.com/a"], {"out": "a"})
+
+
+def test_client_raises_rpc_errors(aria2):
+    bad = Aria2Client(aria2.url, "wrong", timeout=5.0)
+    try:
+        with pytest.raises(Aria2RpcError, match="Unauthorized"):
+            bad.get_version()
+    finally:
+        bad.close()
+
+
+def test_client_reconnects_after_server_closes_connection(aria2, client):
+    client.get_version()
+    # Simulate the daemon dropping the kept-alive connection
+    client._conn.sock.close()
+    assert client.get_version() == "1.37.0"
+
+
+def test_download_polls_until_complete(aria2, client, tmp_path):
+    ok, filename, events = _download(client, tmp_path)
+
+    assert ok
+    assert os.path.getsize(filename) == aria2.total
+    assert not os.path.exists(filename + ".part")
+    add = next(call for call in aria2.calls if call[0] == "aria2.addUri")
+    assert add[1] == ["https://example.com/video.mp4"]
+    assert add[2]["out"] == "video.mp4.part"
+    assert "X-Test: 1" in add[2]["header"]
+    assert "max-download-limit" not in add[2]
+    downloading = [e["downloaded_bytes"] for e in events if e["status"] == "downloading"]
+    assert downloading == [1000, 2000, 3000]
+    assert events[-1]["status"] == "finished" and events[-1]["total_bytes"] == aria2.total
+    # A finished transfer is only cleared from the daemon's results, not force-removed
+    assert "aria2.forceRemove" not in aria2.methods()
+    assert aria2.methods()[-1] == "aria2.removeDownloadResult"
+    assert aria2.downloads == {}
+
+
+def test_interrupted_download_is_paused_and_removed(aria2, client, tmp_path):
+    class Interrupted(Exception):
+        pass
+
+    def hook(ydl, d):
+        if d["status"] == "downloading" and d["downloaded_bytes"] >= 2000:
+            # As DownloadJob.pause does: halt the transfer now, then stop at this progress report
+            assert ydl.pause()
+            raise Interrupted
+
+    with pytest.raises(Interrupted):
+        _download(client, tmp_path, hook=hook)
+
+    methods = aria2.methods()
+    assert methods[-3:] == ["aria2.pause", "aria2.forceRemove", "aria2.removeDownloadResult"]
+    assert aria2.downloads == {}
+    assert not os.path.exists(tmp_path / "video.mp4")
+
+
+def test_pause_without_active_transfer(client):
+    ydl = RpcYoutubeDL({"quiet": True}, client)
+    assert not ydl.pause()
+    assert not ydl.resume()
+
+
+def test_rate_limit_changes_are_pushed_live(aria2, client, tmp_path):
+    aria2.total = 6000
+    limits = iter([500.0, 500.0, 250.0, 250.0, 0.0, 0.0, 0.0])
+    current = [1000.0]
+
+    def hook(ydl, d):
+        if d["status"] == "downloading":
+            current[0] = next(limits)
+
+    ok, _, _ = _download(client, tmp_path, rate_limit=lambda: current[0], hook=hook)
+
+    assert ok
+    add = next(call for call in aria2.calls if call[0] == "aria2.addUri")
+    assert add[2]["max-download-limit"] == "1000"
+    changes = [call[2] for call in aria2.calls if call[0] == "aria2.changeOption"]
+    assert changes == [{"max-download-limit": "500"}, {"max-download-limit": "250"}, {"max-download-limit": "0"}]
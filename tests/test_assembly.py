@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import errno
+import json
+import os
+
+import pytest
+import yt_dlp
+from media_server import MediaServer
+
+from downloader import assembly
+from downloader.assembly import PARAM, IoSavings, enable_in_place_assembly
+
+
+MiB = 1024 * 1024
+
+
+@pytest.fixture(scope="module", autouse=True)
+def installed():
+    enable_in_place_assembly()
+
+
+@pytest.fixture
+def media():
+    with MediaServer(size=3 * MiB + 5, segment_size=MiB) as srv:
+        yield srv
+
+
+def _download(url: str, folder, io: IoSavings | None, concurrency: int = 1) -> str:
+    params = {
+        "quiet": True,
+        "noprogress": True,
+        "cachedir": False,
+        "fixup": "never",
+        "concurrent_fragment_downloads": concurrency,
+        "paths": {"home": str(folder)},
+        "outtmpl": "%(id)s.%(ext)s",
+    }
+    if io is not None:
+        params[PARAM] = io
+    with yt_dlp.YoutubeDL(params) as ydl:
+        info = ydl.extract_info(url)
+    return info["requested_downloads"][0]["filepath"]
+
+
+def _read(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("kind", ["hls", "dash"])
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_in_place_assembly_matches_the_in_memory_path(media, tmp_path, kind, concurrency):
+    io = IoSavings()
+    in_place = _download(media.url(kind, "a"), tmp_path / "in_place", io, concurrency)
+    in_memory = _download(media.url(kind, "a"), tmp_path / "in_memory", None, concurrency)
+
+    expected = media.payload(0, media.size)
+    if kind == "dash":
+        expected = media.payload(media.size, 1024) + expected
+    assert _read(in_memory) == expected
+    assert _read(in_place) == expected
+    assert 0 <= io.bytes <= len(expected)
+    assert os.listdir(tmp_path / "in_place") == [os.path.basename(in_place)]
+
+
+def test_failed_copy_leaves_the_fragment_to_fetch_again(media, tmp_path, monkeypatch):
+    copy_range = assembly.copy_range
+    calls = []
+
+    def _fail_second(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return copy_range(*args)
+
+    monkeypatch.setattr(assembly, "copy_range", _fail_second)
+    io = IoSavings()
+    with pytest.raises(yt_dlp.utils.UnavailableVideoError):
+        _download(media.url("hls", "a"), tmp_path, io)
+    ytdl = next(tmp_path.glob("*.ytdl"))
+    # Only the first fragment made it into the .part file, so a resume starts at the second
+    assert json.loads(ytdl.read_text())["downloader"]["current_fragment"]["index"] == 1
+
+    monkeypatch.setattr(assembly, "copy_range", copy_range)
+    path = _download(media.url("hls", "a"), tmp_path, io)
+    assert _read(path) == media.payload(0, media.size)
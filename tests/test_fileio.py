@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import errno
+import os
+import tempfile
+
+import pytest
+
+from utils import fileio
+from utils.fileio import copy_range, move_into_place
+
+
+DATA = os.urandom(3 * 1024 * 1024 + 17)
+
+
+def _refuse(*args, **kwargs):
+    raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.bin"
+    path.write_bytes(DATA)
+    return path
+
+
+def test_copy_range_with_offsets(source, tmp_path):
+    target = tmp_path / "target.bin"
+    target.write_bytes(b"x" * 100)
+    with open(source, "rb") as src, open(target, "r+b") as dst:
+        in_kernel = copy_range(src.fileno(), dst.fileno(), 2 * 1024 * 1024, 1000, 50)
+    assert 0 <= in_kernel <= 2 * 1024 * 1024
+    assert target.read_bytes() == b"x" * 50 + DATA[1000:1000 + 2 * 1024 * 1024]
+
+
+def test_copy_range_falls_back_to_a_buffer(source, tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "copy_file_range", _refuse, raising=False)
+    monkeypatch.setattr(os, "sendfile", _refuse, raising=False)
+    target = tmp_path / "target.bin"
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        assert copy_range(src.fileno(), dst.fileno(), len(DATA)) == 0
+    assert target.read_bytes() == DATA
+
+
+def test_copy_range_into_an_append_mode_file(source, tmp_path):
+    # The kernel refuses O_APPEND destinations for copy_file_range and sendfile alike
+    target = tmp_path / "target.bin"
+    target.write_bytes(b"head")
+    with open(source, "rb") as src, open(target, "ab") as dst:
+        copy_range(src.fileno(), dst.fileno(), len(DATA), 0, 4)
+    assert target.read_bytes() == b"head" + DATA
+
+
+def test_copy_range_raises_when_the_source_is_short(source, tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "copy_file_range", _refuse, raising=False)
+    monkeypatch.setattr(os, "sendfile", _refuse, raising=False)
+    with open(source, "rb") as src, open(tmp_path / "target.bin", "wb") as dst:
+        with pytest.raises(OSError) as info:
+            copy_range(src.fileno(), dst.fileno(), len(DATA) + 1)
+    assert info.value.errno == errno.EIO
+
+
+def test_move_into_place_renames_on_one_filesystem(source, tmp_path):
+    target = tmp_path / "out" / "video.mp4"
+    target.parent.mkdir()
+    assert move_into_place(str(source), str(target)) == 0
+    assert target.read_bytes() == DATA
+    assert not source.exists()
+
+
+def test_move_into_place_copies_across_filesystems(source, tmp_path, monkeypatch):
+    replace = os.replace
+
+    def _replace(src, dst):
+        if src == str(source):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        return replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", _replace)
+    os.utime(source, (1_000_000_000, 1_000_000_000))
+    target = tmp_path / "out" / "video.mp4"
+    target.parent.mkdir()
+
+    in_kernel = move_into_place(str(source), str(target))
+    assert 0 <= in_kernel <= len(DATA)
+    assert target.read_bytes() == DATA
+    assert target.stat().st_mtime == 1_000_000_000
+    assert not source.exists()
+    assert os.listdir(target.parent) == ["video.mp4"]
+
+
+def test_move_into_place_leaves_nothing_behind_on_failure(source, tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "replace", _refuse)
+
+    def _full(*args):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(fileio, "copy_range", _full)
+    target = tmp_path / "out" / "video.mp4"
+    target.parent.mkdir()
+    with pytest.raises(OSError):
+        move_into_place(str(source), str(target))
+    assert source.read_bytes() == DATA
+    assert os.listdir(target.parent) == []
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="needs /dev/shm")
+def test_move_into_place_from_another_real_filesystem(tmp_path):
+    with tempfile.NamedTemporaryFile(dir="/dev/shm", delete=False) as f:
+        f.write(DATA)
+    if os.stat(f.name).st_dev == os.stat(tmp_path).st_dev:
+        os.remove(f.name)
+        pytest.skip("/dev/shm is on the same filesystem as the test directory")
+    target = tmp_path / "video.mp4"
+    move_into_place(f.name, str(target))
+    assert target.read_bytes() == DATA
+    assert not os.path.exists(f.name)
+    assert os.listdir(tmp_path) == ["video.mp4"]
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from downloader.formats import ACTION_COPY, ACTION_ENCODE, ACTION_REMUX, fallback_plan, plan_formats
+
+
+BEST = "Best (video+audio)"
+
+
+def video(format_id, height, vcodec, ext, tbr=1000):
+    return {"format_id": format_id, "height": height, "vcodec": vcodec, "acodec": "none", "ext": ext, "tbr": tbr}
+
+
+def audio(format_id, acodec, ext, abr):
+    return {"format_id": format_id, "vcodec": "none", "acodec": acodec, "ext": ext, "abr": abr}
+
+
+def muxed(format_id, height, vcodec, acodec, ext, abr=None):
+    return {"format_id": format_id, "height": height, "vcodec": vcodec, "acodec": acodec, "ext": ext, "abr": abr,
+            "tbr": 2000}
+
+
+def plan(formats, mode=BEST, **options):
+    return plan_formats({"formats": formats}, mode, options)
+
+
+def pp_keys(p):
+    return [pp["key"] for pp in p.postprocessors]
+
+
+def test_no_formats_falls_back_to_expressions():
+    p = plan([], container="mkv", video_quality="720p")
+    assert p == fallback_plan(BEST, {"container": "mkv", "video_quality": "720p"})
+    assert p.format == "bestvideo[height<=720]+bestaudio/best[height<=720]"
+    assert p.merge_output_format == "mkv"
+
+
+def test_unusable_formats_are_ignored():
+    formats = [
+        {"format_id": "sb0", "vcodec": "none", "acodec": "none", "ext": "mhtml"},
+        dict(muxed("drm", 1080, "avc1", "mp4a", "mp4"), has_drm=True),
+        muxed("18", 360, "avc1", "mp4a", "mp4"),
+    ]
+    assert plan(formats).format == "18"
+
+
+def test_audio_copied_when_codec_and_bitrate_match():
+    formats = [audio("140", "mp4a.40.2", "m4a", 129), audio("251", "opus", "webm", 160)]
+    p = plan(formats, "Audio only (m4a)", audio_quality="128k")
+    assert (p.format, p.action, p.postprocessors) == ("140", ACTION_COPY, [])
+
+
+def test_audio_remuxed_when_only_the_container_differs():
+    p = plan([audio("251", "opus", "webm", 160), audio("a", "mp4a", "mp4", 128)], "Audio only (m4a)")
+    assert (p.format, p.action) == ("a", ACTION_REMUX)
+    assert p.postprocessors == [{"key": "FFmpegExtractAudio", "preferredcodec": "m4a"}]
+
+
+def test_mp3_encoded_once_from_the_best_source():
+    p = plan([audio("140", "mp4a", "m4a", 129), audio("251", "opus", "webm", 160)], "Audio only (mp3)")
+    assert (p.format, p.action) == ("251", ACTION_ENCODE)
+    assert p.postprocessors == [{"key": "FFmpegExtractAudio", "preferredcodec": "mp3", "preferredquality": "192"}]
+
+
+def test_best_streams_merged_into_default_container():
+    formats = [
+        video("137", 1080, "avc1.640028", "mp4"),
+        video("136", 720, "avc1.4d401f", "mp4"),
+        audio("140", "mp4a.40.2", "m4a", 129),
+        muxed("18", 360, "avc1", "mp4a", "mp4"),
+    ]
+    p = plan(formats)
+    assert (p.format, p.action, p.merge_output_format) == ("137+140", ACTION_REMUX, "mp4")
+
+
+def test_height_cap_is_respected():
+    formats = [video("137", 1080, "avc1", "mp4"), video("136", 720, "avc1", "mp4"), audio("140", "mp4a", "m4a", 129)]
+    assert plan(formats, video_quality="720p").format == "136+140"
+
+
+def test_muxed_file_wins_a_tie_and_needs_no_merge():
+    formats = [muxed("22", 720, "avc1", "mp4a", "mp4"), video("136", 720, "avc1", "mp4"), audio("140", "mp4a", "m4a", 129)]
+    p = plan(formats)
+    assert (p.format, p.action, p.postprocessors) == ("22", ACTION_COPY, [])
+    assert not p.needs_ffmpeg
+
+
+def test_muxed_file_remuxed_into_the_requested_container():
+    p = plan([muxed("43", 360, "vp8", "vorbis", "webm")], container="mkv")
+    assert (p.format, p.action) == ("43", ACTION_REMUX)
+    assert p.postprocessors == [{"key": "FFmpegVideoRemuxer", "preferedformat": "mkv"}]
+
+
+def test_muxed_file_converted_once_when_codecs_dont_fit():
+    p = plan([muxed("18", 360, "avc1", "mp4a", "mp4")], container="webm")
+    assert (p.format, p.action) == ("18", ACTION_ENCODE)
+    assert p.postprocessors == [{"key": "FFmpegVideoConvertor", "preferedformat": "webm"}]
+
+
+def test_audio_bitrate_decides_between_muxed_and_separate():
+    formats = [
+        muxed("22", 720, "avc1", "mp4a", "mp4", abr=192),
+        video("136", 720, "avc1", "mp4"),
+        audio("140", "mp4a", "m4a", 128),
+    ]
+    assert plan(formats, audio_quality="128k").format == "136+140"
+    assert plan(formats).format == "22"
+
+
+def test_chosen_container_outranks_resolution():
+    formats = [
+        video("137", 1080, "avc1", "mp4"),
+        video("247", 720, "vp9", "webm"),
+        audio("140", "mp4a", "m4a", 129),
+        audio("251", "opus", "webm", 160),
+    ]
+    p = plan(formats, container="webm")
+    assert (p.format, p.action, p.merge_output_format) == ("247+251", ACTION_REMUX, "webm")
+    # Without a chosen container resolution comes first (mp4 takes opus, the better audio here)
+    assert plan(formats).format == "137+251"
+
+
+def test_unfitting_codecs_go_to_mkv_only_without_a_chosen_container():
+    formats = [video("137", 1080, "avc1", "mp4"), audio("251", "vorbis", "webm", 160)]
+    p = plan(formats)
+    assert (p.action, p.merge_output_format) == (ACTION_REMUX, "mkv")
+
+    p = plan(formats, container="mp4")
+    assert (p.format, p.action, p.merge_output_format) == ("137+251", ACTION_ENCODE, "mkv")
+    assert pp_keys(p) == ["FFmpegVideoConvertor"]
+    assert p.postprocessors[0]["preferedformat"] == "mp4"
+
+
+def test_video_only_in_the_chosen_container():
+    formats = [video("248", 1080, "vp9", "webm"), video("137", 1080, "avc1", "mp4", tbr=900)]
+    p = plan(formats, "Best video only")
+    assert (p.format, p.action) == ("248", ACTION_COPY)
+    p = plan([video("248", 1080, "vp9", "webm")], "Best video only", container="mp4")
+    assert (p.action, pp_keys(p)) == (ACTION_REMUX, ["FFmpegVideoRemuxer"])
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import pytest
+
+from downloader.playlist import looks_like_collection
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://www.youtube.com/playlist?list=PL123",
+        "https://www.youtube.com/@someone",
+        "https://www.youtube.com/channel/UC123/videos",
+    ],
+)
+def test_collections(url):
+    assert looks_like_collection(url)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://www.youtube.com/watch?v=abc",
+        "https://www.youtube.com/watch?v=abc&list=RDabc&start_radio=1",
+        "https://www.youtube.com/watch?v=abc&list=PL123&index=4",
+        "https://youtu.be/abc?list=PL123",
+    ],
+)
+def test_single_videos(url):
+    assert not looks_like_collection(url)
+
+
+def test_whole_playlist_expands_videos_opened_from_a_playlist():
+    assert looks_like_collection("https://www.youtube.com/watch?v=abc&list=RDabc", whole_playlist=True)
+    assert looks_like_collection("https://youtu.be/abc?list=PL123", whole_playlist=True)
+    assert not looks_like_collection("https://www.youtube.com/watch?v=abc", whole_playlist=True)
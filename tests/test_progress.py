@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from downloader.progress import ProgressAggregator, ProgressEvent, ProgressTotals, SpeedMeter, format_bytes, format_eta
+
+
+def test_speed_meter_first_interval_is_taken_as_is():
+    meter = SpeedMeter(window=3.0)
+    assert meter.update(0, now=0.0) == 0.0
+    assert meter.update(1000, now=1.0) == pytest.approx(1000.0)
+
+
+def test_speed_meter_weights_samples_by_elapsed_time():
+    meter = SpeedMeter(window=3.0)
+    meter.update(0, now=0.0)
+    meter.update(1000, now=1.0)
+    rate = meter.update(4000, now=2.0)
+    assert rate == pytest.approx(1000 + (1 - math.exp(-1 / 3)) * 2000)
+
+
+def test_speed_meter_is_independent_of_report_frequency():
+    coarse, fine = SpeedMeter(), SpeedMeter()
+    coarse.update(0, now=0.0)
+    fine.update(0, now=0.0)
+    for second in range(1, 11):
+        coarse.update(second * 1000, now=float(second))
+        for tick in range(1, 11):
+            fine.update(int((second - 1 + tick / 10) * 1000), now=second - 1 + tick / 10)
+    assert coarse.rate == pytest.approx(1000.0)
+    assert fine.rate == pytest.approx(1000.0)
+
+
+def test_speed_meter_folds_close_reports_and_restarts_on_reset():
+    meter = SpeedMeter()
+    meter.update(0, now=0.0)
+    meter.update(1000, now=1.0)
+    # Too soon after the previous sample: no change
+    assert meter.update(5000, now=1.05) == pytest.approx(1000.0)
+    # A smaller byte count is a new file; it restarts the baseline without a bogus negative rate
+    assert meter.update(10, now=2.0) == pytest.approx(1000.0)
+    assert meter.eta(5000) == pytest.approx(5.0)
+    assert SpeedMeter().eta(100) is None
+
+
+def test_aggregator_keeps_latest_event_per_key():
+    aggregator = ProgressAggregator()
+    for downloaded in (1, 2, 3):
+        aggregator.update("a", ProgressEvent(downloaded_bytes=downloaded))
+    aggregator.update("b", ProgressEvent(downloaded_bytes=7))
+
+    drained = aggregator.drain()
+    assert {key: event.downloaded_bytes for key, event in drained.items()} == {"a": 3, "b": 7}
+    assert aggregator.drain() == {}
+    assert aggregator.stats() == {"received": 4, "coalesced": 2, "flushes": 1}
+
+
+def test_aggregator_discard_drops_pending_event():
+    aggregator = ProgressAggregator()
+    aggregator.update("a", ProgressEvent())
+    aggregator.discard("a")
+    aggregator.discard("missing")
+    assert aggregator.drain() == {}
+    assert aggregator.stats()["coalesced"] == 1
+
+
+def test_totals_weigh_items_by_size():
+    totals = ProgressTotals()
+    totals.update("small", 50, 100, 10.0)
+    totals.update("large", 100, 900, 30.0)
+    assert (totals.downloaded_bytes, totals.total_bytes, totals.percent) == (150, 1000, 15)
+    assert totals.eta_seconds == pytest.approx(850 / 40)
+
+    totals.update("small", 80, 100, 5.0)
+    totals.complete("large")
+    assert (totals.downloaded_bytes, totals.total_bytes) == (980, 1000)
+    assert totals.speed_bps == pytest.approx(5.0)
+
+    totals.stop("small")
+    assert totals.eta_seconds is None
+    totals.remove("small")
+    assert (totals.downloaded_bytes, totals.total_bytes, totals.percent) == (900, 900, 100)
+
+
+def test_event_and_formatting_helpers():
+    event = ProgressEvent(downloaded_bytes=512, total_bytes=1024, speed_bps=2048, eta_seconds=3725)
+    assert (event.percent, event.speed, event.eta) == (50, "2.0 KiB/s", "1:02:05")
+    assert ProgressEvent(downloaded_bytes=5).percent == 0
+    assert format_bytes(1536 * 1024) == "1.5 MiB"
+    assert format_eta(None) == "-" and format_eta(65) == "01:05"
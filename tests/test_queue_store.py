@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import json
+
+from utils.queue_store import COMPACT_MIN_LINES, QueueJournal
+
+
+def record(item_id: int, **fields):
+    return {"id": item_id, "url": f"https://example.com/{item_id}", "status": "Queued", **fields}
+
+
+def test_replays_adds_updates_and_removals(tmp_path):
+    journal = QueueJournal(tmp_path / "queue.jsonl")
+    journal.add([record(1), record(2), record(3)])
+    journal.update(1, status="Downloading", percent=10)
+    journal.update(2, durable=False, title="Two")
+    journal.remove([3])
+    journal.update(3, status="Finished")
+    journal.close()
+
+    records = {r["id"]: r for r in QueueJournal(tmp_path / "queue.jsonl").load()}
+    assert sorted(records) == [1, 2]
+    assert records[1]["status"] == "Downloading" and records[1]["percent"] == 10
+    assert records[2]["title"] == "Two"
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / "queue.jsonl"
+    journal = QueueJournal(path)
+    journal.add([record(1)])
+    journal.update(1, percent=40)
+    journal.close()
+    # A crash in the middle of a write leaves half a JSON object behind
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "set", "id": 1, "fields": {"percent": 90}})[:20])
+
+    journal = QueueJournal(path)
+    records = journal.load()
+    assert records == [record(1, percent=40)]
+    # As on startup: compacting drops the torn line, so later appends start on a fresh line
+    journal.rewrite(records)
+    journal.update(1, percent=50)
+    journal.close()
+    assert QueueJournal(path).load() == [record(1, percent=50)]
+
+
+def test_missing_file_loads_empty(tmp_path):
+    assert QueueJournal(tmp_path / "absent.jsonl").load() == []
+
+
+def test_rewrite_compacts_to_one_line_per_record(tmp_path):
+    path = tmp_path / "queue.jsonl"
+    journal = QueueJournal(path)
+    journal.add([record(1), record(2)])
+    for percent in range(50):
+        journal.update(1, durable=False, percent=percent)
+    live = journal.load()
+    journal.rewrite(live)
+    assert journal.lines == 2
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+    assert QueueJournal(path).load() == live
+
+
+def test_needs_compaction_counts_appended_lines(tmp_path):
+    journal = QueueJournal(tmp_path / "queue.jsonl")
+    journal.add([record(1)])
+    while journal.lines < COMPACT_MIN_LINES - 1:
+        journal.update(1, durable=False, percent=1)
+    assert not journal.needs_compaction(1)
+    journal.update(1, durable=False, percent=2)
+    assert journal.needs_compaction(1)
+    # A large queue gets proportionally more room before it is rewritten
+    assert not journal.needs_compaction(COMPACT_MIN_LINES)
+
+    reloaded = QueueJournal(tmp_path / "queue.jsonl")
+    reloaded.load()
+    assert reloaded.lines == journal.lines
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from downloader import ratelimit
+from downloader.ratelimit import BandwidthLimiter, BandwidthSchedule, TokenBucket
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 500.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return clock
+
+
+def test_zero_rate_never_waits(clock):
+    bucket = TokenBucket(0)
+    assert bucket.reserve(10 ** 9) == 0.0
+    bucket.consume(10 ** 9)
+    assert clock.slept == []
+
+
+def test_burst_then_wait_for_deficit(clock):
+    bucket = TokenBucket(1000, burst_seconds=1.0)
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.reserve(500) == pytest.approx(0.5)
+    # Reservations queue up behind each other rather than sharing the same refill
+    assert bucket.reserve(500) == pytest.approx(1.0)
+
+
+def test_refill_is_capped_at_burst(clock):
+    bucket = TokenBucket(1000, burst_seconds=1.0)
+    bucket.reserve(1000)
+    clock.now += 60
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.reserve(1000) == pytest.approx(1.0)
+
+
+def test_consume_sleeps_for_the_deficit(clock):
+    bucket = TokenBucket(2000, burst_seconds=0.5)
+    bucket.consume(1000)
+    bucket.consume(3000)
+    assert clock.slept == [pytest.approx(1.5)]
+
+
+def test_long_run_rate_matches_the_limit(clock):
+    bucket = TokenBucket(1000, burst_seconds=1.0)
+    start = clock.now
+    for _ in range(100):
+        bucket.consume(100)
+    # 10 000 bytes at 1000 B/s, minus the initial one-second burst
+    assert clock.now - start == pytest.approx(9.0)
+
+
+def test_set_rate_forgives_debt_and_caps_tokens(clock):
+    bucket = TokenBucket(100)
+    bucket.reserve(10_000)
+    bucket.set_rate(1000)
+    assert bucket.reserve(0) == 0.0
+    assert bucket.reserve(1000) == pytest.approx(1.0)
+
+
+def test_set_rate_to_zero_lifts_the_limit(clock):
+    bucket = TokenBucket(100)
+    bucket.reserve(10_000)
+    bucket.set_rate(0)
+    assert bucket.reserve(10_000) == 0.0
+
+
+def test_schedule_windows_and_wrap_past_midnight():
+    schedule = BandwidthSchedule(
+        500,
+        [
+            {"start": "09:00", "end": "17:00", "limit_kbps": 100},
+            {"start": "23:00", "end": "06:00", "limit_kbps": 0},
+            {"start": "bad"},
+        ],
+    )
+    assert len(schedule.rules) == 2
+    assert schedule.limit_kbps(datetime(2024, 1, 1, 12, 0)) == 100
+    assert schedule.limit_kbps(datetime(2024, 1, 1, 17, 0)) == 500
+    assert schedule.limit_kbps(datetime(2024, 1, 1, 23, 30)) == 0
+    assert schedule.limit_kbps(datetime(2024, 1, 1, 3, 0)) == 0
+
+
+def test_account_charges_the_budget_without_blocking(clock):
+    limiter = BandwidthLimiter()
+    limiter.configure(1)
+    limiter.register("aria2")
+    limiter.register("native")
+    # aria2c holds itself to its share; its bytes are charged but its thread never sleeps
+    limiter.account("aria2", 4096)
+    assert clock.slept == []
+    assert limiter.fair_share() == 1024
+    # In-process downloads then wait for the budget aria2c used: (4096 + 1024) bytes at 1 KiB/s
+    limiter.throttle("native", 1024)
+    assert clock.slept == [pytest.approx(5.0)]
+    assert limiter.fair_share() == 512
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import pytest
+
+from downloader import scheduler as scheduler_module
+from downloader.scheduler import (
+    DEFAULT_COST,
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    DownloadScheduler,
+    estimate_cost,
+    host_key,
+    retry_delay,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler_module, "time", clock)
+    return clock
+
+
+def drain(scheduler: DownloadScheduler) -> list:
+    """Start and finish items one at a time, returning the order they ran in."""
+    order = []
+    while True:
+        batch = scheduler.next_batch()
+        if not batch:
+            return order
+        for key in batch:
+            order.append(key)
+            scheduler.finish(key)
+
+
+def test_host_key_groups_subdomains():
+    assert host_key("https://www.youtube.com/watch?v=1") == "youtube.com"
+    assert host_key("https://m.youtube.com/watch?v=1") == "youtube.com"
+    assert host_key("https://music.youtube.com/x") == "youtube.com"
+    assert host_key("https://vimeo.com/1") == "vimeo.com"
+    assert host_key("not a url") == ""
+
+
+def test_estimate_cost():
+    assert estimate_cost(120) == 120.0
+    assert estimate_cost(None, 256 * 1024 * 10) == 10.0
+    assert estimate_cost() is None
+
+
+def test_retry_delay_doubles_with_jitter_and_cap():
+    for attempt, base in ((1, RETRY_BASE_DELAY), (2, RETRY_BASE_DELAY * 2), (3, RETRY_BASE_DELAY * 4)):
+        assert base * 0.8 <= retry_delay(attempt) <= base * 1.2
+    assert retry_delay(50) <= RETRY_MAX_DELAY * 1.2
+
+
+def test_max_workers_bounds_the_batch():
+    scheduler = DownloadScheduler(max_workers=2, max_per_host=5)
+    for key in range(4):
+        scheduler.enqueue(key, f"https://site{key}.example/v")
+    assert scheduler.next_batch() == [0, 1]
+    assert scheduler.next_batch() == []
+    assert scheduler.active_count == 2 and scheduler.pending_count == 2
+    scheduler.finish(0)
+    assert scheduler.next_batch() == [2]
+
+
+def test_per_host_cap_skips_to_other_hosts():
+    scheduler = DownloadScheduler(max_workers=4, max_per_host=2)
+    for key in ("a1", "a2", "a3"):
+        scheduler.enqueue(key, "https://a.example/v")
+    scheduler.enqueue("b1", "https://b.example/v")
+    # a3 is next in order, but its host is at its cap; b1 gets the slot instead
+    assert scheduler.next_batch() == ["a1", "a2", "b1"]
+    scheduler.finish("b1")
+    assert scheduler.next_batch() == []
+    scheduler.finish("a1")
+    assert scheduler.next_batch() == ["a3"]
+
+
+def test_shortest_first_then_insertion_order():
+    scheduler = DownloadScheduler(max_workers=1, max_per_host=1)
+    scheduler.enqueue("long", "https://a.example/1", cost=3600)
+    scheduler.enqueue("unknown", "https://a.example/2")
+    scheduler.enqueue("short", "https://a.example/3", cost=60)
+    scheduler.enqueue("short2", "https://a.example/4", cost=60)
+    assert drain(scheduler) == ["short", "short2", "unknown", "long"]
+
+
+def test_unknown_cost_sits_between_short_and_long():
+    scheduler = DownloadScheduler(max_workers=1, max_per_host=1)
+    scheduler.enqueue("unknown", "https://a.example/1")
+    scheduler.enqueue("shorter", "https://a.example/2", cost=DEFAULT_COST - 1)
+    scheduler.enqueue("longer", "https://a.example/3", cost=DEFAULT_COST + 1)
+    assert drain(scheduler) == ["shorter", "unknown", "longer"]
+
+
+def test_added_order_ignores_cost():
+    scheduler = DownloadScheduler(max_workers=1, max_per_host=1, shortest_first=False)
+    scheduler.enqueue("long", "https://a.example/1", cost=3600)
+    scheduler.enqueue("short", "https://a.example/2", cost=60)
+    assert drain(scheduler) == ["long", "short"]
+
+
+def test_configure_reranks_queued_items():
+    scheduler = DownloadScheduler(max_workers=1, max_per_host=1, shortest_first=False)
+    scheduler.enqueue("long", "https://a.example/1", cost=3600)
+    scheduler.enqueue("short", "https://a.example/2", cost=60)
+    scheduler.configure(1, 1, shortest_first=True)
+    assert drain(scheduler) == ["short", "long"]
+
+
+def test_priority_beats_front_beats_cost():
+    scheduler = DownloadScheduler(max_workers=1, max_per_host=1)
+    scheduler.enqueue("short", "https://a.example/1", cost=10)
+    scheduler.enqueue("resumed", "https://a.example/2", front=True, cost=5000)
+    scheduler.enqueue("low", "https://a.example/3", priority=PRIORITY_LOW, cost=1)
+    scheduler.enqueue("high", "https://a.example/4", priority=PRIORITY_HIGH, cost=9000)
+    assert drain(scheduler) == ["high", "resumed", "short", "low"]
+
+
+def test_order_holds_across_hosts():
+    scheduler = DownloadScheduler(max_workers=1, max_per_host=1)
+    scheduler.enqueue("a-long", "https://a.example/1", cost=500)
+    scheduler.enqueue("b-short", "https://b.example/1", cost=50)
+    scheduler.enqueue("a-short", "https://a.example/2", cost=100)
+    assert drain(scheduler) == ["b-short", "a-short", "a-long"]
+
+
+def test_set_priority_leaves_stale_entries_behind():
+    scheduler = DownloadScheduler(max_workers=1, max_per_host=1)
+    scheduler.enqueue("first", "https://a.example/1", cost=10)
+    scheduler.enqueue("second", "https://a.example/2", cost=20)
+    scheduler.set_priority("second", PRIORITY_HIGH)
+    scheduler.set_priority("second", PRIORITY_LOW)
+    scheduler.set_priority("second", PRIORITY_HIGH)
+    # Each change pushes a new heap entry; only the current one may run, and only once
+    assert drain(scheduler) == ["second", "first"]
+    assert scheduler.is_idle()
+
+
+def test_discard_skips_the_item():
+    scheduler = DownloadScheduler(max_workers=2, max_per_host=2)
+    scheduler.enqueue("keep", "https://a.example/1")
+    scheduler.enqueue("drop", "https://a.example/2")
+    scheduler.discard("drop")
+    assert not scheduler.is_scheduled("drop")
+    assert scheduler.next_batch() == ["keep"]
+    # A discarded item can be queued again, e.g. when it is re-queued by the user
+    scheduler.enqueue("drop", "https://a.example/2")
+    assert scheduler.next_batch() == ["drop"]
+
+
+def test_enqueue_ignores_items_already_scheduled():
+    scheduler = DownloadScheduler(max_workers=2, max_per_host=2)
+    scheduler.enqueue("x", "https://a.example/1")
+    scheduler.enqueue("x", "https://a.example/1")
+    assert scheduler.pending_count == 1
+    assert scheduler.next_batch() == ["x"]
+    scheduler.enqueue("x", "https://a.example/1")
+    assert scheduler.pending_count == 0
+
+
+def test_delayed_items_are_released_when_due(clock):
+    scheduler = DownloadScheduler(max_workers=2, max_per_host=2)
+    scheduler.enqueue("retry", "https://a.example/1", delay=30)
+    scheduler.enqueue("later", "https://a.example/2", delay=60)
+    assert scheduler.next_batch() == []
+    assert scheduler.next_ready_in() == 30
+    assert scheduler.pending_count == 2 and not scheduler.is_idle()
+
+    clock.now += 30
+    assert scheduler.next_ready_in() == 0
+    assert scheduler.next_batch() == ["retry"]
+    assert scheduler.next_ready_in() == 30
+
+    clock.now += 30
+    assert scheduler.next_batch() == ["later"]
+    assert scheduler.next_ready_in() is None
+
+
+def test_waiting_items_can_be_reprioritised_and_discarded(clock):
+    scheduler = DownloadScheduler(max_workers=1, max_per_host=1)
+    scheduler.enqueue("waiting", "https://a.example/1", delay=10)
+    scheduler.enqueue("dropped", "https://a.example/2", delay=10)
+    scheduler.enqueue("queued", "https://a.example/3")
+    scheduler.set_priority("waiting", PRIORITY_HIGH)
+    scheduler.discard("dropped")
+    clock.now += 10
+    assert drain(scheduler) == ["waiting", "queued"]
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+import pytest
+from media_server import MediaServer, NetworkProfile
+
+from downloader.segmented import MIN_SPLIT, SegmentedHttpFD, SegmentedYoutubeDL, _Range
+
+
+MiB = 1024 * 1024
+
+
+class Paused(Exception):
+    pass
+
+
+@pytest.fixture
+def media():
+    with MediaServer(size=5 * MiB + 123) as srv:
+        yield srv
+
+
+def _download(url: str, tmp_path, hook=None, format_id: str = "18"):
+    events: List[Dict[str, Any]] = []
+    with SegmentedYoutubeDL({"quiet": True, "noprogress": True, "segment_connections": 4}) as ydl:
+        fd = SegmentedHttpFD(ydl, ydl.params)
+        fd.add_progress_hook(events.append)
+        if hook is not None:
+            fd.add_progress_hook(hook)
+        filename = str(tmp_path / "video.mp4")
+        info = {"id": "v", "format_id": format_id, "url": url, "protocol": "http", "http_headers": {}}
+        ok = fd.download(filename, info)
+    return ok, filename, events
+
+
+def _read(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _first_report(events: List[Dict[str, Any]]) -> int:
+    """Bytes the download started from."""
+    return next(e["downloaded_bytes"] for e in events if e["status"] == "downloading")
+
+
+def _pause_midway(media: MediaServer, tmp_path) -> str:
+    """Start a slow download and pause it from the progress hook, as DownloadJob.pause does."""
+    media.profile = NetworkProfile(bandwidth=MiB)
+
+    def hook(d):
+        if d["status"] == "downloading" and d["downloaded_bytes"] >= MiB:
+            raise Paused
+
+    with pytest.raises(Paused):
+        _download(media.url("progressive", "v"), tmp_path, hook=hook)
+    media.profile = NetworkProfile()
+    return str(tmp_path / "video.mp4.part")
+
+
+def test_split_covers_the_rest_in_pieces_of_min_split():
+    pieces = SegmentedHttpFD._split([[0, 10 * MiB], [12 * MiB, 12 * MiB + 10]], MiB)
+    spans = [(p.pos, p.end) for p in pieces]
+    assert spans[0][0] == MiB and spans[-1] == (12 * MiB, 12 * MiB + 10)
+    assert all(a[1] == b[0] for a, b in zip(spans[:3], spans[1:4]))
+    assert spans[3][1] == 10 * MiB
+    assert all(end - pos >= MIN_SPLIT for pos, end in spans[:4])
+    # The first range already covers everything up to first_end
+    assert SegmentedHttpFD._split([[0, MiB]], MiB) == []
+
+
+def test_take_prefers_pending_then_steals_from_the_slowest_range():
+    fd = SegmentedHttpFD.__new__(SegmentedHttpFD)
+    fd._lock = threading.Lock()
+    fast, slow = _Range(0, 4 * MiB), _Range(4 * MiB, 8 * MiB)
+    fast.received, slow.received = 3 * MiB, 1024
+    fast.started = slow.started = time.monotonic() - 1.0
+    waiting = _Range(8 * MiB, 9 * MiB)
+    fd._ranges, fd._pending = [fast, slow], [waiting]
+
+    assert fd._take() is waiting
+    stolen = fd._take()
+    assert (stolen.pos, stolen.end) == (6 * MiB, 8 * MiB)
+    assert slow.end == 6 * MiB
+    # Nothing left is worth splitting once every range is below two pieces
+    for piece in fd._ranges:
+        piece.pos = max(piece.pos, piece.end - MIN_SPLIT)
+    assert fd._take() is None
+
+
+def test_download_is_byte_identical(media, tmp_path):
+    ok, filename, events = _download(media.url("progressive", "v"), tmp_path)
+
+    assert ok
+    assert _read(filename) == media.payload(0, media.size)
+    assert not os.path.exists(filename + ".part.segments")
+    # One connection per piece of at least MIN_SPLIT, up to the configured four
+    assert media.requests >= 4
+    assert events[-1]["status"] == "finished" and events[-1]["total_bytes"] == media.size
+
+
+def test_pause_saves_the_missing_ranges_and_resume_fetches_only_those(media, tmp_path):
+    part = _pause_midway(media, tmp_path)
+
+    assert os.path.getsize(part) == media.size
+    with open(part + ".segments", encoding="utf-8") as f:
+        state = json.load(f)
+    assert state["format_id"] == "18" and state["total"] == media.size
+    missing = sum(end - pos for pos, end in state["remaining"])
+    assert 0 < missing < media.size - MiB
+
+    ok, filename, events = _download(media.url("progressive", "v"), tmp_path)
+    assert ok
+    assert _read(filename) == media.payload(0, media.size)
+    assert _first_report(events) == media.size - missing
+
+
+def test_resume_survives_a_new_url_for_the_same_format(media, tmp_path):
+    part = _pause_midway(media, tmp_path)
+    with open(part + ".segments", encoding="utf-8") as f:
+        missing = sum(end - pos for pos, end in json.load(f)["remaining"])
+
+    url = media.url("progressive", "v").replace("127.0.0.1", "localhost") + "?expire=2"
+    ok, filename, events = _download(url, tmp_path)
+    assert ok
+    assert _read(filename) == media.payload(0, media.size)
+    assert _first_report(events) == media.size - missing
+
+
+def test_control_file_of_another_format_restarts(media, tmp_path):
+    _pause_midway(media, tmp_path)
+
+    ok, filename, events = _download(media.url("progressive", "v"), tmp_path, format_id="22")
+    assert ok
+    assert _read(filename) == media.payload(0, media.size)
+    assert _first_report(events) == 0
+
+
+def test_preallocated_part_without_control_file_restarts(media, tmp_path):
+    # Stopped before the first save of its state: a full-size .part of holes
+    with open(tmp_path / "video.mp4.part", "wb") as f:
+        f.truncate(media.size)
+
+    ok, filename, events = _download(media.url("progressive", "v"), tmp_path)
+    assert ok
+    assert _read(filename) == media.payload(0, media.size)
+    assert _first_report(events) == 0
+
+
+def test_httpfd_prefix_is_continued(media, tmp_path):
+    with open(tmp_path / "video.mp4.part", "wb") as f:
+        f.write(media.payload(0, 3 * MiB))
+
+    ok, filename, events = _download(media.url("progressive", "v"), tmp_path)
+    assert ok
+    assert _read(filename) == media.payload(0, media.size)
+    assert _first_report(events) == 3 * MiB
+
+
+@pytest.mark.parametrize("content_length", [True, False])
+def test_server_without_ranges_falls_back_to_httpfd(tmp_path, content_length):
+    body = os.urandom(3 * MiB)
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            # Range is ignored, as by many simple servers and some CDNs
+            self.send_response(200)
+            if content_length:
+                self.send_header("Content-Length", str(len(body)))
+            else:
+                self.send_header("Connection", "close")
+                self.close_connection = True
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    try:
+        ok, filename, _ = _download(f"http://127.0.0.1:{server.server_address[1]}/v.mp4", tmp_path)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert ok
+    assert _read(filename) == body
+    assert not os.path.exists(filename + ".part.segments")